@@ -0,0 +1 @@
+"""Offline performance benchmarks; run ``python -m benchmarks --help``."""
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import sys
+
+# The fake servers need no credentials; placeholders satisfy the required settings
+for _name in ("OPENAI_API_KEY", "SPOTIPY_CLIENT_ID", "SPOTIPY_CLIENT_SECRET"):
+    os.environ.setdefault(_name, "benchmark")
+os.environ.setdefault("SPOTIPY_REDIRECT_URI", "http://localhost/callback")
+
+from .runner import CASES, SCALES, compare_reports, run_suite  # noqa: E402
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark Nichify's hot paths against in-process fake servers.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run the benchmarks and write a JSON report.")
+    run.add_argument("--scale", choices=list(SCALES), default="default")
+    run.add_argument(
+        "--case",
+        action="append",
+        dest="cases",
+        choices=list(CASES),
+        help="Benchmark to run (repeatable; all by default).",
+    )
+    run.add_argument("--output", default="benchmark.json", help="Where to write the report.")
+    run.add_argument(
+        "--db-url",
+        help="Scratch PostgreSQL URL (postgresql+psycopg://...) for the database cases "
+        "(a temporary SQLite database otherwise).",
+    )
+    compare = commands.add_parser("compare", help="Compare two reports by median time.")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Slowdown counted as a regression (0.1 = 10%%).",
+    )
+    return parser
+
+
+def _describe(params: dict) -> str:
+    return ", ".join(f"{key}={value}" for key, value in params.items())
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "run":
+        report = run_suite(args.scale, args.cases, args.db_url)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        for result in report["results"]:
+            if "skipped" in result:
+                print(f"{result['name']:<28} skipped: {result['skipped']}")
+            else:
+                print(
+                    f"{result['name']:<28} {result['median_s'] * 1000:>10.2f} ms  "
+                    f"({_describe(result['params'])})"
+                )
+        print(f"Report written to {args.output}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    rows = compare_reports(baseline, current, args.threshold)
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:<28} {row['baseline_s'] * 1000:>10.2f} -> "
+            f"{row['current_s'] * 1000:>10.2f} ms {row['change']:+7.1%}  "
+            f"({_describe(row['params'])}){flag}"
+        )
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,171 @@
+"""
+In-process stand-ins for the Spotify Web API and the OpenAI streaming API.
+
+Both are httpx transports, so the real clients (AsyncSpotify over AsyncRateLimitedClient,
+AsyncOpenAI) run unchanged against them: requests are routed, answered after a
+configurable latency, and counted, without sockets or network access.
+"""
+
+import asyncio
+import json
+import re
+from collections import Counter
+from collections.abc import AsyncIterator
+
+import httpx
+
+_PLAYLIST_TRACKS_RE = re.compile(r"^/v1/playlists/([^/]+)/tracks$")
+_PLAYLIST_RE = re.compile(r"^/v1/playlists/([^/]+)$")
+
+
+class FakeSpotifyServer:
+    """
+    Serves /me, /me/playlists, /playlists/{id} and /playlists/{id}/tracks from memory.
+
+    Args:
+        playlists (list[dict]): Playlist objects as returned by /me/playlists.
+        tracks (dict[str, list[dict]]): Playlist ID -> raw playlist items.
+        latency (float): Seconds before each response.
+        user_id (str): ID returned by /me.
+    """
+
+    def __init__(
+        self,
+        playlists: list[dict],
+        tracks: dict[str, list[dict]],
+        latency: float = 0.0,
+        user_id: str = "bench-user",
+    ):
+        self.playlists = playlists
+        self.by_id = {playlist["id"]: playlist for playlist in playlists}
+        self.tracks = tracks
+        self.latency = latency
+        self.user_id = user_id
+        self.requests: Counter[str] = Counter()
+        self.transport = httpx.MockTransport(self.handle)
+
+    @staticmethod
+    def _page(url: httpx.URL, items: list, default_limit: int) -> dict:
+        limit = int(url.params.get("limit", default_limit))
+        offset = int(url.params.get("offset", 0))
+        has_next = offset + limit < len(items)
+        return {
+            "items": items[offset : offset + limit],
+            "limit": limit,
+            "offset": offset,
+            "total": len(items),
+            "next": str(url.copy_set_param("offset", offset + limit)) if has_next else None,
+        }
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path = request.url.path
+        if path == "/v1/me":
+            self.requests["me"] += 1
+            return httpx.Response(200, json={"id": self.user_id})
+        if path == "/v1/me/playlists":
+            self.requests["playlists"] += 1
+            return httpx.Response(200, json=self._page(request.url, self.playlists, 50))
+        if match := _PLAYLIST_TRACKS_RE.match(path):
+            self.requests["playlist_tracks"] += 1
+            items = self.tracks.get(match.group(1))
+            if items is None:
+                return httpx.Response(404, json={"error": {"status": 404}})
+            return httpx.Response(200, json=self._page(request.url, items, 100))
+        if match := _PLAYLIST_RE.match(path):
+            self.requests["playlist"] += 1
+            playlist = self.by_id.get(match.group(1), {"snapshot_id": "bench-snapshot"})
+            return httpx.Response(200, json={"snapshot_id": playlist["snapshot_id"]})
+        return httpx.Response(404, json={"error": {"status": 404, "message": path}})
+
+
+class FakeAuthManager:
+    """Stands in for spotipy's SpotifyOAuth."""
+
+    def get_access_token(self, as_dict: bool = False) -> str:
+        return "bench-token"
+
+
+def text_response(text: str, chunk_size: int = 4) -> list[dict]:
+    """A scripted assistant reply streamed as ``chunk_size``-character content deltas."""
+    return [{"content": text[i : i + chunk_size]} for i in range(0, len(text), chunk_size)]
+
+
+def tool_call_response(calls: list[tuple[str, dict]]) -> list[dict]:
+    """A scripted reply calling each (tool name, arguments), arguments split over two deltas."""
+    deltas = []
+    for index, (name, arguments) in enumerate(calls):
+        encoded = json.dumps(arguments)
+        middle = len(encoded) // 2
+        deltas.append(
+            {
+                "tool_calls": [
+                    {
+                        "index": index,
+                        "id": f"call_{index}",
+                        "type": "function",
+                        "function": {"name": name, "arguments": encoded[:middle]},
+                    }
+                ]
+            }
+        )
+        deltas.append(
+            {"tool_calls": [{"index": index, "function": {"arguments": encoded[middle:]}}]}
+        )
+    return deltas
+
+
+class FakeOpenAIServer:
+    """
+    Serves /v1/chat/completions as a server-sent-event stream of scripted replies.
+
+    Args:
+        responses (list[list[dict]]): One list of deltas per request (see text_response and
+            tool_call_response); the last one repeats once the script runs out.
+        first_token_latency (float): Seconds before the first chunk of each reply.
+        chunk_latency (float): Seconds between the following chunks.
+    """
+
+    def __init__(
+        self,
+        responses: list[list[dict]],
+        first_token_latency: float = 0.0,
+        chunk_latency: float = 0.0,
+    ):
+        self.responses = responses
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.requests = 0
+        self.chunks_sent = 0
+        self.transport = httpx.MockTransport(self.handle)
+
+    def _event(self, delta: dict, finish_reason: str | None = None) -> bytes:
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    async def _stream(self, deltas: list[dict]) -> AsyncIterator[bytes]:
+        await asyncio.sleep(self.first_token_latency)
+        for index, delta in enumerate(deltas):
+            if index and self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            self.chunks_sent += 1
+            yield self._event({"role": "assistant", **delta} if index == 0 else delta)
+        finish_reason = "tool_calls" if any("tool_calls" in d for d in deltas) else "stop"
+        yield self._event({}, finish_reason)
+        yield b"data: [DONE]\n\n"
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path != "/v1/chat/completions":
+            return httpx.Response(404, json={"error": {"message": request.url.path}})
+        deltas = self.responses[min(self.requests, len(self.responses) - 1)]
+        self.requests += 1
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=self._stream(deltas)
+        )
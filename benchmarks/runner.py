@@ -0,0 +1,446 @@
+"""Benchmark cases, timing and the machine-readable report."""
+
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from typing import Any
+
+from src import ai_commands, ai_handler, db_handler, semantic_index, spotify_handler
+from src.async_runner import run_sync
+from src.playlist_index import invalidate_playlist_index
+from src.settings import get_settings  # type: ignore
+
+from .fake_servers import (
+    FakeAuthManager,
+    FakeOpenAIServer,
+    FakeSpotifyServer,
+    text_response,
+    tool_call_response,
+)
+from .synthetic import as_playlist_rows, make_playlists, make_records, make_tracks
+
+REPORT_VERSION = 1
+
+# Library sizes, repetitions and simulated latencies per scale
+SCALES: dict[str, dict[str, Any]] = {
+    "smoke": {
+        "playlists": 200,
+        "tracks": 500,
+        "duplicate_rate": 0.05,
+        "repeat": 2,
+        "spotify_latency": 0.0,
+        "first_token_latency": 0.0,
+        "chunk_latency": 0.0,
+    },
+    "default": {
+        "playlists": 2000,
+        "tracks": 10_000,
+        "duplicate_rate": 0.05,
+        "repeat": 5,
+        "spotify_latency": 0.02,
+        "first_token_latency": 0.3,
+        "chunk_latency": 0.01,
+    },
+    "large": {
+        "playlists": 10_000,
+        "tracks": 50_000,
+        "duplicate_rate": 0.1,
+        "repeat": 5,
+        "spotify_latency": 0.05,
+        "first_token_latency": 0.5,
+        "chunk_latency": 0.02,
+    },
+}
+
+# Benchmark name -> case(scale) -> list of result entries
+CASES: dict[str, Callable[[dict], list[dict]]] = {}
+
+
+def case(name: str) -> Callable[[Callable[[dict], list[dict]]], Callable[[dict], list[dict]]]:
+    def decorator(function: Callable[[dict], list[dict]]) -> Callable[[dict], list[dict]]:
+        CASES[name] = function
+        return function
+
+    return decorator
+
+
+def measure(name: str, function: Callable[[], Any], repeat: int, **params: Any) -> dict:
+    """
+    Time ``function`` ``repeat`` times after one untimed warm-up call.
+
+    Returns:
+        dict: The result entry: name, params and wall-clock statistics in seconds.
+    """
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "name": name,
+        "params": params,
+        "runs": repeat,
+        "min_s": timings[0],
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+        "p95_s": timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))],
+        "max_s": timings[-1],
+    }
+
+
+@contextlib.contextmanager
+def patched(target: Any, **attributes: Any) -> Iterator[None]:
+    """Temporarily replace attributes of a module or object."""
+    originals = {name: getattr(target, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(target, name, value)
+
+
+@contextlib.contextmanager
+def fake_spotify(server: FakeSpotifyServer) -> Iterator[None]:
+    """Route spotify_handler's async client to ``server`` with no client-side throttling."""
+    from src.spotify_async import AsyncSpotify
+    from src.spotify_transport import AsyncRateLimitedClient, TokenBucket
+
+    settings = get_settings()
+    http = AsyncRateLimitedClient(
+        rate=1e6,
+        burst=10**6,
+        pool_size=settings.spotify_max_workers,
+        bucket=TokenBucket(1e6, 10**6),
+        transport=server.transport,
+    )
+    client = AsyncSpotify(FakeAuthManager(), http)
+    with patched(spotify_handler, get_async_spotify_client=lambda: client):
+        yield
+
+
+@case("find_exact_duplicates")
+def bench_find_exact_duplicates(scale: dict) -> list[dict]:
+    records = make_records(scale["tracks"], scale["duplicate_rate"])
+    params = {"tracks": len(records), "duplicate_rate": scale["duplicate_rate"]}
+    return [
+        measure(
+            "find_exact_duplicates",
+            lambda: spotify_handler.find_exact_duplicates("bench", records),
+            scale["repeat"],
+            **params,
+        ),
+        measure(
+            "find_duplicate_positions",
+            lambda: spotify_handler.find_duplicate_positions(records),
+            scale["repeat"],
+            **params,
+        ),
+    ]
+
+
+@case("pagination")
+def bench_pagination(scale: dict) -> list[dict]:
+    playlists = make_playlists(scale["playlists"])
+    server = FakeSpotifyServer(
+        playlists,
+        {"big": make_tracks(scale["tracks"], scale["duplicate_rate"])},
+        latency=scale["spotify_latency"],
+    )
+    settings = get_settings()
+    results = []
+    with fake_spotify(server):
+        for parallel in (True, False):
+            with patched(settings, spotify_parallel_pages=parallel):
+                params = {
+                    "parallel": parallel,
+                    "latency_s": scale["spotify_latency"],
+                    "workers": settings.spotify_max_workers,
+                }
+                results.append(
+                    measure(
+                        "get_all_playlist_tracks",
+                        lambda: sum(1 for _ in spotify_handler.get_all_playlist_tracks("big")),
+                        scale["repeat"],
+                        tracks=scale["tracks"],
+                        **params,
+                    )
+                )
+                results.append(
+                    measure(
+                        "get_user_playlists",
+                        spotify_handler.get_user_playlists,
+                        scale["repeat"],
+                        playlists=len(playlists),
+                        **params,
+                    )
+                )
+    return results
+
+
+@case("closest_playlist")
+def bench_closest_playlist(scale: dict) -> list[dict]:
+    playlists = make_playlists(scale["playlists"])
+    rows = as_playlist_rows(playlists)
+    index = semantic_index.SemanticPlaylistIndex()
+    index.upsert(
+        [{"id": p["id"], "name": p["name"], "description": p["description"]} for p in playlists]
+    )
+    queries = {
+        "exact": playlists[len(playlists) // 2]["name"],
+        "typo": playlists[len(playlists) // 3]["name"][:-1] + "x",
+        "description": playlists[len(playlists) // 4]["description"] or "chill drive",
+    }
+    results = []
+    invalidate_playlist_index()
+    try:
+        with patched(
+            ai_commands,
+            wait_for_sync=lambda: True,
+            get_recently_modified_playlists=lambda: rows,
+            get_semantic_index=lambda: index,
+            refresh_semantic_index=lambda ids: None,
+            find_closest_via_gpt=lambda description, shortlist=None: {"status": "error"},
+        ):
+            name_index = ai_commands.get_playlist_index(lambda: rows)
+
+            def lookup(query: str, cached: bool) -> None:
+                if not cached:
+                    name_index.search.cache_clear()  # type: ignore[attr-defined]
+                ai_commands.ai_get_closest_playlist(query)
+
+            for kind, query in queries.items():
+                for cached in (False, True):
+                    results.append(
+                        measure(
+                            "ai_get_closest_playlist",
+                            lambda query=query, cached=cached: lookup(query, cached),
+                            scale["repeat"],
+                            playlists=len(playlists),
+                            query=kind,
+                            cached=cached,
+                        )
+                    )
+    finally:
+        invalidate_playlist_index()
+    return results
+
+
+@case("agent_loop")
+def bench_agent_loop(scale: dict) -> list[dict]:
+    import httpx
+    from openai import AsyncOpenAI
+
+    answer = "Removed 12 duplicates of 9 songs from Road Trip. " * 8
+    server = FakeOpenAIServer(
+        [
+            tool_call_response([("remove_duplicates", {"playlist_id": "big"})]),
+            text_response(answer),
+        ],
+        first_token_latency=scale["first_token_latency"],
+        chunk_latency=scale["chunk_latency"],
+    )
+    client = AsyncOpenAI(
+        api_key="bench",
+        base_url="http://openai.bench/v1",
+        http_client=httpx.AsyncClient(transport=server.transport),
+    )
+    tools_map = {"remove_duplicates": lambda playlist_id: {"status": "success", "message": "ok"}}
+
+    def run() -> None:
+        server.requests = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_handler.process_ai_response(
+                [{"role": "user", "content": "dedupe road trip"}],
+                tools=[{}],
+                tools_map=tools_map,
+            )
+
+    with patched(
+        ai_handler,
+        get_async_openai_client=lambda: client,
+        get_llm_cache=lambda: None,
+        release_thread_session=lambda: None,
+    ):
+        result = measure(
+            "process_ai_response",
+            run,
+            scale["repeat"],
+            first_token_latency_s=scale["first_token_latency"],
+            chunk_latency_s=scale["chunk_latency"],
+            model_requests=2,
+            chunks=len(server.responses[0]) + len(server.responses[1]),
+        )
+    return [result]
+
+
+@case("save_playlists_to_db")
+def bench_save_playlists(scale: dict) -> list[dict]:
+    """
+    Runs on a temporary SQLite database, or on the scratch PostgreSQL database given as
+    ``scale["database_url"]``: its tables are created and the benchmark's playlist rows
+    are deleted afterwards.
+    """
+    rows = [
+        {
+            "id": p["id"],
+            "name": p["name"],
+            "description": p["description"],
+            "tracks_total": p["tracks"]["total"],
+            "snapshot_id": p["snapshot_id"],
+            "image_url": None,
+        }
+        for p in make_playlists(scale["playlists"])
+    ]
+    changed = [dict(row) for row in rows]
+    for row in changed[::10]:
+        row["snapshot_id"] += "-2"
+    # Alternating between the two versions changes a tenth of the playlists on every call
+    alternating = itertools.cycle([changed, rows])
+    database_url = scale.get("database_url")
+    backend = "postgres" if database_url else "sqlite"
+    results = []
+    with contextlib.ExitStack() as stack:
+        if database_url:
+            stack.enter_context(
+                patched(
+                    db_handler,
+                    get_database_url=lambda asynchronous=False, user=None: database_url,
+                )
+            )
+        else:
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            stack.enter_context(
+                patched(
+                    get_settings(),
+                    db_backend="sqlite",
+                    sqlite_path=os.path.join(directory, "bench.db"),
+                )
+            )
+        stack.enter_context(
+            patched(
+                db_handler,
+                _engine=None,
+                _async_engine=None,
+                refresh_semantic_index=lambda ids: None,
+            )
+        )
+        db_handler.Base.metadata.create_all(db_handler.get_engine())
+        try:
+            db_handler.save_playlists_to_db(rows)
+            results.append(
+                measure(
+                    "save_playlists_to_db",
+                    lambda: db_handler.save_playlists_to_db(rows),
+                    scale["repeat"],
+                    playlists=len(rows),
+                    changed=0,
+                    backend=backend,
+                )
+            )
+            results.append(
+                measure(
+                    "save_playlists_to_db",
+                    lambda: db_handler.save_playlists_to_db(next(alternating)),
+                    scale["repeat"],
+                    playlists=len(rows),
+                    changed=len(changed[::10]),
+                    backend=backend,
+                )
+            )
+            results.append(
+                measure(
+                    "get_recently_modified_playlists",
+                    db_handler.get_recently_modified_playlists,
+                    scale["repeat"],
+                    playlists=len(rows),
+                    backend=backend,
+                )
+            )
+        finally:
+            db_handler.session.query(db_handler.Playlist).filter(
+                db_handler.Playlist.id.like("bench%")
+            ).delete(synchronize_session=False)
+            db_handler.session.commit()
+            db_handler.release_thread_session()
+            run_sync(db_handler.get_async_engine().dispose())
+            db_handler.get_engine().dispose()
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    scale: str = "default", cases: list[str] | None = None, database_url: str | None = None
+) -> dict:
+    """
+    Run the selected cases (all by default) at one of SCALES.
+
+    Returns:
+        dict: The JSON-ready report: metadata and one entry per measured operation.
+    """
+    if unknown := [name for name in cases or [] if name not in CASES]:
+        raise ValueError(f"Unknown benchmark(s): {', '.join(unknown)}")
+    config = {**SCALES[scale], "database_url": database_url}
+    results = []
+    for name in cases or list(CASES):
+        results.extend(CASES[name](config))
+    return {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "results": results,
+    }
+
+
+def _result_key(result: dict) -> str:
+    return json.dumps([result["name"], result.get("params", {})], sort_keys=True)
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 0.1) -> list[dict]:
+    """
+    Median change of every operation measured in both reports.
+
+    Returns:
+        list[dict]: name, params, both medians, the relative change and whether it is a
+        regression (slower by more than ``threshold``).
+    """
+    before = {_result_key(r): r for r in baseline["results"] if "median_s" in r}
+    rows = []
+    for result in current["results"]:
+        if "median_s" not in result or (old := before.get(_result_key(result))) is None:
+            continue
+        change = result["median_s"] / old["median_s"] - 1 if old["median_s"] else 0.0
+        rows.append(
+            {
+                "name": result["name"],
+                "params": result["params"],
+                "baseline_s": old["median_s"],
+                "current_s": result["median_s"],
+                "change": change,
+                "regression": change > threshold,
+            }
+        )
+    return rows
@@ -0,0 +1,89 @@
+"""Deterministic synthetic Spotify libraries for the benchmarks."""
+
+import random
+from types import SimpleNamespace
+
+from src.track_records import TrackRecord
+
+_WORDS = (
+    "chill summer night drive gym focus rainy morning road trip party lofi jazz indie "
+    "acoustic workout study sleep dance throwback classics vibes mellow energy sunday "
+    "coffee house deep soul electronic"
+).split()
+_ARTISTS = [f"Artist {i}" for i in range(500)]
+_ID_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def _spotify_id(rng: random.Random) -> str:
+    return "".join(rng.choices(_ID_ALPHABET, k=22))
+
+
+def make_tracks(count: int, duplicate_rate: float = 0.05, seed: int = 0) -> list[dict]:
+    """
+    Raw Spotify playlist items for one playlist of ``count`` tracks.
+
+    About ``duplicate_rate`` of the items repeat an earlier track: half of those are the
+    same Spotify track again, half another release with the same title, artist and
+    duration (what find_exact_duplicates treats as the same song).
+    """
+    rng = random.Random(seed)
+    items: list[dict] = []
+    for _ in range(count):
+        if items and rng.random() < duplicate_rate:
+            original = rng.choice(items)["track"]
+            track = dict(original)
+            if rng.random() < 0.5:
+                track["id"] = _spotify_id(rng)
+                track["uri"] = f"spotify:track:{track['id']}"
+        else:
+            track_id = _spotify_id(rng)
+            track = {
+                "id": track_id,
+                "uri": f"spotify:track:{track_id}",
+                "name": " ".join(rng.choices(_WORDS, k=rng.randint(1, 4))).title(),
+                "artists": [{"name": name} for name in rng.sample(_ARTISTS, rng.randint(1, 2))],
+                "album": {"name": f"Album {rng.randint(0, 2000)}"},
+                "duration_ms": rng.randint(120_000, 360_000),
+            }
+        items.append({"track": track})
+    return items
+
+
+def make_records(count: int, duplicate_rate: float = 0.05, seed: int = 0) -> list[TrackRecord]:
+    return [
+        TrackRecord.from_item(item, position)  # type: ignore[misc]
+        for position, item in enumerate(make_tracks(count, duplicate_rate, seed))
+    ]
+
+
+def make_playlists(count: int, seed: int = 0, owner: str = "bench-user") -> list[dict]:
+    """Spotify playlist objects as returned by /me/playlists."""
+    rng = random.Random(seed)
+    playlists = []
+    for i in range(count):
+        words = rng.sample(_WORDS, rng.randint(1, 3))
+        playlists.append(
+            {
+                "id": f"bench{i:06d}{_spotify_id(rng)[:11]}",
+                "name": f"{' '.join(words).title()} {i}",
+                "description": " ".join(rng.choices(_WORDS, k=rng.randint(0, 8))),
+                "owner": {"id": owner},
+                "tracks": {"total": rng.randint(0, 500)},
+                "snapshot_id": _spotify_id(rng),
+                "images": [],
+            }
+        )
+    return playlists
+
+
+def as_playlist_rows(playlists: list[dict]) -> list[SimpleNamespace]:
+    """Playlists shaped like the ORM rows the lookup indexes are built from."""
+    return [
+        SimpleNamespace(
+            id=playlist["id"],
+            name=playlist["name"],
+            description=playlist["description"],
+            tracks_total=playlist["tracks"]["total"],
+        )
+        for playlist in playlists
+    ]
@@ -1,133 +1,210 @@
 import json
 import traceback
-from .spotify_handler import find_exact_duplicates, get_spotify_client
-from .db_handler import get_recently_modified_playlists
-from Levenshtein import ratio as levenshtein_ratio
+from .spotify_handler import (
+    find_duplicate_positions,
+    find_exact_duplicates,
+    parse_playlist_id,
+    remove_track_positions,
+)
+from .db_handler import (
+    get_playlist_tracks,
+    get_recently_modified_playlists,
+    is_playlist_deduped,
+    mark_playlist_deduped,
+    refresh_semantic_index,
+    wait_for_sync,
+)
 from .ai_handler import process_ai_response
+from .combine import combine_playlists
+from .features import filter_playlist, separate_playlist
+from .tags import create_playlist_from_tags, tag_playlist
+from .playlist_index import get_playlist_index
+from .semantic_index import get_semantic_index
+from .similarity import find_similar_groups, similar_removal_positions
+from .track_records import remaining_after_removals
 from .constants import find_playlist_prompt
 
+# Local semantic matches need this cosine score and this lead over the runner-up
+SEMANTIC_MATCH_THRESHOLD = 0.35
+SEMANTIC_MATCH_MARGIN = 0.05
+# Candidates handed to the LLM when local matching is not confident
+SHORTLIST_SIZE = 10
+
 
 def ai_call_remove_duplicates(
     playlist_id: str, include_similar: bool, remove_similar_automatically: bool
 ):
     try:
-        exact_duplicates = find_exact_duplicates(playlist_id)
-        if not exact_duplicates:
+        playlist_id = parse_playlist_id(playlist_id)
+        wait_for_sync()
+        # Already found clean at the current snapshot: answer without touching Spotify
+        if not include_similar and is_playlist_deduped(playlist_id):
             return {
                 "status": "success",
-                "message": "No duplicates found in the playlist.",
+                "message": "No duplicates found in the playlist (unchanged since last check).",
             }
-        removed = list({track_id for track_ids in exact_duplicates.values() for track_id in track_ids})
-        sp = get_spotify_client()
-        sp.playlist_remove_all_occurrences_of_items(playlist_id, removed)
-        addBack = [track_ids[0] for track_ids in exact_duplicates.values()]
-        sp.playlist_add_items(playlist_id, addBack)
+        tracks, snapshot_id = get_playlist_tracks(playlist_id)
+        exact_duplicates = find_exact_duplicates(playlist_id, tracks)
+        result: dict = {"status": "success"}
+        if exact_duplicates:
+            # Delete every occurrence after the first, in place, pinned to the snapshot we read
+            removals = find_duplicate_positions(tracks)
+            snapshot_id = remove_track_positions(playlist_id, removals, snapshot_id)
+            tracks = remaining_after_removals(tracks, removals)
+            mark_playlist_deduped(playlist_id, snapshot_id, tracks)
+            result.update(
+                message=f"Removed {len(removals)} duplicates of {len(exact_duplicates)} songs.",
+                removed=sorted({uri.rsplit(":", 1)[-1] for uri, _ in removals}),
+                snapshot_id=snapshot_id,
+            )
+        else:
+            mark_playlist_deduped(playlist_id)
+            result["message"] = "No duplicates found in the playlist."
+
         if include_similar:
-            return {
-                "status": "success",
-                "message": f"Removed duplicates for {len(exact_duplicates)} songs.",
-                "removed": removed,
-                "note": "Similar removal not implemented yet.",
-            }
-        return {
-            "status": "success",
-            "message": f"Removed duplicates for {len(exact_duplicates)} songs.",
-            "removed": removed,
-        }
+            groups = find_similar_groups(tracks)
+            if remove_similar_automatically and (
+                similar_removals := similar_removal_positions(groups)
+            ):
+                snapshot_id = remove_track_positions(playlist_id, similar_removals, snapshot_id)
+                mark_playlist_deduped(
+                    playlist_id, snapshot_id, remaining_after_removals(tracks, similar_removals)
+                )
+                result["similar_removed"] = sorted(
+                    {uri.rsplit(":", 1)[-1] for uri, _ in similar_removals}
+                )
+                result["snapshot_id"] = snapshot_id
+            result["similar"] = groups
+            result["message"] += f" Found {len(groups)} groups of similar songs."
+        return result
     except Exception as e:
         traceback_str = traceback.format_exc()
         return {"status": "error", "message": str(e), "traceback": traceback_str}
 
 
-def ai_get_closest_playlist(description: str) -> dict:
+def _playlist_url(playlist_id: str) -> str:
+    return f"https://open.spotify.com/playlist/{playlist_id}"
+
+
+def ai_get_closest_playlist(description: str, top_k: int = 5) -> dict:
     """
-    Find the closest matching playlist based on user input using Levenshtein ratio.
+    Find the closest matching playlist based on user input using the in-memory name index.
     If no match is found, fallback to GPT-4o-mini.
 
     Args:
         description (str): The playlist description or name provided by the user.
+        top_k (int): How many ranked candidates to return for disambiguation.
 
     Returns:
-        dict: A dictionary containing the matched playlist details or an error message.
+        dict: A dictionary containing the matched playlist details, the top-k candidates
+        with their scores, or an error message.
     """
-    playlists = get_recently_modified_playlists()
-    if not playlists:
+    wait_for_sync()
+    index = get_playlist_index(get_recently_modified_playlists)
+    if not len(index):
         return {
             "status": "error",
             "message": "No relevant playlists found. Please modify some playlists on Spotify and restart Nichify.",
         }
 
-    user_input_lower = description.strip().lower()
-
-    # 1. Check for exact match (case-insensitive)
-    for playlist in playlists:
-        if playlist.name.strip().lower() == user_input_lower:
-            return {
-                "status": "success",
-                "playlist": {
-                    "name": playlist.name,
-                    "description": playlist.description,
-                    "url": f"https://open.spotify.com/playlist/{playlist.id}",
-                },
-                "message": "Exact match found.",
-            }
-
-    # 2. Use Levenshtein ratio for fuzzy matching
-    closest_match = playlists[0]
-    highest_ratio: float = 0.0
-
-    for playlist in playlists:
-        similarity_ratio = levenshtein_ratio(
-            user_input_lower, playlist.name.strip().lower()
-        )
-        if similarity_ratio > highest_ratio:
-            closest_match = playlist
-            highest_ratio = similarity_ratio
+    # 1-2. Exact and fuzzy name matches from the prebuilt index
+    matches = index.search(description, top_k)
+    candidates = [
+        {"name": playlist["name"], "url": _playlist_url(playlist["id"]), "score": round(score, 3)}
+        for score, playlist in matches
+    ]
+    if matches and matches[0][0] >= 0.7:  # Acceptable threshold for fuzzy matching
+        highest_ratio, closest_match = matches[0]
+        return {
+            "status": "success",
+            "playlist": {
+                "name": closest_match["name"],
+                "description": closest_match["description"],
+                "url": _playlist_url(closest_match["id"]),
+            },
+            "candidates": candidates,
+            "message": (
+                "Exact match found."
+                if highest_ratio == 1.0
+                else f"Closest match found: {closest_match['name']} "
+                f"(Similarity: {(highest_ratio * 100):.2f}%)"
+            ),
+        }
 
-    if highest_ratio >= 0.7:  # Acceptable threshold for fuzzy matching
+    # 3. Local semantic search over name, description and top artists
+    semantic_index = get_semantic_index()
+    if missing := [p["id"] for p in index.playlists if p["id"] not in semantic_index]:
+        refresh_semantic_index(missing)
+    ranked = semantic_index.search(description, SHORTLIST_SIZE, within=set(index.by_id))
+    if (
+        ranked
+        and ranked[0][0] >= SEMANTIC_MATCH_THRESHOLD
+        and (len(ranked) == 1 or ranked[0][0] - ranked[1][0] >= SEMANTIC_MATCH_MARGIN)
+    ):
+        score, playlist_id, _ = ranked[0]
+        closest_match = index.by_id[playlist_id]
         return {
             "status": "success",
             "playlist": {
-                "name": closest_match.name,
-                "description": closest_match.description,
-                "url": f"https://open.spotify.com/playlist/{closest_match.id}",
+                "name": closest_match["name"],
+                "description": closest_match["description"],
+                "url": _playlist_url(playlist_id),
             },
-            "message": f"Closest match found: {closest_match.name} (Similarity: {(highest_ratio * 100):.2f}%)",
+            "candidates": [
+                {"name": name, "url": _playlist_url(pid), "score": round(s, 3)}
+                for s, pid, name in ranked
+            ],
+            "message": (
+                f"Closest match found using local search: {closest_match['name']} "
+                f"(Score: {score:.2f})"
+            ),
         }
 
-    # # 3. Fallback to GPT-4o-mini
+    # 4. Last resort: let GPT-4o-mini pick from the pre-ranked shortlist
+    shortlist_ids = list(
+        dict.fromkeys([pid for _, pid, _ in ranked] + [p["id"] for _, p in matches])
+    )
+    shortlist = [index.by_id[pid] for pid in shortlist_ids[:SHORTLIST_SIZE]]
     try:
-        return find_closest_via_gpt(description)
+        return find_closest_via_gpt(description, shortlist or None)
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
-def find_closest_via_gpt(description):
-    playlists = get_recently_modified_playlists()
-    playlist_data = [
-        {
-            "id": playlist.id,
-            "name": playlist.name,
-            "description": playlist.description,
-            "tracks_total": playlist.tracks_total,
-        }
-        for playlist in playlists
-    ]
+def find_closest_via_gpt(description: str, shortlist: list[dict] | None = None) -> dict:
+    """
+    Ask GPT-4o-mini which playlist the description refers to.
+
+    Args:
+        description (str): The user's description of the playlist.
+        shortlist (list[dict] | None): Pre-ranked candidates (id, name, description,
+            tracks_total). Defaults to every recently modified playlist.
+    """
+    if shortlist is None:
+        shortlist = [
+            {
+                "id": playlist.id,
+                "name": playlist.name,
+                "description": playlist.description,
+                "tracks_total": playlist.tracks_total,
+            }
+            for playlist in get_recently_modified_playlists()
+        ]
 
     messages = [
         {"role": "system", "content": find_playlist_prompt},
-        {"role": "user", "content": f"target: {description}\n playlists: {json.dumps(playlist_data)}"},
+        {"role": "user", "content": f"target: {description}\n playlists: {json.dumps(shortlist)}"},
     ]
     messages = process_ai_response(messages)
     found = messages[-1]["content"]
-    playlist = next((p for p in playlists if p.id == found), None)
+    playlist = next((p for p in shortlist if p["id"] == found), None)
     return (
         {
             "status": "success",
             "playlist": {
-                "name": playlist.name,
-                "description": playlist.description,
-                "url": f"https://open.spotify.com/playlist/{playlist.id}",
+                "name": playlist["name"],
+                "description": playlist["description"],
+                "url": _playlist_url(playlist["id"]),
             },
             "message": "Closest match found using GPT-4o-mini.",
         }
@@ -140,6 +217,64 @@ def find_closest_via_gpt(description):
     )
 
 
+def ai_combine_playlists(
+    source_playlist_ids: list[str],
+    mode: str,
+    ratios: list[int],
+    target_playlist_id: str,
+    new_playlist_name: str,
+) -> dict:
+    try:
+        return combine_playlists(
+            source_playlist_ids,
+            mode,
+            ratios or None,
+            target_playlist_id or None,
+            new_playlist_name or None,
+        )
+    except Exception as e:
+        traceback_str = traceback.format_exc()
+        return {"status": "error", "message": str(e), "traceback": traceback_str}
+
+
+def ai_separate_playlist(playlist_id: str, feature: str, boundaries: list[float]) -> dict:
+    try:
+        return separate_playlist(playlist_id, feature, boundaries or None)
+    except Exception as e:
+        traceback_str = traceback.format_exc()
+        return {"status": "error", "message": str(e), "traceback": traceback_str}
+
+
+def ai_filter_playlist(
+    playlist_id: str,
+    feature: str,
+    min_value: float | None,
+    max_value: float | None,
+    new_playlist_name: str,
+) -> dict:
+    try:
+        return filter_playlist(playlist_id, feature, min_value, max_value, new_playlist_name)
+    except Exception as e:
+        traceback_str = traceback.format_exc()
+        return {"status": "error", "message": str(e), "traceback": traceback_str}
+
+
+def ai_tag_playlist(playlist_id: str, tags: list[str]) -> dict:
+    try:
+        return tag_playlist(playlist_id, tags)
+    except Exception as e:
+        traceback_str = traceback.format_exc()
+        return {"status": "error", "message": str(e), "traceback": traceback_str}
+
+
+def ai_create_playlist_from_tags(query: str, new_playlist_name: str) -> dict:
+    try:
+        return create_playlist_from_tags(query, new_playlist_name)
+    except Exception as e:
+        traceback_str = traceback.format_exc()
+        return {"status": "error", "message": str(e), "traceback": traceback_str}
+
+
 def exit_application():
     print("\033[93mThank you for using Nichify! Exiting now.\033[0m")
     exit(0)
@@ -1,19 +1,56 @@
-import os
-from typing import Any, Callable, List, Optional
+from __future__ import annotations
+
+import asyncio
 import json
 import logging
-from openai import OpenAI
-from .settings import get_settings  # type: ignore
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+from . import metrics
+from .async_runner import run_sync
+from .context_manager import summarize_tool_result
+from .db_handler import get_playlist_fingerprint, release_thread_session
+from .intent_router import handle_locally
+from .llm_cache import get_llm_cache, make_key
+from .settings import get_settings
+from .users import with_current_context
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
-_settings = get_settings()
+MODEL = "gpt-4o-mini"
+
+# Created on first use; importing openai alone takes longer than the whole prompt budget.
+# The client is async and lives on the shared event loop (async_runner).
+_client: AsyncOpenAI | None = None
+_client_lock = threading.Lock()
+# Worker threads for tool calls, created with the first batch
+_tool_executor: ThreadPoolExecutor | None = None
 
-# Initialize OpenAI client
-client = OpenAI(api_key=_settings.openai_api_key)
+
+def get_async_openai_client() -> AsyncOpenAI:
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            from .cassette import cassette_transport
+
+            # Recording and replay swap the transport under openai's usual HTTP client
+            transport = cassette_transport("openai")
+            _client = AsyncOpenAI(
+                api_key=get_settings().openai_api_key,
+                http_client=DefaultAsyncHttpxClient(transport=transport) if transport else None,
+            )
+    return _client
 
 
-def get_user_input(messages: List[Any]) -> List[Any]:
+def get_user_input(messages: list[Any]) -> list[Any]:
     while (user_input := input("\n\n\033[94mUser: ").strip()) == "":
         pass
     print("\033[0m")
@@ -34,79 +71,182 @@ def get_user_input(messages: List[Any]) -> List[Any]:
 
 
 def process_user_request(
-    messages: List[Any],
-    tools: Optional[dict] = None,
-    toolsMap: Optional[dict[str, Callable[..., Any]]] = None,
-) -> List[dict]:
+    messages: list[Any],
+    tools: dict | None = None,
+    tools_map: dict[str, Callable[..., Any]] | None = None,
+) -> list[dict]:
     try:
         messages = get_user_input(messages)
     except ValueError:
         logger.debug("Invalid user input encountered")
         return messages
-    messages = process_ai_response(messages, tools=tools, toolsMap=toolsMap)
+    # Clear commands about a well-matched playlist skip the model entirely
+    if tools_map and (reply := handle_locally(messages[-1]["content"], tools_map)) is not None:
+        _print_content(reply)
+        messages.append({"role": "assistant", "content": reply})
+        return messages
+    messages = process_ai_response(messages, tools=tools, tools_map=tools_map)
     return messages
 
 
-def handle_function_calls(
-    tool_calls,
-    messages: List[Any],
-    tools: dict,
-    toolsMap: dict[str, Callable[..., Any]],
-) -> List[Any]:
-    for tool_call in tool_calls:
-        tool = tool_call.function.name
-        # Guard against None/partial arguments during streaming assembly
-        args_str = getattr(tool_call.function, "arguments", None) or ""
+def _parse_arguments(tool_call: dict) -> dict:
+    # Guard against None/partial arguments during streaming assembly
+    args_str = tool_call["function"]["arguments"] or ""
+    try:
+        return json.loads(args_str) if args_str else {}
+    except json.JSONDecodeError:
+        # Best-effort: wrap in braces if missing
         try:
-            args = json.loads(args_str) if args_str else {}
-        except json.JSONDecodeError:
-            # Best-effort: wrap in braces if missing
-            try:
-                args = json.loads(f"{{{args_str}}}")
-            except Exception:
-                args = {}
-        logger.debug("Tool call: %s(%s)", tool, args)
-        if tool not in toolsMap:
-            raise ValueError(f"Command {tool} not found in dispatcher.")
-        result: dict = toolsMap[tool](**args)
-        logger.debug("Tool result: %s", result)
+            return dict(json.loads(f"{{{args_str}}}"))
+        except Exception:
+            return {}
+
+
+def _run_tool(tool_call: dict, tools_map: dict[str, Callable[..., Any]]) -> Any:
+    tool = tool_call["function"]["name"]
+    args = _parse_arguments(tool_call)
+    logger.debug("Tool call: %s(%s)", tool, args)
+    with metrics.span("tool", tool=tool):
+        result = tools_map[tool](**args)
+    logger.debug("Tool result: %s", result)
+    return result
+
+
+def _run_tool_in_worker(tool_call: dict, tools_map: dict[str, Callable[..., Any]]) -> Any:
+    try:
+        return _run_tool(tool_call, tools_map)
+    finally:
+        # Worker threads get their own DB session; hand its connection back to the pool
+        release_thread_session()
+
+
+def _check_tools(tool_calls: list[dict], tools_map: dict[str, Callable[..., Any]]) -> None:
+    for tool_call in tool_calls:
+        if tool_call["function"]["name"] not in tools_map:
+            raise ValueError(f"Command {tool_call['function']['name']} not found in dispatcher.")
+
+
+def _get_tool_executor() -> ThreadPoolExecutor:
+    # One long-lived pool: shutting a per-batch pool down waits for every tool, and when
+    # that happens on the loop thread a tool still waiting on run_sync() never finishes
+    global _tool_executor
+    with _client_lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(
+                max_workers=get_settings().tool_max_workers, thread_name_prefix="tool"
+            )
+    return _tool_executor
+
+
+async def aexecute_tool_calls(
+    tool_calls: list[dict], tools_map: dict[str, Callable[..., Any]]
+) -> list[Any]:
+    """
+    Run one batch of tool calls, independent calls in parallel, and return their results
+    in the order the model requested them.
+
+    Tools are plain blocking functions, so they run on worker threads and the event loop
+    stays free for the Spotify and DB requests they make through the sync wrappers. Every
+    call finishes before the first failure, if any, is raised.
+    """
+    _check_tools(tool_calls, tools_map)
+    loop = asyncio.get_running_loop()
+    pool = _get_tool_executor()
+    # Executor futures rather than tasks: a tool's SystemExit must reach the caller,
+    # not stop the event loop
+    futures = [
+        loop.run_in_executor(pool, with_current_context(_run_tool_in_worker), call, tools_map)
+        for call in tool_calls
+    ]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return list(results)
+
+
+def execute_tool_calls(
+    tool_calls: list[dict], tools_map: dict[str, Callable[..., Any]]
+) -> list[Any]:
+    _check_tools(tool_calls, tools_map)
+    if len(tool_calls) == 1:
+        # A single call runs inline on the calling thread
+        return [_run_tool(tool_calls[0], tools_map)]
+    return run_sync(aexecute_tool_calls(tool_calls, tools_map))
+
+
+async def ahandle_function_calls(
+    tool_calls: list[dict],
+    messages: list[Any],
+    tools_map: dict[str, Callable[..., Any]],
+) -> list[Any]:
+    results = await aexecute_tool_calls(tool_calls, tools_map)
+    for tool_call, result in zip(tool_calls, results, strict=True):
         messages.append(
             {
                 "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": str(result),
+                "tool_call_id": tool_call["id"],
+                "content": summarize_tool_result(result),
             }
         )
-    messages = process_ai_response(messages, tools, toolsMap)
     return messages
 
 
-def process_ai_response(
-    messages: List[Any],
-    tools: Optional[dict] = None,
-    toolsMap: Optional[dict[str, Callable[..., Any]]] = None,
-) -> List[Any]:
-    if bool(tools) != bool(toolsMap):
-        raise ValueError("Both tools and toolsMap must be provided or omitted.")
-
-    stream = (
-        client.chat.completions.create(
-            model="gpt-4o-mini", messages=messages, tools=tools, stream=True
-        )
+def handle_function_calls(
+    tool_calls: list[dict],
+    messages: list[Any],
+    tools_map: dict[str, Callable[..., Any]],
+) -> list[Any]:
+    return run_sync(ahandle_function_calls(tool_calls, messages, tools_map))
+
+
+def _print_content(content: str) -> None:
+    print("\n\033[92mAssistant: \033[0m", end="")
+    print(f"\033[92m{content}\033[0m", end="")
+
+
+def _fingerprint_in_worker() -> str:
+    try:
+        return get_playlist_fingerprint()
+    finally:
+        release_thread_session()
+
+
+async def _playlist_fingerprint() -> str | None:
+    # A DB query; run it off the shared event loop so other coroutines keep going
+    try:
+        return await asyncio.to_thread(_fingerprint_in_worker)
+    except Exception:
+        logger.exception("Could not fingerprint playlists, skipping response cache")
+        return None
+
+
+async def _stream_completion(messages: list[Any], tools: dict | None) -> dict:
+    """Stream a completion to the terminal and return the assembled content and tool calls."""
+    with metrics.span("openai_completion", model=MODEL):
+        return await _stream_completion_traced(messages, tools)
+
+
+async def _stream_completion_traced(messages: list[Any], tools: dict | None) -> dict:
+    client = get_async_openai_client()
+    started = time.perf_counter()
+    stream = await (
+        client.chat.completions.create(model=MODEL, messages=messages, tools=tools, stream=True)
         if tools
-        else client.chat.completions.create(
-            model="gpt-4o-mini", messages=messages, stream=True
-        )
+        else client.chat.completions.create(model=MODEL, messages=messages, stream=True)
     )
-    final_tool_calls = {}
+    final_tool_calls: dict[int, dict] = {}
     final_content = ""
     first_flag = True
-    for chunk in stream:
+    streamed = 0
+    async for chunk in stream:
         if chunk.choices[0].finish_reason in ["length", "content_filter"]:
-            raise ValueError(
-                f"Model response is too long or filtered. \n{chunk.choices[0]}"
-            )
+            raise ValueError(f"Model response is too long or filtered. \n{chunk.choices[0]}")
         delta = chunk.choices[0].delta
+        if delta.content or delta.tool_calls:
+            if not streamed:
+                metrics.observe("openai_time_to_first_token_seconds", time.perf_counter() - started)
+            streamed += 1
         if delta.content:
             if first_flag:
                 first_flag = False
@@ -116,26 +256,80 @@ def process_ai_response(
         if delta.tool_calls:
             for tool_call in delta.tool_calls:
                 index = tool_call.index
+                if tool_call.function is None:
+                    continue
 
                 if index not in final_tool_calls:
-                    final_tool_calls[index] = tool_call
-                    # Ensure arguments string is initialized
-                    if final_tool_calls[index].function.arguments is None:
-                        final_tool_calls[index].function.arguments = ""
+                    final_tool_calls[index] = {
+                        "id": tool_call.id,
+                        "type": "function",
+                        "function": {"name": tool_call.function.name, "arguments": ""},
+                    }
 
                 # Accumulate arguments pieces safely
                 incoming_args = tool_call.function.arguments or ""
-                final_tool_calls[index].function.arguments += incoming_args  # type: ignore
+                final_tool_calls[index]["function"]["arguments"] += incoming_args
 
-    if final_content:
-        messages.append({"role": "assistant", "content": final_content})
+    metrics.inc("openai_streamed_chunks_total", streamed)
+    return {"content": final_content, "tool_calls": list(final_tool_calls.values())}
+
+
+async def _complete(messages: list[Any], tools: dict | None) -> dict:
+    # Identical requests against an unchanged playlist set are answered from the cache
+    cache = get_llm_cache()
+    fingerprint = await _playlist_fingerprint() if cache is not None else None
+    key = None
+    if cache is not None and fingerprint is not None:
+        key = make_key(MODEL, messages, tools, fingerprint)
+        response = cache.get(key)
+        metrics.inc("llm_cache_requests_total", result="miss" if response is None else "hit")
+        if response is not None:
+            logger.debug("Model response served from cache")
+            if response["content"]:
+                _print_content(response["content"])
+            return response
+    response = await _stream_completion(messages, tools)
+    if cache is not None and key is not None and fingerprint is not None:
+        cache.set(key, response, fingerprint)
+    return response
 
-    if final_tool_calls and tools and toolsMap:
-        messages.append(
-            {"role": "assistant", "tool_calls": list(final_tool_calls.values())}
-        )
-        messages = handle_function_calls(
-            list(final_tool_calls.values()), messages, tools, toolsMap
-        )
 
+async def aprocess_ai_response(
+    messages: list[Any],
+    tools: dict | None = None,
+    tools_map: dict[str, Callable[..., Any]] | None = None,
+    max_steps: int | None = None,
+) -> list[Any]:
+    """
+    Run the agent loop: ask the model, execute the tool calls it makes, feed the results
+    back, and repeat until it answers without tools or ``max_steps`` rounds have run.
+    """
+    if bool(tools) != bool(tools_map):
+        raise ValueError("Both tools and tools_map must be provided or omitted.")
+
+    max_steps = max_steps or get_settings().max_tool_steps
+    for _ in range(max_steps):
+        response = await _complete(messages, tools)
+
+        if response["content"]:
+            messages.append({"role": "assistant", "content": response["content"]})
+
+        if not (response["tool_calls"] and tools and tools_map):
+            return messages
+        messages.append({"role": "assistant", "tool_calls": response["tool_calls"]})
+        messages = await ahandle_function_calls(response["tool_calls"], messages, tools_map)
+
+    logger.warning("Stopped agent loop after %d tool steps", max_steps)
+    notice = f"I stopped after {max_steps} tool steps. Please try rephrasing your request."
+    _print_content(notice)
+    messages.append({"role": "assistant", "content": notice})
     return messages
+
+
+def process_ai_response(
+    messages: list[Any],
+    tools: dict | None = None,
+    tools_map: dict[str, Callable[..., Any]] | None = None,
+    max_steps: int | None = None,
+) -> list[Any]:
+    return run_sync(aprocess_ai_response(messages, tools, tools_map, max_steps))
@@ -0,0 +1,88 @@
+import asyncio
+import contextvars
+import threading
+from collections.abc import AsyncIterator, Coroutine, Iterator
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# One event loop on a daemon thread runs every coroutine, so the async OpenAI, Spotify
+# and database clients (whose connection pools belong to the loop that opened them)
+# are shared by all callers, whichever thread they come from.
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread: threading.Thread | None = None
+_loop_lock = threading.Lock()
+
+# Returned by _next_item() once an async iterator is done
+_EXHAUSTED = object()
+
+
+class _Raised:
+    """Carries SystemExit/KeyboardInterrupt out of the loop instead of stopping it."""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """The shared event loop, started on first use."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, name="event-loop", daemon=True
+            )
+            _loop_thread.start()
+    return _loop
+
+
+async def _capture(
+    coro: Coroutine[Any, Any, T], context: contextvars.Context | None = None
+) -> T | _Raised:
+    # The task gets the loop thread's context; carry over the caller's (e.g. its user)
+    for var, value in (context or {}).items():
+        var.set(value)
+    try:
+        return await coro
+    except (SystemExit, KeyboardInterrupt) as exc:
+        return _Raised(exc)
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine on the shared loop and block the calling thread until it finishes.
+
+    This is what the sync wrappers use. It may be called from any thread except the loop's
+    own, where it would deadlock; async code should await the coroutine instead.
+    """
+    loop = get_event_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_sync() called from the event loop thread; await instead.")
+    context = contextvars.copy_context()
+    result = asyncio.run_coroutine_threadsafe(_capture(coro, context), loop).result()
+    if isinstance(result, _Raised):
+        raise result.exc
+    return result
+
+
+async def _next_item(iterator: AsyncIterator[T]) -> Any:
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _EXHAUSTED
+
+
+def iterate_sync(iterator: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consume an async generator from sync code, one item per round trip to the loop, so
+    yield coarse items (e.g. whole pages). Closes the generator if the caller stops early.
+    """
+    try:
+        while (item := run_sync(_next_item(iterator))) is not _EXHAUSTED:
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            run_sync(aclose())
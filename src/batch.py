@@ -0,0 +1,127 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .db_handler import (
+    create_tables,
+    get_playlist_tracks,
+    is_playlist_deduped,
+    mark_playlist_deduped,
+    release_thread_session,
+    save_playlists_to_db,
+)
+from .settings import get_settings
+from .spotify_handler import find_duplicate_positions, get_user_playlists, remove_track_positions
+from .track_records import remaining_after_removals
+from .users import with_current_context
+
+logger = logging.getLogger(__name__)
+
+
+def dedupe_playlist(playlist: dict, dry_run: bool = False, force: bool = False) -> dict:
+    """
+    Remove exact duplicates from one playlist without any model involvement.
+
+    Playlists already found clean at their current snapshot are skipped unless ``force``
+    is set. In a dry run nothing is written to Spotify, and a playlist that still has
+    duplicates is not marked clean.
+
+    Returns:
+        dict: Report entry with id, name, status (skipped, clean, would_remove, removed or
+        error), snapshot_id and the duplicates found.
+    """
+    entry = {"id": playlist["id"], "name": playlist["name"], "snapshot_id": playlist["snapshot_id"]}
+    try:
+        if not force and is_playlist_deduped(playlist["id"]):
+            return {**entry, "status": "skipped", "message": "Unchanged since the last clean run."}
+        tracks, snapshot_id = get_playlist_tracks(playlist["id"])
+        removals = find_duplicate_positions(tracks)
+        if not removals:
+            mark_playlist_deduped(playlist["id"])
+            return {**entry, "status": "clean", "snapshot_id": snapshot_id, "duplicates": []}
+
+        by_position = {record.position: record for record in tracks}
+        duplicates = [
+            {
+                "uri": uri,
+                "position": position,
+                "name": by_position[position].name,
+                "artist": by_position[position].artist,
+            }
+            for uri, position in removals
+        ]
+        if dry_run:
+            return {
+                **entry,
+                "status": "would_remove",
+                "snapshot_id": snapshot_id,
+                "duplicates": duplicates,
+            }
+        snapshot_id = remove_track_positions(playlist["id"], removals, snapshot_id)
+        mark_playlist_deduped(
+            playlist["id"], snapshot_id, remaining_after_removals(tracks, removals)
+        )
+        return {**entry, "status": "removed", "snapshot_id": snapshot_id, "duplicates": duplicates}
+    except Exception as e:
+        logger.exception("Error deduplicating playlist '%s'", playlist["name"])
+        return {**entry, "status": "error", "message": str(e)}
+
+
+def _dedupe_in_worker(playlist: dict, dry_run: bool, force: bool) -> dict:
+    try:
+        return dedupe_playlist(playlist, dry_run=dry_run, force=force)
+    finally:
+        release_thread_session()
+
+
+def run_batch_dedupe(
+    playlist_ids: list[str] | None = None,
+    dry_run: bool = False,
+    force: bool = False,
+    workers: int | None = None,
+) -> dict:
+    """
+    Deduplicate the user's playlists (or only ``playlist_ids``) on a worker pool.
+
+    Every worker's Spotify calls draw on the same client-side rate budget
+    (SPOTIFY_REQUESTS_PER_SECOND), however many workers run.
+
+    Returns:
+        dict: The JSON-ready report: run metadata, a summary and one entry per playlist.
+    """
+    started_at = datetime.now(timezone.utc)
+    create_tables()
+    playlists = get_user_playlists()
+    # Bring stored snapshots up to date so unchanged playlists can be skipped
+    save_playlists_to_db(playlists)
+    if playlist_ids is not None:
+        wanted = set(playlist_ids)
+        playlists = [playlist for playlist in playlists if playlist["id"] in wanted]
+        if missing := wanted - {playlist["id"] for playlist in playlists}:
+            logger.warning("Not among your playlists, skipping: %s", ", ".join(sorted(missing)))
+
+    workers = max(1, workers or get_settings().batch_workers)
+    in_worker = with_current_context(_dedupe_in_worker)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dedupe") as pool:
+        entries = list(pool.map(lambda playlist: in_worker(playlist, dry_run, force), playlists))
+
+    summary = {status: 0 for status in ("skipped", "clean", "would_remove", "removed", "error")}
+    for entry in entries:
+        summary[entry["status"]] += 1
+    return {
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "dry_run": dry_run,
+        "summary": {
+            "playlists": len(entries),
+            **summary,
+            "duplicates": sum(len(entry.get("duplicates", [])) for entry in entries),
+        },
+        "playlists": entries,
+    }
+
+
+def write_report(report: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
@@ -0,0 +1,254 @@
+"""
+Record and replay of the Spotify and OpenAI HTTP traffic.
+
+Both services are reached through httpx, so recording and replay are httpx transports
+installed under the real clients. A cassette is a gzip-compressed JSON-lines file with
+one exchange per line: the request (method, URL, body hash), the response status and
+headers, the delay until the headers arrived and every body chunk with the delay before
+it, so streamed completions replay with their original pacing.
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+
+import httpx
+
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODES = ("record", "replay")
+# Response headers never written to a cassette
+_SKIPPED_HEADERS = {"set-cookie"}
+
+
+def _body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+def _encode_chunk(delay: float, chunk: bytes) -> list:
+    try:
+        return [round(delay, 4), "t", chunk.decode("utf-8")]
+    except UnicodeDecodeError:
+        return [round(delay, 4), "b", base64.b64encode(chunk).decode("ascii")]
+
+
+def _decode_chunk(entry: list) -> tuple[float, bytes]:
+    delay, kind, data = entry
+    return delay, data.encode("utf-8") if kind == "t" else base64.b64decode(data)
+
+
+class Cassette:
+    """
+    The exchanges of one cassette file.
+
+    Recording starts a new file and appends each exchange as its response body is
+    closed. Replay looks a request up by method, URL and body; failing that, it takes
+    the next recorded exchange for the same method and path, so a session whose prompts
+    differ from the recording still gets model responses. Each lookup moves on to the
+    next recorded exchange, and the last one is repeated once a queue runs out, so a
+    cassette can be replayed any number of times.
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {CASSETTE_MODES}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._by_request: dict[tuple[str, str, str], deque[dict]] = {}
+        self._by_route: dict[tuple[str, str], deque[dict]] = {}
+        if mode == "record":
+            with gzip.open(path, "wt", encoding="utf-8"):
+                pass
+        else:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, exchange: dict) -> None:
+        method, url = exchange["method"], exchange["url"]
+        route = (method, httpx.URL(url).path)
+        self._by_request.setdefault((method, url, exchange["body"]), deque()).append(exchange)
+        self._by_route.setdefault(route, deque()).append(exchange)
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._by_request.values())
+
+    def append(self, exchange: dict) -> None:
+        line = json.dumps(exchange, separators=(",", ":"))
+        with self._lock, gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def match(self, method: str, url: str, body: bytes) -> dict | None:
+        """The recorded exchange to answer a request with, or None."""
+        with self._lock:
+            for table, key in (
+                (self._by_request, (method, url, _body_hash(body))),
+                (self._by_route, (method, httpx.URL(url).path)),
+            ):
+                if queue := table.get(key):  # type: ignore[arg-type]
+                    exchange = queue[0]
+                    if len(queue) > 1:
+                        queue.popleft()
+                    return exchange
+        return None
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, cassette: Cassette, exchange: dict):
+        self.stream = stream
+        self.cassette = cassette
+        self.exchange = exchange
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        last = time.perf_counter()
+        async for chunk in self.stream:
+            now = time.perf_counter()
+            self.exchange["chunks"].append(_encode_chunk(now - last, chunk))
+            last = now
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self.stream.aclose()
+        self.cassette.append(self.exchange)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Sends requests through ``transport`` and records every exchange to ``cassette``."""
+
+    def __init__(self, cassette: Cassette, service: str, transport: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.service = service
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        exchange = {
+            "service": self.service,
+            "method": request.method,
+            "url": str(request.url),
+            "body": _body_hash(body),
+            "status": response.status_code,
+            "headers": [
+                [name, value]
+                for name, value in response.headers.multi_items()
+                if name.lower() not in _SKIPPED_HEADERS
+            ],
+            "latency": round(time.perf_counter() - started, 4),
+            "chunks": [],
+        }
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, self.cassette, exchange),  # type: ignore
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+async def _pause(seconds: float, speed: float) -> None:
+    if speed > 0 and seconds > 0:
+        await asyncio.sleep(seconds / speed)
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[list], speed: float):
+        self.chunks = chunks
+        self.speed = speed
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for entry in self.chunks:
+            delay, chunk = _decode_chunk(entry)
+            await _pause(delay, self.speed)
+            yield chunk
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Answers requests from ``cassette`` without touching the network.
+
+    ``speed`` scales the recorded delays: 1 replays at recorded speed, 10 ten times
+    faster, 0 without any delay. Requests with no recorded exchange get a 404.
+    """
+
+    def __init__(self, cassette: Cassette, speed: float = 1.0):
+        self.cassette = cassette
+        self.speed = speed
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        exchange = self.cassette.match(request.method, str(request.url), body)
+        if exchange is None:
+            logger.warning("No recorded response for %s %s", request.method, request.url)
+            return httpx.Response(
+                404,
+                json={"error": {"status": 404, "message": "Not in the replay cassette"}},
+            )
+        await _pause(exchange["latency"], self.speed)
+        return httpx.Response(
+            exchange["status"],
+            headers=exchange["headers"],
+            stream=_ReplayStream(exchange["chunks"], self.speed),
+        )
+
+
+class ReplayAuthManager:
+    """Stands in for spotipy's SpotifyOAuth while replaying; no token is ever requested."""
+
+    def get_access_token(self, as_dict: bool = False) -> str:
+        return "replay-token"
+
+
+_cassette: Cassette | None = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette | None:
+    """The cassette selected by NICHIFY_CASSETTE_MODE and NICHIFY_CASSETTE, if any."""
+    global _cassette
+    settings = get_settings()
+    if not settings.cassette_mode:
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(os.path.expanduser(settings.cassette_path), settings.cassette_mode)
+            logger.info("HTTP %s mode with cassette %s", settings.cassette_mode, _cassette.path)
+        return _cassette
+
+
+def replaying() -> bool:
+    return (cassette := get_cassette()) is not None and cassette.mode == "replay"
+
+
+def cassette_transport(
+    service: str, limits: httpx.Limits | None = None
+) -> httpx.AsyncBaseTransport | None:
+    """
+    Transport for a service's httpx client in record or replay mode, or None for the
+    default network transport.
+
+    Args:
+        service (str): Name stored with recorded exchanges ("spotify", "openai").
+        limits (httpx.Limits | None): Connection pool limits of the recording transport.
+    """
+    if (cassette := get_cassette()) is None:
+        return None
+    if cassette.mode == "replay":
+        return ReplayTransport(cassette, get_settings().replay_speed)
+    network = httpx.AsyncHTTPTransport(limits=limits) if limits else httpx.AsyncHTTPTransport()
+    return RecordingTransport(cassette, service, network)
@@ -0,0 +1,224 @@
+import logging
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .db_handler import (
+    get_playlist_tracks,
+    record_playlist_write,
+    release_thread_session,
+    save_playlists_to_db,
+    wait_for_sync,
+)
+from .settings import get_settings
+from .spotify_handler import (
+    add_track_uris,
+    create_playlist,
+    get_playlist_snapshot,
+    parse_playlist_id,
+)
+from .track_records import TrackRecord
+from .users import with_current_context
+
+logger = logging.getLogger(__name__)
+
+MODES = ("union", "intersection", "difference", "interleave")
+
+
+class TrackVocabulary:
+    """
+    Playlists as arrays of integer IDs into one vocabulary of dedupe keys.
+
+    Two entries get the same ID when they share the (title, artist, duration_ms) key
+    used by find_exact_duplicates. IDs are handed out in order of first appearance, so
+    sorting IDs restores that order. Entries without a Spotify ID (local files) are left
+    out, since they cannot be added to another playlist by URI.
+    """
+
+    def __init__(self, playlists: Iterable[Iterable[TrackRecord]]):
+        self.ids: dict[tuple, int] = {}
+        self.records: list[TrackRecord] = []  # First record seen for each ID
+        self.arrays: list[np.ndarray] = []
+        for tracks in playlists:
+            self.arrays.append(np.fromiter(self._encode(tracks), dtype=np.int64))
+
+    def _encode(self, tracks: Iterable[TrackRecord]) -> Iterable[int]:
+        for record in tracks:
+            if not record.id:
+                continue
+            track_id = self.ids.setdefault(record.key, len(self.ids))
+            if track_id == len(self.records):
+                self.records.append(record)
+            yield track_id
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def membership(self, arrays: Sequence[np.ndarray]) -> np.ndarray:
+        """Boolean matrix with one row per array and one column per vocabulary ID."""
+        bitmap = np.zeros((len(arrays), len(self)), dtype=bool)
+        for row, array in zip(bitmap, arrays, strict=True):
+            row[array] = True
+        return bitmap
+
+
+def _first_occurrences(array: np.ndarray) -> np.ndarray:
+    """``array`` without repeats, keeping each ID's first position."""
+    _, first = np.unique(array, return_index=True)
+    return np.asarray(array[np.sort(first)])
+
+
+def merge_order(
+    vocabulary: TrackVocabulary,
+    arrays: Sequence[np.ndarray],
+    mode: str,
+    ratios: Sequence[int] | None = None,
+) -> np.ndarray:
+    """
+    Combine playlists given as ID arrays into one ordered array without repeats.
+
+    - union: every track, in order of first appearance.
+    - intersection: tracks in every playlist, in the first playlist's order.
+    - difference: tracks of the first playlist that are in none of the others.
+    - interleave: tracks taken from each playlist in turn, ``ratios[i]`` at a time from
+      playlist i (one each by default), skipping tracks already taken.
+    """
+    if mode == "interleave":
+        ratios = list(ratios or [1] * len(arrays))
+        if len(ratios) != len(arrays) or any(ratio <= 0 for ratio in ratios):
+            raise ValueError("Give one positive ratio per source playlist.")
+        arrays = [_first_occurrences(array) for array in arrays]
+        # The k-th track of playlist i is due at (k + 1) / ratio; ties go to earlier playlists
+        due = np.concatenate(
+            [
+                (np.arange(len(array)) + 1) / ratio
+                for array, ratio in zip(arrays, ratios, strict=True)
+            ]
+        )
+        source = np.concatenate([np.full(len(array), i) for i, array in enumerate(arrays)])
+        merged = np.concatenate(arrays)[np.lexsort((source, due))]
+        return _first_occurrences(merged)
+
+    bitmap = vocabulary.membership(arrays)
+    if mode == "union":
+        selected = bitmap.any(axis=0)
+    elif mode == "intersection":
+        selected = bitmap.all(axis=0)
+    elif mode == "difference":
+        selected = bitmap[0] & ~bitmap[1:].any(axis=0)
+    else:
+        raise ValueError(f"Unknown combine mode '{mode}', expected one of {', '.join(MODES)}.")
+    # IDs follow first appearance across all playlists; intersection and difference
+    # tracks all appear in the first playlist, so this is also its order
+    return np.flatnonzero(selected)
+
+
+def create_empty_playlist(name: str, description: str) -> str:
+    """Create a playlist on Spotify and register it locally so its tracks can be cached."""
+    playlist = create_playlist(name, description)
+    save_playlists_to_db([playlist])
+    return str(playlist["id"])
+
+
+def append_tracks(
+    playlist_id: str,
+    existing: Sequence[TrackRecord],
+    added: Sequence[TrackRecord],
+    length: int | None = None,
+) -> None:
+    """
+    Append ``added`` to a playlist currently holding ``existing`` (100 tracks per request)
+    and cache the result under the new snapshot_id.
+
+    ``length`` is the playlist's item count on Spotify. Pass it when ``existing`` may leave
+    out unavailable items or local files, so the appended tracks get their real positions.
+    """
+    if not added:
+        return
+    if length is None:
+        length = len(existing)
+    snapshot_id = add_track_uris(playlist_id, [record.track_uri for record in added])
+    record_playlist_write(
+        playlist_id,
+        snapshot_id,  # type: ignore
+        list(existing)
+        + [record.with_position(length + offset) for offset, record in enumerate(added)],
+        tracks_total=length + len(added),
+    )
+
+
+def _tracks_in_worker(playlist_id: str) -> list[TrackRecord]:
+    try:
+        return get_playlist_tracks(playlist_id)[0]
+    finally:
+        release_thread_session()
+
+
+def combine_playlists(
+    source_ids: Sequence[str],
+    mode: str = "union",
+    ratios: Sequence[int] | None = None,
+    target_id: str | None = None,
+    new_name: str | None = None,
+) -> dict:
+    """
+    Combine playlists into an existing playlist or a new one.
+
+    Tracks come from the local track cache (fetched once per changed snapshot), and are
+    deduplicated with the same key as exact duplicate removal. An existing target only
+    receives the tracks it does not already have, appended in 100-track requests.
+
+    Args:
+        source_ids (Sequence[str]): Playlist URLs, URIs or IDs to combine, in order.
+        mode (str): One of union, intersection, difference or interleave.
+        ratios (Sequence[int] | None): Tracks taken per turn from each source (interleave).
+        target_id (str | None): Playlist to add the result to.
+        new_name (str | None): Name of a playlist to create when there is no target.
+
+    Returns:
+        dict: Status, message, the target playlist, and how many tracks were added.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown combine mode '{mode}', expected one of {', '.join(MODES)}.")
+    if not source_ids:
+        raise ValueError("Give at least one playlist to combine.")
+    if not target_id and not new_name:
+        raise ValueError("Give a target playlist or a name for a new one.")
+    source_ids = [parse_playlist_id(source_id) for source_id in source_ids]
+    target_id = parse_playlist_id(target_id) if target_id else None
+    wait_for_sync()
+
+    playlist_ids = source_ids + ([target_id] if target_id else [])
+    workers = max(1, min(len(playlist_ids), get_settings().batch_workers))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="combine") as pool:
+        track_lists = list(pool.map(with_current_context(_tracks_in_worker), playlist_ids))
+
+    vocabulary = TrackVocabulary(track_lists)
+    result_ids = merge_order(vocabulary, vocabulary.arrays[: len(source_ids)], mode, ratios)
+
+    if target_id:
+        target_tracks = track_lists[-1]
+        result_ids = result_ids[~np.isin(result_ids, vocabulary.arrays[-1])]
+        # The cached tracks leave out unavailable items and local files; Spotify's count
+        # does not
+        _, length = get_playlist_snapshot(target_id)
+    else:
+        target_id = create_empty_playlist(new_name, f"Combined by Nichify ({mode})")  # type: ignore
+        target_tracks = []
+        length = 0
+
+    added = [vocabulary.records[track_id] for track_id in result_ids]
+    append_tracks(target_id, target_tracks, added, length)
+    logger.info("Combined %d playlists (%s): %d tracks added", len(source_ids), mode, len(added))
+    return {
+        "status": "success",
+        "message": (
+            f"Added {len(added)} tracks."
+            if added
+            else "The target playlist already has every track."
+        ),
+        "playlist": {"id": target_id, "url": f"https://open.spotify.com/playlist/{target_id}"},
+        "added": len(added),
+        "total": length + len(added),
+    }
@@ -0,0 +1,139 @@
+import json
+from typing import Any
+
+# Rough chars-per-token for English text and JSON; close enough for budgeting
+_CHARS_PER_TOKEN = 4
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+# Tool payload limits before results are summarized
+_MAX_LIST_ITEMS = 10
+_MAX_STRING_CHARS = 300
+_MAX_TOOL_CHARS = 2000
+
+_SUMMARY_PREFIX = "Summary of the earlier conversation:"
+_SUMMARY_LINE_CHARS = 160
+
+
+def estimate_tokens(value: Any) -> int:
+    """Approximate token count of a message, message list or tool schema."""
+    if isinstance(value, list):
+        return sum(estimate_tokens(item) for item in value)
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return len(text) // _CHARS_PER_TOKEN + _MESSAGE_OVERHEAD_TOKENS
+
+
+def _shrink(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _shrink(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) <= _MAX_LIST_ITEMS:
+            return [_shrink(item) for item in value]
+        return [_shrink(item) for item in value[:_MAX_LIST_ITEMS]] + [
+            f"... {len(value) - _MAX_LIST_ITEMS} more"
+        ]
+    if isinstance(value, str) and len(value) > _MAX_STRING_CHARS:
+        return value[:_MAX_STRING_CHARS] + "..."
+    return value
+
+
+def summarize_tool_result(result: Any) -> str:
+    """
+    Serialize a tool result for the model as compact JSON.
+
+    Tracebacks are reduced to their last line, long lists to their first items plus a
+    count, and long strings are cut, so one tool call can't flood the context.
+    """
+    if isinstance(result, dict) and "traceback" in result:
+        lines = str(result["traceback"]).strip().splitlines()
+        result = {**result, "traceback": lines[-1] if lines else ""}
+    text = json.dumps(_shrink(result), default=str)
+    if len(text) > _MAX_TOOL_CHARS:
+        text = text[:_MAX_TOOL_CHARS] + "...(truncated)"
+    return text
+
+
+class ConversationContext:
+    """
+    Message list for the menu loop, kept within a token budget.
+
+    The system prompt and tool schema are always kept. The most recent turns are
+    kept verbatim. Older turns are folded into one summary message, so the size of
+    each request stays flat however long the session runs.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        tools: Any = None,
+        budget_tokens: int = 8000,
+        recent_turns: int = 6,
+    ):
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.budget_tokens = budget_tokens
+        self.recent_turns = recent_turns
+        self._fixed_tokens = estimate_tokens(self.system_message) + (
+            estimate_tokens(tools) if tools else 0
+        )
+        self.summary_lines: list[str] = []
+        self.messages: list[Any] = [self.system_message]
+
+    def token_count(self) -> int:
+        return estimate_tokens(self.messages[1:]) + self._fixed_tokens
+
+    def _turns(self) -> list[list[Any]]:
+        """Split the history (without system/summary messages) at each user message."""
+        turns: list[list[Any]] = []
+        for message in self.messages:
+            if message.get("role") == "system":
+                continue
+            if message.get("role") == "user" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _summarize_turn(self, turn: list[Any]) -> list[str]:
+        tool_names = {
+            call["id"]: call["function"]["name"]
+            for message in turn
+            for call in message.get("tool_calls") or []
+        }
+        lines = []
+        for message in turn:
+            role = message.get("role")
+            if role == "tool":
+                name = tool_names.get(message.get("tool_call_id"), "tool")
+                try:
+                    payload = json.loads(message["content"])
+                    text = f"{payload.get('status', '')} {payload.get('message', '')}".strip()
+                except (ValueError, AttributeError):
+                    text = str(message["content"])
+                lines.append(f"- {name} -> {text}")
+            elif message.get("content"):
+                lines.append(f"- {role}: {message['content']}")
+        return [line[:_SUMMARY_LINE_CHARS] for line in lines]
+
+    def _rebuild(self, turns: list[list[Any]]) -> None:
+        messages = [self.system_message]
+        if self.summary_lines:
+            summary = "\n".join([_SUMMARY_PREFIX, *self.summary_lines])
+            messages.append({"role": "system", "content": summary})
+        for turn in turns:
+            messages.extend(turn)
+        self.messages = messages
+
+    def compact(self) -> None:
+        """Fold old turns into the summary until the history fits the budget."""
+        turns = self._turns()
+        keep = min(self.recent_turns, len(turns))
+        if len(turns) > keep:
+            for turn in turns[:-keep] if keep else turns:
+                self.summary_lines.extend(self._summarize_turn(turn))
+            turns = turns[-keep:] if keep else []
+            self._rebuild(turns)
+        while self.token_count() > self.budget_tokens and (len(turns) > 1 or self.summary_lines):
+            if len(turns) > 1:
+                self.summary_lines.extend(self._summarize_turn(turns.pop(0)))
+            else:
+                # Still too big with a single turn left: forget the oldest summary lines
+                self.summary_lines = self.summary_lines[len(self.summary_lines) // 2 + 1 :]
+            self._rebuild(turns)
@@ -1,27 +1,216 @@
+import asyncio
 from datetime import datetime, timezone, timedelta
-from typing import List
+from collections.abc import Callable, Iterable
+from typing import Any, List, TypeVar
+import hashlib
 from sqlalchemy.exc import IntegrityError
 import os
-from sqlalchemy import DateTime, create_engine, Column, Integer, String, JSON
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import threading
+from sqlalchemy import (
+    DateTime,
+    Float,
+    func,
+    ForeignKey,
+    create_engine,
+    Column,
+    Integer,
+    String,
+    JSON,
+    delete,
+    event,
+    insert,
+    inspect,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm import scoped_session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql.dml import ReturningInsert
+from . import metrics
+from .async_runner import run_sync
+from .playlist_index import invalidate_playlist_index
+from .semantic_index import get_semantic_index
+from .tag_index import invalidate_tag_index
+from .users import current_user, user_key
 from .settings import get_settings  # type: ignore
-from .spotify_handler import get_user_playlists
+from .spotify_handler import aget_user_playlists, get_all_playlist_tracks, get_playlist_snapshot_id
+from .track_records import TrackRecord, as_track_records
 import logging
 
 logger = logging.getLogger(__name__)
 
-settings = get_settings()
 
-# Construct the database URL
-DATABASE_URL = (
-    f"postgresql+psycopg://{settings.db_user}:{settings.db_password}@"
-    f"{settings.db_host}:{settings.db_port}/{settings.db_name}"
+DB_BACKENDS = ("postgres", "sqlite")
+
+# Applied to every SQLite connection: WAL lets readers run alongside the writer, and
+# NORMAL sync is durable across application crashes while skipping most fsyncs
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
 )
 
-# Initialize SQLAlchemy
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
-session = Session()
+
+def _backend() -> str:
+    backend = get_settings().db_backend
+    if backend not in DB_BACKENDS:
+        raise ValueError(f"Unknown database backend '{backend}', expected one of {DB_BACKENDS}")
+    return backend
+
+
+def _sqlite_path(user: str | None = None) -> str:
+    """The SQLite file; in server mode each user gets their own next to it."""
+    path = os.path.expanduser(get_settings().sqlite_path)
+    if user is not None:
+        root, extension = os.path.splitext(path)
+        path = f"{root}.{user_key(user)}{extension}"
+    return path
+
+
+def get_database_url(asynchronous: bool = False, user: str | None = None) -> str:
+    """
+    The database URL. ``user`` picks a server-mode user's own SQLite file; PostgreSQL
+    users share one database and are told apart by schema (see ``_for_user``).
+    """
+    settings = get_settings()
+    if _backend() == "sqlite":
+        driver = "sqlite+aiosqlite" if asynchronous else "sqlite"
+        return f"{driver}:///{_sqlite_path(user)}"
+    return (
+        f"postgresql+psycopg://{settings.db_user}:{settings.db_password}@"
+        f"{settings.db_host}:{settings.db_port}/{settings.db_name}"
+    )
+
+
+# Engines are created on first use so importing this module stays cheap
+_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+_engine_lock = threading.Lock()
+# Server mode: per-user views of the engines, sharing their connection pools
+_user_engines: dict[str, Engine] = {}
+_user_async_engines: dict[str, AsyncEngine] = {}
+_E = TypeVar("_E", Engine, AsyncEngine)
+T = TypeVar("T")
+
+
+def _pool_options() -> dict:
+    settings = get_settings()
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": True,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in _SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _new_engine(asynchronous: bool, user: str | None = None) -> Any:
+    """An engine for the shared database, or for ``user``'s own SQLite file."""
+    url = get_database_url(asynchronous, user)
+    if _backend() == "postgres":
+        engine = (create_async_engine if asynchronous else create_engine)(url, **_pool_options())
+    else:
+        os.makedirs(os.path.dirname(_sqlite_path(user)) or ".", exist_ok=True)
+        engine = (create_async_engine if asynchronous else create_engine)(
+            url,
+            poolclass=AsyncAdaptedQueuePool if asynchronous else QueuePool,
+            # Sessions move between worker threads; SQLite's own locking keeps this safe
+            connect_args={"check_same_thread": False},
+            **_pool_options(),
+        )
+        event.listen(getattr(engine, "sync_engine", engine), "connect", _set_sqlite_pragmas)
+    metrics.instrument_engine(engine)
+    return engine
+
+
+def user_schema(user_id: str) -> str:
+    """The PostgreSQL schema holding a user's tables in server mode."""
+    return f"nichify_{user_key(user_id)}"
+
+
+def _for_user(engine: _E, views: dict[str, _E], asynchronous: bool) -> _E:
+    if (user := current_user()) is None:
+        return engine
+    if (view := views.get(user)) is None:
+        if engine.dialect.name == "sqlite":
+            # SQLite has no schemas; every user gets a database file (and pool) of their own
+            view = views[user] = _new_engine(asynchronous, user)
+        else:
+            # Unqualified table names resolve to the user's schema; the pool stays shared
+            view = views[user] = engine.execution_options(
+                schema_translate_map={None: user_schema(user)}
+            )
+    return view
+
+
+def get_engine() -> Engine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = _new_engine(asynchronous=False)
+        return _for_user(_engine, _user_engines, asynchronous=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine for the asyncio path; its pool belongs to the shared event loop (async_runner)."""
+    global _async_engine
+    with _engine_lock:
+        if _async_engine is None:
+            _async_engine = _new_engine(asynchronous=True)
+        return _for_user(_async_engine, _user_async_engines, asynchronous=True)
+
+
+def create_user_schema() -> None:
+    """Create the current user's schema and tables (server mode) if they do not exist."""
+    if (user := current_user()) is None:
+        return
+    if get_engine().dialect.name != "sqlite":
+        with get_engine().begin() as connection:
+            connection.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS "{user_schema(user)}"')
+    create_tables()
+
+
+Session = sessionmaker()
+# Thread-local sessions: tool calls and page fetches may touch the DB from worker threads.
+# Each one is bound to the engine when the thread first uses it. In server mode a thread
+# gets a separate session per user, bound to that user's schema.
+session: scoped_session[OrmSession] = scoped_session(
+    lambda: Session(bind=get_engine()),  # type: ignore[arg-type]
+    scopefunc=lambda: (threading.get_ident(), current_user()),
+)
+AsyncSessionLocal = async_sessionmaker(expire_on_commit=False)
+
+
+def new_async_session() -> AsyncSession:
+    return AsyncSessionLocal(bind=get_async_engine())
+
+
+# Set once the background init_db() started by start_background_sync() has finished
+_sync_done = threading.Event()
+_sync_thread: threading.Thread | None = None
+
+
+# Memoized get_playlist_fingerprint() per user; reset whenever a stored snapshot_id changes
+_playlist_fingerprints: dict[str | None, str] = {}
 
 
 class Base(DeclarativeBase):
@@ -30,12 +219,12 @@ class Base(DeclarativeBase):
 
 class Song(Base):
     __tablename__ = "songs"
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(String, primary_key=True)  # Spotify track ID
     title = Column(String, nullable=False)
     artist = Column(String, nullable=False)
     album = Column(String, nullable=True)
-    length = Column(Integer, nullable=True)  # Length in seconds
-    song_metadata = Column(JSON, nullable=True)  # Additional metadata
+    duration_ms = Column(Integer, nullable=True)
+    song_metadata = Column(JSON, nullable=True)  # Additional metadata (uri, artist list)
 
 
 class Playlist(Base):
@@ -49,56 +238,584 @@ class Playlist(Base):
     last_modified = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 
+class PlaylistTrack(Base):
+    __tablename__ = "playlist_tracks"
+    playlist_id = Column(String, ForeignKey("playlists.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    song_id = Column(String, ForeignKey("songs.id"), nullable=False, index=True)
+
+
+class PlaylistCache(Base):
+    """Which snapshot of a playlist the local track cache and dedupe results belong to."""
+
+    __tablename__ = "playlist_cache"
+    playlist_id = Column(String, ForeignKey("playlists.id", ondelete="CASCADE"), primary_key=True)
+    tracks_snapshot_id = Column(String, nullable=True)
+    deduped_snapshot_id = Column(String, nullable=True)
+    cached_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class TrackFeatures(Base):
+    """
+    Spotify audio features per track, fetched once. A row whose values are all null means
+    Spotify has no features for the track, so it is not requested again either.
+    """
+
+    __tablename__ = "track_features"
+    song_id = Column(String, primary_key=True)  # Spotify track ID
+    tempo = Column(Float, nullable=True, index=True)  # BPM
+    energy = Column(Float, nullable=True, index=True)
+    danceability = Column(Float, nullable=True, index=True)
+    valence = Column(Float, nullable=True)
+    acousticness = Column(Float, nullable=True)
+    instrumentalness = Column(Float, nullable=True)
+    loudness = Column(Float, nullable=True)
+    key = Column(Integer, nullable=True)
+    mode = Column(Integer, nullable=True)
+    time_signature = Column(Integer, nullable=True)
+    fetched_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)  # Normalized: lowercase, single spaces
+
+
+class TrackTag(Base):
+    __tablename__ = "track_tags"
+    song_id = Column(String, primary_key=True)  # Spotify track ID
+    # The primary key indexes lookups by song; this index serves lookups by tag
+    tag_id = Column(
+        Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+
+
+# Rows per INSERT statement; keeps large libraries under Postgres' 65535 bind-parameter limit
+_UPSERT_BATCH_SIZE = 1000
+
+_PLAYLIST_COLUMNS = ("name", "description", "tracks_total", "snapshot_id", "image_url")
+
+
+def _playlist_upsert_statement(
+    rows: list[dict], dialect: str = "postgresql"
+) -> ReturningInsert[tuple[str]]:
+    """
+    INSERT ... ON CONFLICT (id) DO UPDATE that only touches rows whose snapshot changed.
+    PostgreSQL and SQLite (3.35+) share the syntax, including RETURNING.
+    """
+    stmt = (sqlite_insert if dialect == "sqlite" else pg_insert)(Playlist).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Playlist.id],
+        set_={
+            **{column: stmt.excluded[column] for column in _PLAYLIST_COLUMNS},
+            "last_modified": stmt.excluded.last_modified,
+        },
+        where=Playlist.snapshot_id != stmt.excluded.snapshot_id,
+    ).returning(Playlist.id)
+
+
 def save_playlist_to_db(raw_playlist_data: dict):
-    # sourcery skip: extract-method
-    try:
-        playlist_id = raw_playlist_data["id"]
-        name = raw_playlist_data["name"]
-        description = raw_playlist_data.get("description")
-        tracks_total = raw_playlist_data["tracks_total"]
-        snapshot_id = raw_playlist_data["snapshot_id"]
-        image_url = raw_playlist_data.get("image_url")
-
-        if existing_playlist := session.query(Playlist).filter_by(id=playlist_id).first():
-            if existing_playlist.snapshot_id == snapshot_id:
-                logger.info("Playlist '%s' already up-to-date. Skipping...", name)
-                return
-            existing_playlist.snapshot_id = snapshot_id
-            existing_playlist.last_modified = datetime.now(timezone.utc)  # type: ignore
-            existing_playlist.name = name
-            existing_playlist.description = description
-            existing_playlist.tracks_total = tracks_total
-            existing_playlist.image_url = image_url
+    save_playlists_to_db([raw_playlist_data])
+
+
+async def asave_playlists_to_db(
+    playlists_data: list[dict] | None = None, strict: bool = False
+) -> set[str]:
+    """
+    Insert or update playlists in a single batched upsert.
+
+    Existing rows are only rewritten when their snapshot_id changed. Without
+    ``playlists_data`` the user's playlists are fetched from Spotify first. Database
+    errors are logged and reported as no changes, or re-raised if ``strict`` is set.
+
+    Returns:
+        set[str]: IDs of the playlists that were inserted or updated.
+    """
+    if playlists_data is None:
+        playlists_data = await aget_user_playlists()
+
+    now = datetime.now(timezone.utc)
+    # Postgres refuses to touch the same row twice in one statement, so collapse repeats
+    rows = {
+        playlist["id"]: {
+            "id": playlist["id"],
+            "name": playlist["name"],
+            "description": playlist.get("description"),
+            "tracks_total": playlist["tracks_total"],
+            "snapshot_id": playlist["snapshot_id"],
+            "image_url": playlist.get("image_url"),
+            "last_modified": now,
+        }
+        for playlist in playlists_data
+    }
+    if not rows:
+        return set()
 
+    batch = list(rows.values())
+    changed: set[str] = set()
+    dialect = "sqlite" if _backend() == "sqlite" else "postgresql"
+    async with new_async_session() as db:
+        try:
+            for start in range(0, len(batch), _UPSERT_BATCH_SIZE):
+                stmt = _playlist_upsert_statement(
+                    batch[start : start + _UPSERT_BATCH_SIZE], dialect
+                )
+                changed.update((await db.execute(stmt)).scalars())
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            logger.error("Database integrity error: %s", e)
+            if strict:
+                raise
+            return set()
+        except Exception:
+            await db.rollback()
+            logger.exception("Error saving playlists")
+            if strict:
+                raise
+            return set()
+
+    if changed:
+        invalidate_playlist_index()
+        invalidate_playlist_fingerprint()
+        # Sync ORM work; run it on a worker thread so the loop keeps serving other requests
+        await asyncio.to_thread(_in_worker_thread, refresh_semantic_index, list(changed))
+    for row in batch:
+        if row["id"] in changed:
+            logger.info("Playlist '%s' saved successfully!", row["name"])
         else:
-            # Add new playlist
-            new_playlist = Playlist(
-                id=playlist_id,
-                name=name,
-                description=description,
-                tracks_total=tracks_total,
-                snapshot_id=snapshot_id,
-                image_url=image_url,
-            )
-            session.add(new_playlist)
+            logger.info("Playlist '%s' already up-to-date. Skipping...", row["name"])
+    return changed
+
+
+def save_playlists_to_db(
+    playlists_data: list[dict] | None = None, strict: bool = False
+) -> set[str]:
+    return run_sync(asave_playlists_to_db(playlists_data, strict))
+
+
+def delete_playlists_except(playlist_ids: Iterable[str]) -> set[str]:
+    """
+    Delete the stored playlists not in ``playlist_ids``, with their track caches, e.g.
+    playlists deleted or unfollowed on Spotify since the last sync.
 
-        # Commit changes
+    Returns:
+        set[str]: IDs of the deleted playlists.
+    """
+    keep = set(playlist_ids)
+    stale = [pid for (pid,) in session.query(Playlist.id) if pid not in keep]
+    if not stale:
+        return set()
+    try:
+        for start in range(0, len(stale), _UPSERT_BATCH_SIZE):
+            batch = stale[start : start + _UPSERT_BATCH_SIZE]
+            session.execute(delete(PlaylistTrack).where(PlaylistTrack.playlist_id.in_(batch)))
+            session.execute(delete(PlaylistCache).where(PlaylistCache.playlist_id.in_(batch)))
+            session.execute(delete(Playlist).where(Playlist.id.in_(batch)))
         session.commit()
-        logger.info("Playlist '%s' saved successfully!", name)
+    except Exception:
+        session.rollback()
+        logger.exception("Error deleting playlists")
+        raise
+    invalidate_playlist_index()
+    invalidate_playlist_fingerprint()
+    index = get_semantic_index()
+    index.remove(stale)
+    index.save_soon()
+    logger.info("Deleted %d playlists no longer in the library", len(stale))
+    return set(stale)
+
+
+def _in_worker_thread(function: Callable[..., T], *args: Any) -> T:
+    try:
+        return function(*args)
+    finally:
+        release_thread_session()
+
+
+def _song_row(record: TrackRecord) -> dict:
+    return {
+        "id": record.id,
+        "title": record.name,
+        "artist": record.artist,
+        "album": record.album,
+        "duration_ms": record.duration_ms,
+        "song_metadata": {"uri": record.uri, "artists": list(record.artists)},
+    }
+
+
+def _song_to_record(song: Song, position: int) -> TrackRecord:
+    metadata: dict = song.song_metadata or {}  # type: ignore
+    return TrackRecord(
+        song.id,  # type: ignore
+        metadata.get("uri") or f"spotify:track:{song.id}",
+        song.title,  # type: ignore
+        tuple(metadata.get("artists", ())),
+        song.album,  # type: ignore
+        song.duration_ms,  # type: ignore
+        position,
+    )
+
+
+def _get_playlist_cache(playlist_id: str) -> PlaylistCache:
+    cache = session.get(PlaylistCache, playlist_id)
+    if cache is None:
+        cache = PlaylistCache(playlist_id=playlist_id)
+        session.add(cache)
+    return cache
+
+
+def cache_playlist_tracks(
+    playlist_id: str, snapshot_id: str, tracks: Iterable[dict | TrackRecord]
+) -> None:
+    """
+    Store a playlist's tracks and their positions in the local track cache.
 
-    except IntegrityError as e:
+    Items without a Spotify ID (local files, unavailable tracks) are skipped, but the
+    positions of the remaining items are kept as they are on Spotify. An item's
+    ``"position"`` key takes precedence over its index in ``tracks``.
+    """
+    try:
+        cached = _write_track_cache(playlist_id, snapshot_id, tracks)
+        session.commit()
+        logger.info("Cached %d tracks for playlist %s", cached, playlist_id)
+    except Exception:
         session.rollback()
-        logger.error("Database integrity error: %s", e)
+        logger.exception("Error caching playlist tracks")
+        return
+    # The playlist's top artists may have changed
+    refresh_semantic_index([playlist_id])
+
+
+def _write_track_cache(
+    playlist_id: str, snapshot_id: str, tracks: Iterable[dict | TrackRecord]
+) -> int:
+    """Replace the playlist's cached rows in the current transaction; returns the row count."""
+    memberships = []
+    songs: dict[str, dict] = {}
+    for record in as_track_records(tracks):
+        if not record.id:
+            continue
+        songs.setdefault(record.id, _song_row(record))
+        memberships.append(
+            {"playlist_id": playlist_id, "position": record.position, "song_id": record.id}
+        )
+
+    known_ids = {song_id for (song_id,) in session.query(Song.id).filter(Song.id.in_(list(songs)))}
+    if new_songs := [row for song_id, row in songs.items() if song_id not in known_ids]:
+        session.execute(insert(Song), new_songs)
+        invalidate_tag_index()  # NOT queries range over the whole library
+
+    session.execute(delete(PlaylistTrack).where(PlaylistTrack.playlist_id == playlist_id))
+    if memberships:
+        session.execute(insert(PlaylistTrack), memberships)
+
+    cache = _get_playlist_cache(playlist_id)
+    cache.tracks_snapshot_id = snapshot_id  # type: ignore
+    cache.cached_at = datetime.now(timezone.utc)  # type: ignore
+    return len(memberships)
+
+
+def get_playlist_tracks(playlist_id: str) -> tuple[list[TrackRecord], str]:
+    """
+    Return a playlist's tracks and the snapshot_id they belong to.
+
+    Items are served from the local track cache while the playlist's stored snapshot_id is
+    unchanged. Otherwise the live snapshot is read first, then the tracks are fetched
+    and cached under it, so the snapshot always describes the returned positions.
+    """
+    playlist = session.get(Playlist, playlist_id)
+    cache = session.get(PlaylistCache, playlist_id)
+    cached_snapshot = cache.tracks_snapshot_id if cache is not None else None
+    if playlist is not None and cached_snapshot == playlist.snapshot_id:
+        metrics.inc("track_cache_requests_total", result="hit")
+        logger.info("Using cached tracks for playlist '%s'", playlist.name)
+        rows = (
+            session.query(PlaylistTrack.position, Song)
+            .join(Song, Song.id == PlaylistTrack.song_id)
+            .filter(PlaylistTrack.playlist_id == playlist_id)
+            .order_by(PlaylistTrack.position)
+            .all()
+        )
+        return [_song_to_record(song, position) for position, song in rows], playlist.snapshot_id  # type: ignore
+
+    metrics.inc("track_cache_requests_total", result="miss")
+    snapshot_id = get_playlist_snapshot_id(playlist_id)
+    tracks = list(as_track_records(get_all_playlist_tracks(playlist_id)))
+    # Only the user's synced playlists have a row to cache against
+    if playlist is not None:
+        if playlist.snapshot_id != snapshot_id:
+            playlist.snapshot_id = snapshot_id  # type: ignore
+            invalidate_playlist_fingerprint()
+            playlist.last_modified = datetime.now(timezone.utc)  # type: ignore
+        cache_playlist_tracks(playlist_id, snapshot_id, tracks)
+    return tracks, snapshot_id
+
+
+def is_playlist_deduped(playlist_id: str) -> bool:
+    """True if the playlist was already found duplicate-free at its current snapshot."""
+    playlist = session.get(Playlist, playlist_id)
+    cache = session.get(PlaylistCache, playlist_id)
+    return bool(
+        playlist is not None
+        and cache is not None
+        and cache.deduped_snapshot_id == playlist.snapshot_id
+    )
+
+
+def mark_playlist_deduped(
+    playlist_id: str,
+    snapshot_id: str | None = None,
+    tracks: Iterable[dict | TrackRecord] | None = None,
+) -> None:
+    """
+    Record that the playlist has no exact duplicates at ``snapshot_id``.
+
+    Pass the snapshot returned by our own write calls so the stored playlist snapshot
+    follows the change; omit it to mark the currently stored snapshot as clean. If the
+    playlist's items at that snapshot are known, pass them as ``tracks`` to refresh the
+    track cache instead of re-downloading the playlist next time.
+    """
+    try:
+        playlist = session.get(Playlist, playlist_id)
+        if playlist is None:
+            return
+        if snapshot_id is not None and snapshot_id != playlist.snapshot_id:
+            playlist.snapshot_id = snapshot_id  # type: ignore
+            invalidate_playlist_fingerprint()
+            playlist.last_modified = datetime.now(timezone.utc)  # type: ignore
+        _get_playlist_cache(playlist_id).deduped_snapshot_id = playlist.snapshot_id
+        session.commit()
     except Exception:
         session.rollback()
-        logger.exception("Error saving playlist")
+        logger.exception("Error recording dedupe result")
+        return
+    if tracks is not None:
+        cache_playlist_tracks(playlist_id, playlist.snapshot_id, tracks)  # type: ignore
 
 
-def save_playlists_to_db(playlists_data=None):
-    if playlists_data is None:
-        playlists_data = get_user_playlists()
-    for playlist in playlists_data:
-        save_playlist_to_db(playlist)
+def record_playlist_write(
+    playlist_id: str,
+    snapshot_id: str,
+    tracks: Iterable[dict | TrackRecord],
+    tracks_total: int | None = None,
+) -> None:
+    """
+    Store the snapshot_id returned by one of our own writes, with the playlist's tracks at
+    that snapshot, so the next read is served from the track cache. Both are written in
+    one transaction: if the tracks cannot be cached, the old snapshot_id is kept and the
+    next read fetches the playlist again.
+    """
+    try:
+        playlist = session.get(Playlist, playlist_id)
+        if playlist is None:
+            return
+        if changed := snapshot_id != playlist.snapshot_id:
+            playlist.snapshot_id = snapshot_id  # type: ignore
+            playlist.last_modified = datetime.now(timezone.utc)  # type: ignore
+        if tracks_total is not None:
+            playlist.tracks_total = tracks_total  # type: ignore
+        cached = _write_track_cache(playlist_id, snapshot_id, tracks)
+        session.commit()
+        logger.info("Cached %d tracks for playlist %s", cached, playlist_id)
+    except Exception:
+        session.rollback()
+        logger.exception("Error recording playlist write")
+        return
+    if changed:
+        invalidate_playlist_fingerprint()
+    refresh_semantic_index([playlist_id])
+
+
+def get_playlist_top_artists(playlist_ids: list[str], limit: int = 5) -> dict[str, list[str]]:
+    """Most frequent artists per playlist, from the local track cache."""
+    rows = (
+        session.query(PlaylistTrack.playlist_id, Song.artist, func.count().label("n"))
+        .join(Song, Song.id == PlaylistTrack.song_id)
+        .filter(PlaylistTrack.playlist_id.in_(playlist_ids))
+        .group_by(PlaylistTrack.playlist_id, Song.artist)
+        .order_by(PlaylistTrack.playlist_id, func.count().desc())
+        .all()
+    )
+    top: dict[str, list[str]] = {}
+    for playlist_id, artist, _ in rows:
+        artists = top.setdefault(playlist_id, [])
+        if len(artists) < limit:
+            artists.append(artist)
+    return top
+
+
+def get_track_features(track_ids: list[str]) -> list[TrackFeatures]:
+    """Stored audio-feature rows for whichever of ``track_ids`` have been fetched before."""
+    rows: list[TrackFeatures] = []
+    for start in range(0, len(track_ids), _UPSERT_BATCH_SIZE):
+        batch = track_ids[start : start + _UPSERT_BATCH_SIZE]
+        rows.extend(session.query(TrackFeatures).filter(TrackFeatures.song_id.in_(batch)))
+    return rows
+
+
+def save_track_features(rows: list[dict]) -> None:
+    """Insert audio-feature rows (keyed by ``song_id``) in batches, in one transaction."""
+    try:
+        known_ids = {row.song_id for row in get_track_features([row["song_id"] for row in rows])}
+        new_rows = [row for row in rows if row["song_id"] not in known_ids]
+        for start in range(0, len(new_rows), _UPSERT_BATCH_SIZE):
+            session.execute(insert(TrackFeatures), new_rows[start : start + _UPSERT_BATCH_SIZE])
+        session.commit()
+    except Exception:
+        session.rollback()
+        logger.exception("Error saving track features")
+
+
+def _get_tag_ids(names: Iterable[str], create: bool = False) -> dict[str, int]:
+    names = list(dict.fromkeys(names))
+    query = session.query(Tag.name, Tag.id)
+    tag_ids = {name: tag_id for name, tag_id in query.filter(Tag.name.in_(names))}
+    if create and (new_names := [name for name in names if name not in tag_ids]):
+        session.execute(insert(Tag), [{"name": name} for name in new_names])
+        tag_ids.update((name, tag_id) for name, tag_id in query.filter(Tag.name.in_(new_names)))
+    return tag_ids
+
+
+def _existing_track_tags(song_ids: list[str], tag_ids: Iterable[int]) -> set[tuple[str, int]]:
+    existing: set[tuple[str, int]] = set()
+    tag_ids = list(tag_ids)
+    for start in range(0, len(song_ids), _UPSERT_BATCH_SIZE):
+        rows = session.query(TrackTag.song_id, TrackTag.tag_id).filter(
+            TrackTag.song_id.in_(song_ids[start : start + _UPSERT_BATCH_SIZE]),
+            TrackTag.tag_id.in_(tag_ids),
+        )
+        existing.update((song_id, tag_id) for song_id, tag_id in rows)
+    return existing
+
+
+def add_track_tags(pairs: Iterable[tuple[str, str]]) -> int:
+    """
+    Tag tracks, given (song_id, normalized tag name) pairs, creating tags as needed.
+    Pairs that already exist are skipped; all rows go in batched INSERTs and one commit.
+
+    Returns:
+        int: The number of new (track, tag) rows.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    try:
+        tag_ids = _get_tag_ids((name for _, name in pairs), create=True)
+        existing = _existing_track_tags(list({song_id for song_id, _ in pairs}), tag_ids.values())
+        rows = [
+            {"song_id": song_id, "tag_id": tag_ids[name]}
+            for song_id, name in pairs
+            if (song_id, tag_ids[name]) not in existing
+        ]
+        for start in range(0, len(rows), _UPSERT_BATCH_SIZE):
+            session.execute(insert(TrackTag), rows[start : start + _UPSERT_BATCH_SIZE])
+        session.commit()
+        return len(rows)
+    except Exception:
+        session.rollback()
+        logger.exception("Error tagging tracks")
+        raise
+
+
+def remove_track_tags(pairs: Iterable[tuple[str, str]]) -> None:
+    """Untag tracks, given (song_id, normalized tag name) pairs, in one transaction."""
+    by_tag: dict[str, list[str]] = {}
+    for song_id, name in pairs:
+        by_tag.setdefault(name, []).append(song_id)
+    try:
+        tag_ids = _get_tag_ids(by_tag)
+        for name, song_ids in by_tag.items():
+            if name not in tag_ids:
+                continue
+            for start in range(0, len(song_ids), _UPSERT_BATCH_SIZE):
+                session.execute(
+                    delete(TrackTag).where(
+                        TrackTag.tag_id == tag_ids[name],
+                        TrackTag.song_id.in_(song_ids[start : start + _UPSERT_BATCH_SIZE]),
+                    )
+                )
+        session.commit()
+    except Exception:
+        session.rollback()
+        logger.exception("Error untagging tracks")
+        raise
+
+
+def get_all_track_tags() -> list[tuple[str, str]]:
+    """Every (song_id, tag name) pair."""
+    rows = session.query(TrackTag.song_id, Tag.name).join(Tag, Tag.id == TrackTag.tag_id)
+    return [(song_id, name) for song_id, name in rows]
+
+
+def get_library_song_ids() -> list[str]:
+    """IDs of every track in the local track cache."""
+    return [song_id for (song_id,) in session.query(Song.id).order_by(Song.id)]
+
+
+def get_song_records(song_ids: list[str]) -> list[TrackRecord]:
+    """
+    Records for ``song_ids`` in order, positioned by their index. Tracks missing from the
+    track cache get a record with only their ID.
+    """
+    songs: dict[str, Song] = {}
+    for start in range(0, len(song_ids), _UPSERT_BATCH_SIZE):
+        batch = song_ids[start : start + _UPSERT_BATCH_SIZE]
+        for song in session.query(Song).filter(Song.id.in_(batch)):
+            songs[song.id] = song  # type: ignore
+    return [
+        (
+            _song_to_record(songs[song_id], position)
+            if song_id in songs
+            else TrackRecord(song_id, None, "", (), None, None, position)
+        )
+        for position, song_id in enumerate(song_ids)
+    ]
+
+
+def get_playlist_name(playlist_id: str) -> str | None:
+    playlist = session.get(Playlist, playlist_id)
+    return playlist.name if playlist is not None else None  # type: ignore
+
+
+def refresh_semantic_index(playlist_ids: list[str]) -> None:
+    """
+    Re-vectorize the given playlists in the local semantic search index. The index file is
+    rewritten shortly after, once for all the refreshes made by then.
+    """
+    if not playlist_ids:
+        return
+    try:
+        playlists = session.query(Playlist).filter(Playlist.id.in_(playlist_ids)).all()
+        artists = get_playlist_top_artists(playlist_ids)
+        index = get_semantic_index()
+        index.upsert(
+            [
+                {
+                    "id": playlist.id,
+                    "name": playlist.name,
+                    "description": playlist.description,
+                    "artists": artists.get(playlist.id, []),  # type: ignore
+                }
+                for playlist in playlists
+            ]
+        )
+        index.save_soon()
+    except Exception:
+        logger.exception("Error updating semantic playlist index")
+
+
+def get_playlist_fingerprint() -> str:
+    """Short hash of every stored playlist ID and snapshot_id; changes with any playlist."""
+    user = current_user()
+    if (fingerprint := _playlist_fingerprints.get(user)) is None:
+        rows = session.query(Playlist.id, Playlist.snapshot_id).order_by(Playlist.id).all()
+        digest = hashlib.sha256("\n".join(f"{pid}:{snap}" for pid, snap in rows).encode())
+        fingerprint = _playlist_fingerprints[user] = digest.hexdigest()[:16]
+    return fingerprint
+
+
+def invalidate_playlist_fingerprint() -> None:
+    _playlist_fingerprints.pop(current_user(), None)
 
 
 def get_recently_modified_playlists(days_cutoff: int = 30) -> list[Playlist]:
@@ -115,9 +832,43 @@ def get_recently_modified_playlists(days_cutoff: int = 30) -> list[Playlist]:
     return filtered
 
 
+def release_thread_session() -> None:
+    """Close the calling thread's session; call from worker threads when they finish."""
+    session.remove()
+
+
+def _rebuild_legacy_song_cache(connection: Connection) -> None:
+    """
+    Databases created before the track cache have a ``songs`` table keyed by an integer
+    autoincrement ID, which nothing wrote to. create_all() leaves existing tables as they
+    are, so drop it (and any cache rows built on it) for create_all() to recreate with
+    Spotify track IDs.
+    """
+    schema = (connection.get_execution_options().get("schema_translate_map") or {}).get(None)
+    inspector = inspect(connection)
+    if not inspector.has_table(Song.__tablename__, schema=schema):
+        return
+    columns = {c["name"]: c["type"] for c in inspector.get_columns("songs", schema=schema)}
+    if isinstance(columns.get("id"), String):
+        return
+    logger.warning("Rebuilding the songs table: it predates the track cache's string IDs")
+    tables = Base.metadata.tables
+    tables[PlaylistTrack.__tablename__].drop(connection, checkfirst=True)
+    tables[Song.__tablename__].drop(connection)
+    if inspector.has_table(PlaylistCache.__tablename__, schema=schema):
+        connection.execute(update(PlaylistCache).values(tracks_snapshot_id=None))
+
+
+def create_tables() -> None:
+    """Create any missing tables, first upgrading a ``songs`` table from before the cache."""
+    with get_engine().begin() as connection:
+        _rebuild_legacy_song_cache(connection)
+        Base.metadata.create_all(connection)
+
+
 def drop_all_tables():
     try:
-        Base.metadata.drop_all(engine)
+        Base.metadata.drop_all(get_engine())
         logger.info("All tables dropped successfully!")
     except Exception:
         logger.exception("Error dropping tables")
@@ -127,13 +878,51 @@ def init_db(drop: bool = False):
     try:
         if drop:
             drop_all_tables()
-        Base.metadata.create_all(engine)
+        create_tables()
         save_playlists_to_db()
         logger.info("Database initialized successfully!")
     except Exception:
         logger.exception("Error initializing the database")
 
 
+def _background_sync(drop: bool) -> None:
+    try:
+        init_db(drop=drop)
+    finally:
+        release_thread_session()
+        _sync_done.set()
+
+
+def start_background_sync(drop: bool = False) -> threading.Thread:
+    """
+    Run init_db() (schema plus the Spotify playlist sync) on a daemon thread, so the
+    prompt can be shown right away. Calling it again while a sync is running is a no-op.
+    """
+    global _sync_thread
+    if _sync_thread is not None and _sync_thread.is_alive():
+        return _sync_thread
+    _sync_done.clear()
+    _sync_thread = threading.Thread(
+        target=_background_sync, args=(drop,), name="playlist-sync", daemon=True
+    )
+    _sync_thread.start()
+    return _sync_thread
+
+
+def wait_for_sync(timeout: float | None = None) -> bool:
+    """
+    Block until the background sync has finished; returns at once when none was started.
+
+    Returns:
+        bool: False if ``timeout`` expired first.
+    """
+    if _sync_thread is None:
+        return True
+    if not _sync_done.is_set():
+        logger.info("Waiting for the playlist sync to finish...")
+    return _sync_done.wait(timeout)
+
+
 if __name__ == "__main__":
     import sys
 
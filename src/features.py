@@ -0,0 +1,264 @@
+import logging
+import threading
+from collections.abc import Sequence
+
+import numpy as np
+
+from .combine import append_tracks, create_empty_playlist
+from .db_handler import (
+    get_playlist_name,
+    get_playlist_tracks,
+    get_track_features,
+    save_track_features,
+    wait_for_sync,
+)
+from .spotify_handler import get_audio_features, parse_playlist_id
+from .track_records import TrackRecord
+
+logger = logging.getLogger(__name__)
+
+# Audio features kept as float columns for splitting and filtering
+FEATURE_COLUMNS = (
+    "tempo",
+    "energy",
+    "danceability",
+    "valence",
+    "acousticness",
+    "instrumentalness",
+    "loudness",
+)
+# Stored alongside, but not used for splitting
+_EXTRA_COLUMNS = ("key", "mode", "time_signature")
+
+# Bucket boundaries used when a split does not give its own
+DEFAULT_EDGES: dict[str, tuple[float, ...]] = {
+    "tempo": (90, 110, 130, 150),
+    "energy": (0.33, 0.66),
+    "danceability": (0.33, 0.66),
+    "valence": (0.33, 0.66),
+    "acousticness": (0.5,),
+    "instrumentalness": (0.5,),
+    "loudness": (-12, -6),
+}
+_UNITS = {"tempo": " BPM", "loudness": " dB"}
+UNKNOWN_BUCKET = "unknown"
+
+
+def _feature_row(track_id: str, features: dict | None) -> dict:
+    features = features or {}
+    return {
+        "song_id": track_id,
+        **{column: features.get(column) for column in FEATURE_COLUMNS + _EXTRA_COLUMNS},
+    }
+
+
+class FeatureStore:
+    """
+    Track audio features as NumPy columns, one float per track and feature (NaN when
+    Spotify has no value).
+
+    Tracks are looked up in memory, then in the track_features table, and only tracks
+    never seen before are requested from Spotify, 100 IDs per request. Fetched features,
+    including empty answers, are stored so no track is requested twice.
+    """
+
+    def __init__(self) -> None:
+        self.row_of: dict[str, int] = {}
+        self.values: np.ndarray = np.empty((len(FEATURE_COLUMNS), 0))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def load(self, track_ids: Sequence[str]) -> None:
+        """
+        Make sure every track in ``track_ids`` has a row in memory.
+
+        The table and Spotify are read without holding the lock, so callers needing
+        features already in memory never wait on another caller's I/O. Two callers may
+        then fetch the same new track; the first one's row is kept.
+        """
+        with self._lock:
+            missing = [tid for tid in dict.fromkeys(track_ids) if tid not in self.row_of]
+        if not missing:
+            return
+        rows: dict[str, dict] = {
+            str(row.song_id): {column: getattr(row, column) for column in FEATURE_COLUMNS}
+            for row in get_track_features(missing)
+        }
+        if to_fetch := [tid for tid in missing if tid not in rows]:
+            logger.info("Fetching audio features for %d tracks", len(to_fetch))
+            fetched = [
+                _feature_row(tid, features)
+                for tid, features in zip(to_fetch, get_audio_features(to_fetch), strict=True)
+            ]
+            save_track_features(fetched)
+            rows.update((row["song_id"], row) for row in fetched)
+
+        values = np.array(
+            [[rows[tid][column] for tid in missing] for column in FEATURE_COLUMNS],
+            dtype=np.float64,
+        ).reshape(
+            len(FEATURE_COLUMNS), len(missing)
+        )  # None becomes NaN
+        with self._lock:
+            new = [i for i, tid in enumerate(missing) if tid not in self.row_of]
+            offset = len(self.row_of)
+            self.row_of.update((missing[i], offset + n) for n, i in enumerate(new))
+            self.values = np.concatenate([self.values, values[:, new]], axis=1)
+
+    def columns(self, track_ids: Sequence[str]) -> dict[str, np.ndarray]:
+        """Feature name -> array of that feature for ``track_ids``, in order."""
+        self.load(track_ids)
+        with self._lock:
+            rows = np.fromiter((self.row_of[tid] for tid in track_ids), np.intp, len(track_ids))
+            return {column: self.values[i, rows] for i, column in enumerate(FEATURE_COLUMNS)}
+
+
+_store: FeatureStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_feature_store() -> FeatureStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FeatureStore()
+        return _store
+
+
+def _check_feature(feature: str) -> None:
+    if feature not in FEATURE_COLUMNS:
+        raise ValueError(
+            f"Unknown feature '{feature}', expected one of {', '.join(FEATURE_COLUMNS)}."
+        )
+
+
+def _bucket_labels(feature: str, edges: Sequence[float]) -> list[str]:
+    unit = _UNITS.get(feature, "")
+    bounds = [f"{edge:g}" for edge in edges]
+    return (
+        [f"< {bounds[0]}{unit}"]
+        + [f"{low}-{high}{unit}" for low, high in zip(bounds, bounds[1:], strict=False)]
+        + [f">= {bounds[-1]}{unit}"]
+    )
+
+
+def split_tracks(
+    tracks: Sequence[TrackRecord], feature: str = "tempo", edges: Sequence[float] | None = None
+) -> dict[str, list[TrackRecord]]:
+    """
+    Bucket tracks by one audio feature.
+
+    Args:
+        tracks (Sequence[TrackRecord]): Tracks to split; local files are left out.
+        feature (str): One of FEATURE_COLUMNS.
+        edges (Sequence[float] | None): Ascending bucket boundaries. Defaults to
+            DEFAULT_EDGES for the feature.
+
+    Returns:
+        dict[str, list[TrackRecord]]: Bucket label -> tracks in playlist order, lowest
+        bucket first, with tracks lacking the feature under UNKNOWN_BUCKET. Empty buckets
+        are left out.
+    """
+    _check_feature(feature)
+    edges = sorted(edges or DEFAULT_EDGES[feature])
+    records = [record for record in tracks if record.id]
+    columns = get_feature_store().columns([record.id for record in records])  # type: ignore
+    values = columns[feature]
+    buckets = np.digitize(values, edges)
+    buckets[np.isnan(values)] = len(edges) + 1
+    labels = _bucket_labels(feature, edges) + [UNKNOWN_BUCKET]
+    return {
+        labels[bucket]: [records[i] for i in np.flatnonzero(buckets == bucket)]
+        for bucket in np.unique(buckets)
+    }
+
+
+def filter_tracks(
+    tracks: Sequence[TrackRecord], ranges: dict[str, tuple[float | None, float | None]]
+) -> list[TrackRecord]:
+    """
+    Tracks whose features all fall within ``ranges`` (feature -> (min, max), inclusive,
+    either end None for open). Tracks lacking a filtered feature do not match, even when
+    both ends are open.
+    """
+    for feature in ranges:
+        _check_feature(feature)
+    records = [record for record in tracks if record.id]
+    columns = get_feature_store().columns([record.id for record in records])  # type: ignore
+    mask = np.ones(len(records), dtype=bool)
+    for feature, (low, high) in ranges.items():
+        mask &= ~np.isnan(columns[feature])
+        if low is not None:
+            mask &= columns[feature] >= low
+        if high is not None:
+            mask &= columns[feature] <= high
+    return [records[i] for i in np.flatnonzero(mask)]
+
+
+def _playlist_entry(playlist_id: str, name: str, tracks: int) -> dict:
+    return {
+        "name": name,
+        "url": f"https://open.spotify.com/playlist/{playlist_id}",
+        "tracks": tracks,
+    }
+
+
+def separate_playlist(
+    playlist_id: str, feature: str = "tempo", edges: Sequence[float] | None = None
+) -> dict:
+    """
+    Split a playlist into one new playlist per feature bucket (see split_tracks).
+    Tracks lacking the feature are not copied anywhere.
+
+    Returns:
+        dict: Status, message and the created playlists with their track counts.
+    """
+    playlist_id = parse_playlist_id(playlist_id)
+    wait_for_sync()
+    tracks, _ = get_playlist_tracks(playlist_id)
+    name = get_playlist_name(playlist_id) or playlist_id
+    created = []
+    for label, records in split_tracks(tracks, feature, edges).items():
+        if label == UNKNOWN_BUCKET:
+            continue
+        new_name = f"{name} ({feature} {label})"
+        new_id = create_empty_playlist(new_name, f"Split from {name} by {feature}")
+        append_tracks(new_id, [], records)
+        created.append(_playlist_entry(new_id, new_name, len(records)))
+    return {
+        "status": "success",
+        "message": f"Split {name} into {len(created)} playlists by {feature}.",
+        "playlists": created,
+    }
+
+
+def filter_playlist(
+    playlist_id: str,
+    feature: str,
+    min_value: float | None,
+    max_value: float | None,
+    new_name: str,
+) -> dict:
+    """
+    Copy the tracks of a playlist whose ``feature`` lies within [min_value, max_value]
+    into a new playlist.
+
+    Returns:
+        dict: Status, message and the created playlist.
+    """
+    playlist_id = parse_playlist_id(playlist_id)
+    wait_for_sync()
+    tracks, _ = get_playlist_tracks(playlist_id)
+    matches = filter_tracks(tracks, {feature: (min_value, max_value)})
+    if not matches:
+        return {"status": "success", "message": "No tracks match; no playlist was created."}
+    name = get_playlist_name(playlist_id) or playlist_id
+    new_id = create_empty_playlist(new_name, f"Filtered from {name} by {feature}")
+    append_tracks(new_id, [], matches)
+    return {
+        "status": "success",
+        "message": f"Created {new_name} with {len(matches)} of {len(tracks)} tracks.",
+        "playlist": _playlist_entry(new_id, new_name, len(matches)),
+    }
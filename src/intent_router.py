@@ -0,0 +1,137 @@
+import logging
+import re
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .db_handler import get_recently_modified_playlists, wait_for_sync
+from .playlist_index import get_playlist_index
+from .settings import get_settings
+from .spotify_handler import parse_playlist_id
+
+logger = logging.getLogger(__name__)
+
+# A playlist must match this well (and lead the runner-up by the margin) to be acted on
+# without the model; commands that modify the playlist need a near-exact name match
+LOOKUP_CONFIDENCE = 0.85
+MODIFY_CONFIDENCE = 0.95
+CONFIDENCE_MARGIN = 0.1
+
+_PLAYLIST_REF_RE = re.compile(
+    r"^(?:https?://open\.spotify\.com/playlist/|spotify:playlist:)[A-Za-z0-9]+\S*$|^[A-Za-z0-9]{22}$"
+)
+_REMOVE_DUPLICATES_RE = re.compile(
+    r"^(?:please\s+)?(?:remove|delete|clean\s+up|get\s+rid\s+of)\s+(?:all\s+)?(?:the\s+)?"
+    r"(?:exact\s+)?(?:duplicates?|dupes?|duplicate\s+(?:songs|tracks))"
+    r"(?P<similar>\s+and\s+similar\s+(?:songs|tracks))?\s+(?:from|in)\s+(?P<playlist>.+)$"
+    r"|^(?:please\s+)?(?:dedupe|de-dupe|deduplicate)\s+(?P<playlist2>.+)$",
+    re.IGNORECASE,
+)
+_FIND_PLAYLIST_RE = re.compile(
+    r"^(?:please\s+)?(?:find|open|show(?:\s+me)?|look\s+up|where\s+is)\s+(?P<playlist>.+)$",
+    re.IGNORECASE,
+)
+_LEADING_WORDS_RE = re.compile(r"^(?:my|the|our)\s+", re.IGNORECASE)
+_TRAILING_WORDS_RE = re.compile(r"\s+(?:playlist|please)$", re.IGNORECASE)
+
+
+def _clean_reference(text: str) -> str:
+    text = text.strip().rstrip(".!?").strip().strip("\"'“”‘’")
+    if not _PLAYLIST_REF_RE.match(text):
+        while (stripped := _TRAILING_WORDS_RE.sub("", _LEADING_WORDS_RE.sub("", text))) != text:
+            text = stripped
+        if text.lower().startswith("playlist "):
+            text = text[len("playlist ") :]
+    return text.strip().strip("\"'“”‘’")
+
+
+def match_intent(text: str) -> tuple[str, dict, str] | None:
+    """
+    Recognize an unambiguous menu command.
+
+    Returns:
+        tuple[str, dict, str] | None: (tool name, arguments without the playlist, playlist
+        reference as typed), or None when the line should go to the model.
+    """
+    text = text.strip()
+    if match := _REMOVE_DUPLICATES_RE.match(text):
+        reference = match.group("playlist") or match.group("playlist2")
+        arguments = {
+            "include_similar": bool(match.group("similar")),
+            "remove_similar_automatically": False,
+        }
+        return "remove_duplicates", arguments, _clean_reference(reference)
+    if match := _FIND_PLAYLIST_RE.match(text):
+        return "get_closest_playlist", {}, _clean_reference(match.group("playlist"))
+    return None
+
+
+def resolve_playlist(reference: str, min_score: float) -> dict | None:
+    """
+    Resolve a typed playlist reference to a playlist with the name index.
+
+    URLs, URIs and bare IDs resolve directly. Names must score at least ``min_score`` and
+    beat the runner-up by CONFIDENCE_MARGIN, otherwise None is returned.
+    """
+    if not reference:
+        return None
+    if _PLAYLIST_REF_RE.match(reference):
+        playlist_id = parse_playlist_id(reference)
+        return {"id": playlist_id, "name": playlist_id}
+    wait_for_sync()
+    matches = get_playlist_index(get_recently_modified_playlists).search(reference, 2)
+    if not matches or matches[0][0] < min_score:
+        return None
+    if len(matches) > 1 and matches[0][0] - matches[1][0] < CONFIDENCE_MARGIN:
+        return None
+    return matches[0][1]
+
+
+def _reply(tool: str, result: Any, playlist: dict) -> str:
+    if not isinstance(result, dict):
+        return str(result)
+    message = result.get("message") or result.get("status", "")
+    if result.get("status") == "error":
+        return f"That didn't work for '{playlist['name']}': {message}"
+    if tool == "remove_duplicates":
+        return f"{playlist['name']}: {message}"
+    if url := (result.get("playlist") or {}).get("url"):
+        return f"{message} {url}"
+    return str(message)
+
+
+def handle_locally(text: str, tools_map: dict[str, Callable[..., Any]]) -> str | None:
+    """
+    Run a user message as a tool call without the model when it is a clear command
+    about a confidently resolved playlist.
+
+    Returns:
+        str | None: The reply for the user, or None to fall back to the model.
+    """
+    if not get_settings().local_intents_enabled:
+        return None
+    if (intent := match_intent(text)) is None or intent[0] not in tools_map:
+        return None
+    tool, arguments, reference = intent
+    if tool == "get_closest_playlist" and _PLAYLIST_REF_RE.match(reference):
+        return None  # Nothing to look up
+    started = time.perf_counter()
+    try:
+        playlist = resolve_playlist(
+            reference, MODIFY_CONFIDENCE if tool == "remove_duplicates" else LOOKUP_CONFIDENCE
+        )
+    except Exception:
+        logger.exception("Local intent routing failed, asking the model instead")
+        return None
+    if playlist is None:
+        logger.debug("No confident playlist match for %r, asking the model", reference)
+        return None
+
+    if tool == "remove_duplicates":
+        arguments = {"playlist_id": playlist["id"], **arguments}
+    else:
+        arguments = {"description": playlist["name"]}
+    logger.debug("Local intent: %s(%s)", tool, arguments)
+    reply = _reply(tool, tools_map[tool](**arguments), playlist)
+    logger.debug("Local intent handled in %.1f ms", (time.perf_counter() - started) * 1000)
+    return reply
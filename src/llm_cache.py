@@ -0,0 +1,122 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(model: str, messages: list[Any], tools: Any, fingerprint: str) -> str:
+    """Content address of a completion request: model, messages, tool schema and playlist set."""
+    tools_hash = hashlib.sha256(json.dumps(tools, sort_keys=True).encode()).hexdigest()
+    payload = json.dumps(
+        {"model": model, "messages": messages, "tools": tools_hash, "playlists": fingerprint},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LRU + TTL cache of assembled model responses ({"content", "tool_calls"}), optionally
+    backed by SQLite so entries survive restarts.
+
+    Keys include the playlist-set fingerprint (IDs plus snapshot_ids, see make_key), so
+    users and playlist sets with different fingerprints never share entries. Entries for
+    an old fingerprint are not looked up again and age out through the TTL and LRU limit.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600, path: str | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, fingerprint TEXT, created REAL, value TEXT)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]))
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._store(key, entry)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: dict, fingerprint: str) -> None:
+        with self._lock:
+            entry = (time.time(), value)
+            self._store(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, fingerprint, entry[0], json.dumps(value)),
+                )
+                # Expired rows, and the oldest beyond max_entries, are dropped as new ones
+                # arrive
+                self._db.execute(
+                    "DELETE FROM responses WHERE created < ? OR key NOT IN "
+                    "(SELECT key FROM responses ORDER BY created DESC, rowid DESC LIMIT ?)",
+                    (entry[0] - self.ttl_seconds, self.max_entries),
+                )
+                self._db.commit()
+
+    def _store(self, key: str, entry: tuple[float, dict]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+
+_cache: LLMResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache | None:
+    """The shared response cache, or None when disabled through Settings."""
+    global _cache
+    settings = get_settings()
+    if not settings.llm_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            path = settings.llm_cache_path
+            _cache = LLMResponseCache(
+                max_entries=settings.llm_cache_max_entries,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+                path=os.path.expanduser(path) if path else None,
+            )
+        return _cache
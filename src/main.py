@@ -1,13 +1,23 @@
-from typing import Any, Callable, List
+from typing import Any, Callable
+import argparse
+import sys
 from .ai_commands import (
     exit_application,
     ai_call_remove_duplicates,
+    ai_combine_playlists,
+    ai_create_playlist_from_tags,
+    ai_filter_playlist,
     ai_get_closest_playlist,
+    ai_separate_playlist,
+    ai_tag_playlist,
 )
 from .ai_handler import process_ai_response, process_user_request
 from .constants import menu_prompt
-from .db_handler import init_db
+from .context_manager import ConversationContext
+from .db_handler import start_background_sync
 from .logging_config import configure_logging
+from .metrics import configure_metrics
+from .settings import get_settings
 import json
 import os
 
@@ -20,25 +30,140 @@ menuToolsMap: dict[str, Callable] = {
     "remove_duplicates": ai_call_remove_duplicates,
     "exit_application": exit_application,
     "get_closest_playlist": ai_get_closest_playlist,
+    "combine_playlists": ai_combine_playlists,
+    "separate_playlist": ai_separate_playlist,
+    "filter_playlist": ai_filter_playlist,
+    "tag_playlist": ai_tag_playlist,
+    "create_playlist_from_tags": ai_create_playlist_from_tags,
 }
 
 def printMenu():
     print("\033[93mYou can ask me to do any of the below tasks:")
-    options = ["Remove Duplicates", "Exit Application"]
+    options = [
+        "Remove Duplicates",
+        "Combine Playlists",
+        "Separate Playlists",
+        "Filter Tracks",
+        "Tag Tracks and Create Playlists by Tags",
+        "Exit Application",
+    ]
     for option in options:
         print(f"\t• {option}")
     print("\033[0m")
 
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main",
+        description="Nichify: chat with the assistant, or run a command without it.",
+    )
+    commands = parser.add_subparsers(dest="command")
+    dedupe = commands.add_parser(
+        "dedupe", help="Remove exact duplicates from playlists without the assistant."
+    )
+    target = dedupe.add_mutually_exclusive_group(required=True)
+    target.add_argument("--all", action="store_true", help="Every playlist you own.")
+    target.add_argument("playlists", nargs="*", default=[], help="Playlist IDs, URIs or URLs.")
+    dedupe.add_argument("--dry-run", action="store_true", help="Report duplicates, change nothing.")
+    dedupe.add_argument(
+        "--force",
+        action="store_true",
+        help="Also check playlists unchanged since their last clean run.",
+    )
+    dedupe.add_argument("--workers", type=int, help="Playlists processed at once.")
+    dedupe.add_argument(
+        "--rate", type=float, help="Spotify requests per second shared by all workers."
+    )
+    dedupe.add_argument(
+        "--report", default="dedupe_report.json", help="Where to write the JSON report."
+    )
+    sync = commands.add_parser(
+        "sync", help="Keep playlists synced and run maintenance jobs on the ones that change."
+    )
+    sync.add_argument(
+        "--job",
+        action="append",
+        dest="jobs",
+        help="Job to run on changed playlists (repeatable, e.g. --job dedupe).",
+    )
+    sync.add_argument("--interval", type=float, help="Seconds between polls.")
+    sync.add_argument("--once", action="store_true", help="Poll once and exit.")
+    serve = commands.add_parser(
+        "serve", help="Serve the tools as a local HTTP/JSON API for many users."
+    )
+    serve.add_argument("--host", default="127.0.0.1", help="Interface to listen on.")
+    serve.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    return parser
+
+
+def run_serve_command(args: argparse.Namespace) -> int:
+    from .server import serve
+
+    tools = {name: tool for name, tool in menuToolsMap.items() if name != "exit_application"}
+    serve(tools, host=args.host, port=args.port)
+    return 0
+
+
+def run_sync_command(args: argparse.Namespace) -> int:
+    from .sync_daemon import SyncDaemon
+
+    daemon = SyncDaemon(jobs=args.jobs, interval=args.interval)
+    try:
+        daemon.run(once=args.once)
+    except KeyboardInterrupt:
+        daemon.stop()
+    return 0
+
+
+def run_dedupe_command(args: argparse.Namespace) -> int:
+    from .batch import run_batch_dedupe, write_report
+    from .spotify_handler import parse_playlist_id
+
+    if args.rate:
+        get_settings().spotify_requests_per_second = args.rate
+    report = run_batch_dedupe(
+        playlist_ids=None if args.all else [parse_playlist_id(p) for p in args.playlists],
+        dry_run=args.dry_run,
+        force=args.force,
+        workers=args.workers,
+    )
+    write_report(report, args.report)
+    summary = report["summary"]
+    print(
+        f"{summary['playlists']} playlists: {summary['removed']} cleaned, "
+        f"{summary['would_remove']} with duplicates (dry run), {summary['clean']} clean, "
+        f"{summary['skipped']} unchanged, {summary['error']} errors. "
+        f"Report written to {args.report}."
+    )
+    return 1 if summary["error"] else 0
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv or [])
     configure_logging()
-    init_db()
+    configure_metrics()
+    if args.command == "dedupe":
+        sys.exit(run_dedupe_command(args))
+    if args.command == "sync":
+        sys.exit(run_sync_command(args))
+    if args.command == "serve":
+        sys.exit(run_serve_command(args))
+
+    # Sync playlists in the background; playlist tools wait for it if it's still running
+    start_background_sync()
     print("\033[93mWelcome to Nichify! I am your assistant for managing Spotify playlists.\033[0m")
     printMenu()
-    messages = [{"role": "system", "content": menu_prompt}]
+    settings = get_settings()
+    context = ConversationContext(
+        menu_prompt,
+        menuTools,
+        budget_tokens=settings.context_token_budget,
+        recent_turns=settings.context_recent_turns,
+    )
     while True:
-        messages = process_user_request(messages, menuTools, menuToolsMap)
+        context.messages = process_user_request(context.messages, menuTools, menuToolsMap)
+        context.compact()
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
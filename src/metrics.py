@@ -0,0 +1,243 @@
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Any, TypedDict
+
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("prometheus", "jsonl")
+_DEFAULT_PATHS = {"prometheus": "nichify_metrics.prom", "jsonl": "nichify_metrics.jsonl"}
+_PREFIX = "nichify_"
+# Shared no-op span returned while metrics are disabled
+_NOOP_SPAN = nullcontext()
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class CounterSnapshot(TypedDict):
+    name: str
+    labels: dict[str, str]
+    value: float
+
+
+class SummarySnapshot(TypedDict):
+    name: str
+    labels: dict[str, str]
+    count: float
+    sum: float
+    max: float
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Counters and timing summaries for the hot paths, keyed by name and labels.
+
+    Summaries keep count, sum and max. In JSON-lines mode every finished span is also
+    appended to the output file as it happens.
+    """
+
+    def __init__(self, export_format: str, path: str):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Unknown metrics format '{export_format}', expected one of {EXPORT_FORMATS}"
+            )
+        self.export_format = export_format
+        self.path = path
+        self.counters: dict[tuple[str, Labels], float] = {}
+        self.summaries: dict[tuple[str, Labels], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float, labels: Labels) -> None:
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        with self._lock:
+            summary = self.summaries.setdefault((name, labels), [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+    def record_span(self, name: str, seconds: float, labels: Labels) -> None:
+        self.observe(f"{name}_seconds", seconds, labels)
+        if self.export_format == "jsonl":
+            self._append({"type": "span", "name": name, "seconds": seconds, **dict(labels)})
+
+    def _append(self, event: dict) -> None:
+        line = json.dumps({"ts": time.time(), **event})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def snapshot(self) -> dict:
+        """Counters, summaries and hit rates of every ``*_cache_requests_total`` counter."""
+        with self._lock:
+            counters: list[CounterSnapshot] = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            summaries: list[SummarySnapshot] = [
+                {"name": name, "labels": dict(labels), "count": c, "sum": s, "max": m}
+                for (name, labels), (c, s, m) in sorted(self.summaries.items())
+            ]
+        lookups: dict[str, dict[str, float]] = {}
+        for counter in counters:
+            if counter["name"].endswith("_cache_requests_total"):
+                cache = counter["name"][: -len("_requests_total")]
+                by_result = lookups.setdefault(cache, {})
+                result = counter["labels"].get("result", "")
+                by_result[result] = by_result.get(result, 0) + counter["value"]
+        hit_rates = {
+            cache: results.get("hit", 0) / total
+            for cache, results in lookups.items()
+            if (total := sum(results.values()))
+        }
+        return {"counters": counters, "summaries": summaries, "cache_hit_rates": hit_rates}
+
+    def to_prometheus(self) -> str:
+        """The current values in the Prometheus text exposition format."""
+
+        def series(name: str, labels: Labels) -> str:
+            if not labels:
+                return _PREFIX + name
+            rendered = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+            return f"{_PREFIX}{name}{{{rendered}}}"
+
+        lines: list[str] = []
+        with self._lock:
+            typed: set[str] = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {_PREFIX}{name} counter")
+                lines.append(f"{series(name, labels)} {value:g}")
+            for (name, labels), (count, total, largest) in sorted(self.summaries.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {_PREFIX}{name} summary")
+                lines.append(f"{series(name + '_count', labels)} {count:g}")
+                lines.append(f"{series(name + '_sum', labels)} {total:.6f}")
+                lines.append(f"{series(name + '_max', labels)} {largest:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        """Write the Prometheus text file, or append a final snapshot to the JSON lines."""
+        try:
+            if self.export_format == "prometheus":
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(self.to_prometheus())
+                os.replace(tmp_path, self.path)
+            else:
+                self._append({"type": "snapshot", **self.snapshot()})
+        except OSError:
+            logger.exception("Could not write metrics to %s", self.path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# None while metrics are disabled; every recording function returns at once then
+_registry: MetricsRegistry | None = None
+
+
+def configure_metrics() -> MetricsRegistry | None:
+    """
+    Turn metrics on when NICHIFY_METRICS is "prometheus" or "jsonl" (off when unset).
+    Output goes to NICHIFY_METRICS_PATH and is written when the process exits.
+    """
+    global _registry
+    settings = get_settings()
+    if not settings.metrics_enabled:
+        _registry = None
+        return None
+    export_format = settings.metrics_format.strip().lower()
+    path = settings.metrics_path or _DEFAULT_PATHS.get(export_format, "")
+    _registry = MetricsRegistry(export_format, os.path.expanduser(path))
+    atexit.register(_registry.export)
+    return _registry
+
+
+def get_registry() -> MetricsRegistry | None:
+    return _registry
+
+
+def enabled() -> bool:
+    return _registry is not None
+
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    if _registry is not None:
+        _registry.inc(name, value, _labels(labels))
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    if _registry is not None:
+        _registry.observe(name, value, _labels(labels))
+
+
+@contextmanager
+def _span(registry: MetricsRegistry, name: str, labels: dict[str, Any]) -> Iterator[dict]:
+    started = time.perf_counter()
+    try:
+        yield labels
+    except BaseException:
+        labels["error"] = True
+        raise
+    finally:
+        registry.record_span(name, time.perf_counter() - started, _labels(labels))
+
+
+def span(name: str, **labels: Any) -> AbstractContextManager[dict[str, Any] | None]:
+    """
+    Time a block as ``<name>_seconds``. The yielded dict holds the labels and may be
+    updated inside the block (e.g. with a response status); spans that raise get
+    ``error="True"``. Returns a shared no-op context while metrics are disabled.
+    """
+    if _registry is None:
+        return _NOOP_SPAN
+    return _span(_registry, name, labels)
+
+
+_ENDPOINT_RE = re.compile(r"/v1/([^/?]+)")
+
+
+def spotify_endpoint(url: Any) -> str:
+    """Low-cardinality endpoint label: the first path segment after /v1/ (``playlists``)."""
+    match = _ENDPOINT_RE.search(str(url))
+    return match.group(1) if match else "other"
+
+
+def instrument_engine(engine: Any) -> None:
+    """Count and time the queries an SQLAlchemy engine runs (no-op while disabled)."""
+    if _registry is None:
+        return
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        observe("db_query_seconds", time.perf_counter() - started, operation=operation)
@@ -0,0 +1,101 @@
+import heapq
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+from typing import Any
+
+from Levenshtein import ratio as levenshtein_ratio
+
+from .users import current_user
+
+# Trigram candidates scored per query; the best of these by shared trigrams go to Levenshtein
+_MAX_CANDIDATES = 32
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaylistNameIndex:
+    """
+    In-memory index over playlist names for fuzzy lookups.
+
+    Names are normalized once at build time and posted under their character trigrams.
+    A query only scores the few playlists sharing the most trigrams with it.
+    """
+
+    def __init__(self, playlists: Iterable[Any]):
+        # Plain copies: ORM rows expire on commit and would reload on attribute access
+        self.playlists: list[dict] = [
+            {
+                "id": p.id,
+                "name": p.name,
+                "description": p.description,
+                "tracks_total": p.tracks_total,
+            }
+            for p in playlists
+        ]
+        self.names = [normalize_name(p["name"]) for p in self.playlists]
+        self.by_id = {p["id"]: p for p in self.playlists}
+        self._exact: dict[str, int] = {}
+        postings: dict[str, list[int]] = defaultdict(list)
+        for index, name in enumerate(self.names):
+            self._exact.setdefault(name, index)
+            for gram in _trigrams(name):
+                postings[gram].append(index)
+        self._postings = dict(postings)
+        # Trigrams shared by this many names say little about a match, so they are only
+        # consulted when nothing rarer matched
+        self._common_threshold = max(50, len(self.names) // 100)
+        self.search = lru_cache(maxsize=256)(self._search)
+
+    def __len__(self) -> int:
+        return len(self.playlists)
+
+    def _candidates(self, query: str) -> list[int]:
+        lists = sorted(
+            (self._postings[gram] for gram in _trigrams(query) if gram in self._postings), key=len
+        )
+        counts: Counter[int] = Counter()
+        for postings in lists:
+            if len(postings) > self._common_threshold and counts:
+                break
+            counts.update(postings)
+        return [index for index, _ in counts.most_common(_MAX_CANDIDATES)]
+
+    def _search(self, query: str, k: int = 5) -> tuple[tuple[float, dict], ...]:
+        """Top-k (score, playlist) pairs for ``query``, best first; an exact name scores 1.0."""
+        query = normalize_name(query)
+        scored: dict[int, float] = {}
+        if (exact := self._exact.get(query)) is not None:
+            scored[exact] = 1.0
+        for index in self._candidates(query):
+            scored.setdefault(index, levenshtein_ratio(query, self.names[index]))
+        best = heapq.nlargest(k, scored.items(), key=lambda entry: entry[1])
+        return tuple((score, self.playlists[index]) for index, score in best)
+
+
+# One index per user (the None key outside server mode)
+_indexes: dict[str | None, PlaylistNameIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_playlist_index(load_playlists: Callable[[], Iterable[Any]]) -> PlaylistNameIndex:
+    """Return the shared index, building it from ``load_playlists()`` if it was invalidated."""
+    user = current_user()
+    with _index_lock:
+        if (index := _indexes.get(user)) is None:
+            index = _indexes[user] = PlaylistNameIndex(load_playlists())
+        return index
+
+
+def invalidate_playlist_index() -> None:
+    """Drop the shared index; called whenever a playlist sync changes stored playlists."""
+    with _index_lock:
+        _indexes.pop(current_user(), None)
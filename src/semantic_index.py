@@ -0,0 +1,253 @@
+import atexit
+import logging
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from .settings import get_settings
+from .users import current_user, user_key
+
+logger = logging.getLogger(__name__)
+
+# Hashed feature space; stable across runs (crc32) so the persisted index stays valid
+_DIMENSIONS = 2048
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and the my our your of for from in on with to at by playlist playlists songs "
+    "music stuff tracks mix that this".split()
+)
+_NAME_WEIGHT = 2.0
+_TRIGRAM_WEIGHT = 0.5
+# Refreshes arrive one playlist at a time during bulk work (every track cache miss), so
+# the index is written at most this often rather than on every change
+_SAVE_DELAY_SECONDS = 2.0
+
+
+def _tokens(text: str) -> list[str]:
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def _add_text(counts: dict[int, float], text: str, weight: float) -> None:
+    for word in _tokens(text):
+        counts[zlib.crc32(word.encode()) % _DIMENSIONS] += weight
+        # Character trigrams catch plurals and partial words ("workouts" ~ "workout")
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            gram = "#" + padded[i : i + 3]
+            counts[zlib.crc32(gram.encode()) % _DIMENSIONS] += weight * _TRIGRAM_WEIGHT
+
+
+def vectorize(
+    name: str, description: str | None = None, artists: list[str] | None = None
+) -> np.ndarray:
+    """Sublinear term-frequency vector over hashed words and word trigrams."""
+    counts: dict[int, float] = defaultdict(float)
+    _add_text(counts, name, _NAME_WEIGHT)
+    _add_text(counts, description or "", 1.0)
+    _add_text(counts, " ".join(artists or []), 1.0)
+    vector = np.zeros(_DIMENSIONS, dtype=np.float32)
+    if counts:
+        dims = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        vector[dims] = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return vector
+
+
+class SemanticPlaylistIndex:
+    """
+    TF-IDF index over playlist name, description and top artists, scored by cosine
+    similarity with NumPy. Rows are updated incrementally and persisted as .npz.
+
+    The term-frequency matrix keeps spare rows, doubling when full, so adding playlists
+    one at a time does not copy it every time.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self.ids: list[str] = []
+        self.names: list[str] = []
+        self._rows: dict[str, int] = {}
+        # Rows past len(self.ids) are spare capacity
+        self._matrix = np.zeros((0, _DIMENSIONS), dtype=np.float32)
+        self._weighted: np.ndarray | None = None
+        self._idf: np.ndarray | None = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_timer: threading.Timer | None = None
+
+    @property
+    def _tf(self) -> np.ndarray:
+        return self._matrix[: len(self.ids)]
+
+    @_tf.setter
+    def _tf(self, matrix: np.ndarray) -> None:
+        self._matrix = matrix
+
+    def _append_row(self, vector: np.ndarray) -> None:
+        row = len(self.ids) - 1
+        if row >= len(self._matrix):
+            grown = np.zeros((max(64, 2 * len(self._matrix)), _DIMENSIONS), dtype=np.float32)
+            grown[:row] = self._matrix[:row]
+            self._matrix = grown
+        self._matrix[row] = vector
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, playlist_id: object) -> bool:
+        return playlist_id in self._rows
+
+    @classmethod
+    def load(cls, path: str | None) -> "SemanticPlaylistIndex":
+        index = cls(path)
+        if not path or not os.path.exists(path):
+            return index
+        try:
+            with np.load(path) as data:
+                index.ids = data["ids"].tolist()
+                index.names = data["names"].tolist()
+                index._tf = data["tf"].astype(np.float32)
+            index._rows = {playlist_id: row for row, playlist_id in enumerate(index.ids)}
+        except Exception:
+            logger.exception("Could not load semantic index from %s, starting empty", path)
+            return cls(path)
+        return index
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            self._dirty = False
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp.npz"
+            np.savez_compressed(
+                tmp_path,
+                ids=np.array(self.ids, dtype=str),
+                names=np.array(self.names, dtype=str),
+                tf=self._tf,
+            )
+            os.replace(tmp_path, self.path)
+
+    def save_soon(self) -> None:
+        """Save within ``_SAVE_DELAY_SECONDS``, together with any other changes by then."""
+        if not self.path:
+            return
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is None or not self._save_timer.is_alive():
+                self._save_timer = threading.Timer(_SAVE_DELAY_SECONDS, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self) -> None:
+        """Save now if there are unsaved changes."""
+        if self._dirty:
+            self.save()
+
+    def upsert(self, documents: list[dict]) -> None:
+        """
+        Add or re-vectorize playlists.
+
+        Args:
+            documents (list[dict]): Each with id, name and optionally description and artists.
+        """
+        if not documents:
+            return
+        with self._lock:
+            for document in documents:
+                vector = vectorize(
+                    document["name"], document.get("description"), document.get("artists")
+                )
+                if (row := self._rows.get(document["id"])) is not None:
+                    self._matrix[row] = vector
+                    self.names[row] = document["name"]
+                else:
+                    self._rows[document["id"]] = len(self.ids)
+                    self.ids.append(document["id"])
+                    self.names.append(document["name"])
+                    self._append_row(vector)
+            self._weighted = None
+
+    def remove(self, playlist_ids: list[str]) -> None:
+        with self._lock:
+            drop = {self._rows[i] for i in playlist_ids if i in self._rows}
+            if not drop:
+                return
+            keep = [row for row in range(len(self.ids)) if row not in drop]
+            self._tf = self._tf[keep]
+            self.ids = [self.ids[row] for row in keep]
+            self.names = [self.names[row] for row in keep]
+            self._rows = {playlist_id: row for row, playlist_id in enumerate(self.ids)}
+            self._weighted = None
+
+    def _weighted_matrix(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._weighted is not None and self._idf is not None:
+            return self._weighted, self._idf
+        tf = self._tf
+        document_frequency = np.count_nonzero(tf, axis=0)
+        idf = (np.log((1 + len(self.ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+        weighted = tf * idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        self._weighted = weighted = weighted / np.where(norms == 0, 1, norms)
+        self._idf = idf
+        return weighted, idf
+
+    def search(
+        self, query: str, k: int = 10, within: set[str] | None = None
+    ) -> list[tuple[float, str, str]]:
+        """
+        Rank playlists by cosine similarity to a free-text description.
+
+        Returns:
+            list[tuple[float, str, str]]: Up to k (score, playlist id, name), best first,
+            limited to ``within`` when given.
+        """
+        with self._lock:
+            if not self.ids:
+                return []
+            weighted, idf = self._weighted_matrix()
+            query_vector = vectorize(query) * idf
+            if not (norm := np.linalg.norm(query_vector)):
+                return []
+            scores = weighted @ (query_vector / norm)
+            ranked = np.argsort(-scores)
+            results: list[tuple[float, str, str]] = []
+            for row in ranked:
+                if scores[row] <= 0 or len(results) == k:
+                    break
+                if within is None or self.ids[row] in within:
+                    results.append((float(scores[row]), self.ids[row], self.names[row]))
+            return results
+
+
+# One index per user (the None key outside server mode)
+_indexes: dict[str | None, SemanticPlaylistIndex] = {}
+_index_lock = threading.Lock()
+
+
+def _index_path(user: str | None) -> str | None:
+    path = get_settings().semantic_index_path
+    if not path:
+        return None
+    path = os.path.expanduser(path)
+    if user is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{user_key(user)}{extension}"
+
+
+def get_semantic_index() -> SemanticPlaylistIndex:
+    """
+    The shared index, loaded from ``Settings.semantic_index_path`` on first use. In
+    server mode each user has their own, saved next to it with the user in the name.
+    """
+    user = current_user()
+    with _index_lock:
+        if (index := _indexes.get(user)) is None:
+            index = _indexes[user] = SemanticPlaylistIndex.load(_index_path(user))
+            # Changes still waiting for a deferred save are written on the way out
+            atexit.register(index.flush)
+        return index
@@ -0,0 +1,276 @@
+"""
+Local HTTP/JSON API over the assistant's tools, serving many users at once.
+
+A user logs in to Spotify through ``/login`` and ``/callback`` and gets an API token
+back. Every tool request presents that token as ``Authorization: Bearer <token>`` and
+runs on its own thread inside ``user_scope`` for the token's user. That user gets their
+own Spotify clients and token cache (spotify_handler), their own database schema
+(db_handler) and their own playlist indexes. Only the connection pools, the Spotify
+request budget and the OpenAI client are shared.
+
+    GET  /health                      liveness check
+    GET  /tools                       tool names
+    POST /tools/<name>                run a tool; the JSON body holds its arguments
+    GET  /login?user=<id>             Spotify authorization URL for a user (a user who
+                                      already has a token must present it)
+    GET  /callback?code=..&state=..   OAuth redirect target (SPOTIPY_REDIRECT_URI); returns
+                                      the user's new API token
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from .cassette import replaying
+from .db_handler import create_user_schema, release_thread_session, save_playlists_to_db
+from .settings import get_settings
+from .spotify_handler import get_spotify_client
+from .users import user_scope
+
+logger = logging.getLogger(__name__)
+
+AUTH_SCHEME = "Bearer"
+# How long a login's OAuth state stays valid
+LOGIN_TTL_SECONDS = 600.0
+
+
+def _has_token() -> bool:
+    """True if the current user has a usable (or refreshable) Spotify token cached."""
+    if replaying():
+        return True
+    auth_manager = get_spotify_client().auth_manager
+    return auth_manager.validate_token(auth_manager.cache_handler.get_cached_token()) is not None
+
+
+def _login_url(user_id: str, state: str) -> str:
+    with user_scope(user_id):
+        return str(get_spotify_client().auth_manager.get_authorize_url(state=state))
+
+
+def _exchange_code(user_id: str, code: str) -> None:
+    """Trade an OAuth code for the user's Spotify token, cached in their own file."""
+    with user_scope(user_id):
+        auth_manager = get_spotify_client().auth_manager
+        auth_manager.get_access_token(code, as_dict=False, check_cache=False)
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ApiTokens:
+    """
+    The API token of every user, issued when they complete a Spotify login.
+
+    Only SHA-256 hashes are kept, in ``path`` (readable by the owner only) when one is
+    given so tokens survive restarts. Issuing a user a new token revokes their old one.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._users: dict[str, str] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._users = json.load(f)
+
+    def user_for(self, token: str) -> str | None:
+        with self._lock:
+            return self._users.get(_hash_token(token))
+
+    def has_user(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._users.values()
+
+    def issue(self, user_id: str) -> str:
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._users = {h: user for h, user in self._users.items() if user != user_id}
+            self._users[_hash_token(token)] = user_id
+            if self.path:
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._users, f)
+        return token
+
+
+class NichifyServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server holding the tool table and which users are set up.
+
+    A user is set up on their first tool call: their schema and tables are created and
+    their playlists synced. Setup is serialized per user only, so one user's first sync
+    never holds up anybody else.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        tools: dict[str, Callable[..., Any]],
+        tokens: ApiTokens | None = None,
+    ):
+        super().__init__(address, NichifyRequestHandler)
+        self.tools = tools
+        self.tokens = tokens or ApiTokens()
+        self._ready: set[str] = set()
+        self._setup_locks: dict[str, threading.Lock] = {}
+        # OAuth state of each login in progress -> (user, expiry)
+        self._logins: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def start_login(self, user_id: str) -> str:
+        """A Spotify authorization URL for ``user_id`` carrying a fresh, single-use state."""
+        state = secrets.token_urlsafe(24)
+        now = time.monotonic()
+        with self._lock:
+            self._logins = {k: v for k, v in self._logins.items() if v[1] > now}
+            self._logins[state] = (user_id, now + LOGIN_TTL_SECONDS)
+        return _login_url(user_id, state)
+
+    def finish_login(self, state: str) -> str | None:
+        """The user whose login ``state`` belongs to, or None if unknown or expired."""
+        with self._lock:
+            login = self._logins.pop(state, None)
+        if login is None or login[1] < time.monotonic():
+            return None
+        return login[0]
+
+    def prepare_user(self, user_id: str) -> None:
+        """Create the current user's tables and sync their playlists, once per process."""
+        if user_id in self._ready:
+            return
+        with self._lock:
+            setup_lock = self._setup_locks.setdefault(user_id, threading.Lock())
+        with setup_lock:
+            if user_id in self._ready:
+                return
+            logger.info("Setting up user %s", user_id)
+            create_user_schema()
+            save_playlists_to_db()
+            self._ready.add(user_id)
+
+
+class NichifyRequestHandler(BaseHTTPRequestHandler):
+    server: NichifyServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: Any) -> None:
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, message: str, **extra: Any) -> None:
+        self._send(status, {"status": "error", "message": message, **extra})
+
+    def _authenticated_user(self) -> str | None:
+        scheme, _, token = (self.headers.get("Authorization") or "").partition(" ")
+        if scheme != AUTH_SCHEME or not token:
+            return None
+        return self.server.tokens.user_for(token.strip())
+
+    def do_GET(self) -> None:  # noqa: N802
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/health":
+            self._send(200, {"status": "success"})
+        elif url.path == "/tools":
+            self._send(200, {"status": "success", "tools": sorted(self.server.tools)})
+        elif url.path == "/login":
+            self._login(query)
+        elif url.path == "/callback":
+            self._callback(query)
+        else:
+            self._error(404, f"Unknown path {url.path}")
+
+    def _login(self, query: dict[str, str]) -> None:
+        if not (user_id := query.get("user")):
+            return self._error(400, "Give the user as ?user=<id>.")
+        # Logging in again replaces the user's Spotify account and token, so only they may
+        if self.server.tokens.has_user(user_id) and self._authenticated_user() != user_id:
+            return self._error(401, f"User {user_id} exists; send their {AUTH_SCHEME} token.")
+        self._send(200, {"status": "success", "url": self.server.start_login(user_id)})
+
+    def _callback(self, query: dict[str, str]) -> None:
+        if not (state := query.get("state")) or not (code := query.get("code")):
+            return self._error(400, query.get("error", "Missing code or state."))
+        if (user_id := self.server.finish_login(state)) is None:
+            return self._error(400, "Unknown or expired login; start again at /login.")
+        try:
+            _exchange_code(user_id, code)
+        except Exception as e:
+            logger.exception("Spotify login failed for user %s", user_id)
+            return self._error(400, f"Spotify login failed: {e}")
+        self._send(
+            200,
+            {
+                "status": "success",
+                "message": f"Logged in as {user_id}. Send the token as '{AUTH_SCHEME} <token>'.",
+                "token": self.server.tokens.issue(user_id),
+            },
+        )
+
+    def do_POST(self) -> None:  # noqa: N802
+        path = urlsplit(self.path).path
+        name = path.removeprefix("/tools/")
+        if not path.startswith("/tools/") or name not in self.server.tools:
+            return self._error(404, f"Unknown tool '{name}'")
+        if (user_id := self._authenticated_user()) is None:
+            return self._error(401, f"Log in at /login and send the {AUTH_SCHEME} token.")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            arguments = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(arguments, dict):
+                raise ValueError("The request body must be a JSON object of tool arguments.")
+            inspect.signature(self.server.tools[name]).bind(**arguments)
+        except (ValueError, TypeError) as e:
+            return self._error(400, f"Bad request for {name}: {e}")
+
+        with user_scope(user_id):
+            try:
+                if not _has_token():
+                    return self._error(
+                        401,
+                        "Log in to Spotify first.",
+                        login_url=self.server.start_login(user_id),
+                    )
+                self.server.prepare_user(user_id)
+                result = self.server.tools[name](**arguments)
+            except Exception as e:
+                logger.exception("Tool %s failed for user %s", name, user_id)
+                return self._error(500, str(e))
+            finally:
+                # Request threads are short-lived; hand their DB connections back
+                release_thread_session()
+        self._send(200, result)
+
+
+def serve(tools: dict[str, Callable[..., Any]], host: str = "127.0.0.1", port: int = 8765) -> None:
+    """Serve ``tools`` until interrupted."""
+    token_dir = os.path.expanduser(get_settings().token_cache_dir)
+    os.makedirs(token_dir, exist_ok=True)
+    tokens = ApiTokens(os.path.join(token_dir, "api_tokens.json"))
+    server = NichifyServer((host, port), tools, tokens)
+    logger.info("Serving %d tools on http://%s:%d", len(tools), host, server.server_port)
+    print(f"Nichify server listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
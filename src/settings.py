@@ -14,13 +14,98 @@ class Settings(BaseSettings):
     spotipy_client_id: str = Field(alias="SPOTIPY_CLIENT_ID")
     spotipy_client_secret: str = Field(alias="SPOTIPY_CLIENT_SECRET")
     spotipy_redirect_uri: str = Field(alias="SPOTIPY_REDIRECT_URI")
+    # Fetch paginated results by offset on a worker pool instead of following `next` links
+    spotify_parallel_pages: bool = Field(default=True, alias="SPOTIFY_PARALLEL_PAGES")
+    spotify_max_workers: int = Field(default=4, alias="SPOTIFY_MAX_WORKERS")
+    # Client-side throttling shared by every Spotify call (token bucket)
+    spotify_requests_per_second: float = Field(default=10.0, alias="SPOTIFY_REQUESTS_PER_SECOND")
+    spotify_burst: int = Field(default=10, alias="SPOTIFY_BURST")
 
-    # Database
+    # Agent loop: tool calls run in parallel per batch, and at most this many model rounds
+    tool_max_workers: int = Field(default=4, alias="NICHIFY_TOOL_WORKERS")
+    max_tool_steps: int = Field(default=8, alias="NICHIFY_MAX_TOOL_STEPS")
+    # Run clear commands ("remove duplicates from X") without the model
+    local_intents_enabled: bool = Field(default=True, alias="NICHIFY_LOCAL_INTENTS")
+
+    # Headless `dedupe` command: playlists processed at once (Spotify budget is shared)
+    batch_workers: int = Field(default=4, alias="NICHIFY_BATCH_WORKERS")
+
+    # `sync` daemon: poll spacing (with +/- jitter fraction), failure backoff cap, and the
+    # comma-separated maintenance jobs run on changed playlists
+    sync_interval_seconds: float = Field(default=300, alias="NICHIFY_SYNC_INTERVAL")
+    sync_jitter: float = Field(default=0.1, alias="NICHIFY_SYNC_JITTER")
+    sync_max_backoff_seconds: float = Field(default=3600, alias="NICHIFY_SYNC_MAX_BACKOFF")
+    sync_jobs: str = Field(default="", alias="NICHIFY_SYNC_JOBS")
+    # Playlists the "masters" sync job keeps filled from their sources, as
+    # "master=source+source;master=source+source" (playlist IDs or URIs)
+    sync_masters: str = Field(default="", alias="NICHIFY_SYNC_MASTERS")
+
+    # Conversation history sent to the model: token budget and turns kept verbatim
+    context_token_budget: int = Field(default=8000, alias="NICHIFY_CONTEXT_TOKENS")
+    context_recent_turns: int = Field(default=6, alias="NICHIFY_CONTEXT_TURNS")
+
+    # Cache of model responses keyed on model, messages, tool schema and playlist set
+    llm_cache_enabled: bool = Field(default=True, alias="NICHIFY_LLM_CACHE")
+    llm_cache_max_entries: int = Field(default=256, alias="NICHIFY_LLM_CACHE_SIZE")
+    llm_cache_ttl_seconds: float = Field(default=3600, alias="NICHIFY_LLM_CACHE_TTL")
+    # Optional SQLite file so cached responses survive restarts (empty: in-memory only)
+    llm_cache_path: str = Field(default="", alias="NICHIFY_LLM_CACHE_PATH")
+
+    # Local semantic playlist search index (empty string keeps it in memory only)
+    semantic_index_path: str = Field(
+        default="~/.cache/nichify/semantic_index.npz", alias="NICHIFY_SEMANTIC_INDEX"
+    )
+
+    # Record Spotify and OpenAI HTTP exchanges to a cassette file, or replay them offline
+    # ("record" or "replay"; empty: live). Replay speed 1 keeps the recorded timing, 0 none
+    cassette_mode: str = Field(default="", alias="NICHIFY_CASSETTE_MODE")
+    cassette_path: str = Field(default="nichify_cassette.jsonl.gz", alias="NICHIFY_CASSETTE")
+    replay_speed: float = Field(default=1.0, alias="NICHIFY_REPLAY_SPEED")
+
+    # Metrics export format, "prometheus" or "jsonl" (empty: off), written at exit to the
+    # path below (empty: a default file per format)
+    metrics_format: str = Field(default="", alias="NICHIFY_METRICS")
+    metrics_path: str = Field(default="", alias="NICHIFY_METRICS_PATH")
+
+    # Database: "postgres" (the server configured below) or "sqlite" (an embedded file in
+    # WAL mode, no server needed)
+    db_backend: str = Field(default="postgres", alias="NICHIFY_DB_BACKEND")
+    sqlite_path: str = Field(
+        default="~/.local/share/nichify/nichify.db", alias="NICHIFY_SQLITE_PATH"
+    )
     db_host: str = Field(default="127.0.0.1", alias="DB_HOST")
     db_port: int = Field(default=5432, alias="DB_PORT")
     db_name: str = Field(default="nichify", alias="DB_NAME")
     db_user: str = Field(default="postgres", alias="DB_USER")
     db_password: str = Field(default="", alias="DB_PASSWORD")
+    # Connection pool shared by every thread (and, in server mode, every user)
+    db_pool_size: int = Field(default=10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, alias="DB_MAX_OVERFLOW")
+    db_pool_recycle_seconds: int = Field(default=1800, alias="DB_POOL_RECYCLE")
+
+    # `serve` mode: Spotify clients kept in memory (least recently used are dropped) and
+    # the directory holding each user's OAuth token cache
+    server_max_users: int = Field(default=64, alias="NICHIFY_SERVER_MAX_USERS")
+    token_cache_dir: str = Field(default="~/.cache/nichify/tokens", alias="NICHIFY_TOKEN_DIR")
+
+    @property
+    def metrics_enabled(self) -> bool:
+        return self.metrics_format.strip().lower() not in ("", "0", "false", "off")
+
+    @property
+    def sync_job_names(self) -> list[str]:
+        return [name.strip() for name in self.sync_jobs.split(",") if name.strip()]
+
+    @property
+    def sync_master_sources(self) -> dict[str, list[str]]:
+        masters: dict[str, list[str]] = {}
+        for entry in self.sync_masters.split(";"):
+            master, _, sources = entry.partition("=")
+            if master.strip():
+                masters[master.strip()] = [
+                    source.strip() for source in sources.split("+") if source.strip()
+                ]
+        return masters
 
     class Config:
         validate_assignment = True
@@ -30,4 +115,4 @@ class Settings(BaseSettings):
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    return Settings()  # type: ignore[call-arg]
\ No newline at end of file
+    return Settings()  # type: ignore[call-arg]
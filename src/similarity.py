@@ -0,0 +1,247 @@
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import combinations
+
+import numpy as np
+from rapidfuzz.distance import Indel
+from rapidfuzz.process import cpdist
+
+from .track_records import TrackRecord, as_track_records
+
+# Qualifiers that mark another release of the same recording rather than a different song
+_VERSION_WORDS = (
+    r"remaster(?:ed)?|live|explicit|clean|radio edit|edit|version|mono|stereo|deluxe|"
+    r"bonus|anniversary|acoustic|single|album|demo|feat\.?|ft\.?|featuring|with"
+)
+_BRACKETED_RE = re.compile(rf"[\(\[][^\)\]]*\b(?:{_VERSION_WORDS})\b[^\)\]]*[\)\]]")
+_DASH_SUFFIX_RE = re.compile(rf"\s+-\s+[^-]*\b(?:{_VERSION_WORDS})\b.*$")
+_FEATURING_RE = re.compile(r"\s+(?:feat\.?|ft\.?|featuring)\s+.*$")
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_SPACES_RE = re.compile(r"\s+")
+
+# MinHash LSH over title character trigrams: 8 bands of 4 rows puts titles with a trigram
+# Jaccard similarity of 0.8 in a shared bucket ~98% of the time and unrelated titles ~never.
+_BANDS = 8
+_ROWS = 4
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1234)
+_HASH_A = _rng.integers(1, _PRIME, _BANDS * _ROWS, dtype=np.int64)
+_HASH_B = _rng.integers(0, _PRIME, _BANDS * _ROWS, dtype=np.int64)
+# Folds a band's rows into one bucket key (int64 overflow just wraps, which is fine for hashing)
+_BAND_MIX = _rng.integers(1, _PRIME, _ROWS, dtype=np.int64)
+
+# Buckets larger than this are linked as a chain instead of all-pairs
+_MAX_BUCKET_PAIRS = 64
+
+MIN_TITLE_SIMILARITY = 0.85
+MIN_ARTIST_SIMILARITY = 0.8
+MAX_DURATION_DIFF_MS = 10_000
+# Groups at or above this confidence are removed when remove_similar_automatically is set
+AUTO_REMOVE_CONFIDENCE = 0.9
+
+
+def _strip_accents(text: str) -> str:
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase a title and drop remaster/live/explicit/"feat." style qualifiers."""
+    text = _strip_accents(title.lower())
+    text = _BRACKETED_RE.sub(" ", text)
+    text = _DASH_SUFFIX_RE.sub("", text)
+    text = _FEATURING_RE.sub("", text)
+    text = _NON_WORD_RE.sub(" ", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def normalize_artist(artists: Sequence[str]) -> str:
+    """The primary artist, normalized; featured artists vary too much between releases."""
+    if not artists:
+        return ""
+    text = _NON_WORD_RE.sub(" ", _strip_accents(artists[0].lower()))
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def _shingle_hashes(text: str) -> list[int]:
+    padded = f" {text} "
+    return list({zlib.crc32(padded[i : i + 3].encode()) for i in range(len(padded) - 2)})
+
+
+def _minhash_signatures(titles: list[str]) -> np.ndarray:
+    """
+    One MinHash signature row per title, computed in a single vectorized pass.
+
+    A title without any trigram (an empty string) gets a signature of its own negated
+    row number, which no hashed trigram (always >= 0) or other title can share.
+    """
+    shingles = [_shingle_hashes(title) for title in titles]
+    lengths = np.fromiter((len(s) for s in shingles), dtype=np.int64, count=len(shingles))
+    signatures = -np.arange(1, len(titles) + 1, dtype=np.int64)[:, None].repeat(
+        _BANDS * _ROWS, axis=1
+    )
+    present = lengths > 0
+    if present.any():
+        flat = np.fromiter(
+            (h for s in shingles for h in s), dtype=np.int64, count=int(lengths.sum())
+        )
+        hashed = (np.outer(flat, _HASH_A) + _HASH_B) % _PRIME
+        # Empty sets add no rows, so only the others' offsets are valid reduceat starts
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[present]
+        signatures[present] = np.minimum.reduceat(hashed, starts, axis=0)
+    return signatures
+
+
+def _bucket_members(keys: np.ndarray) -> Iterator[list[int]]:
+    """Yield the indexes sharing each key that occurs more than once."""
+    order = np.argsort(keys, kind="stable")
+    same = keys[order][1:] == keys[order][:-1]
+    if not same.any():
+        return
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], same, [False])).astype(np.int8)))
+    for start, end in zip(edges[::2], edges[1::2], strict=True):
+        yield [int(index) for index in order[start : end + 1]]
+
+
+def _candidate_pairs(records: list[tuple[str, str, int]]) -> set[tuple[int, int]]:
+    buckets: list[list[int]] = []
+    # Block 1: identical normalized (title, artist)
+    exact: dict[tuple[str, str], list[int]] = defaultdict(list)
+    for index, (title, artist, _) in enumerate(records):
+        if title:
+            exact[(title, artist)].append(index)
+    buckets.extend(members for members in exact.values() if len(members) > 1)
+    # Block 2: MinHash bands, catching spelling and punctuation variants
+    signatures = _minhash_signatures([title for title, _, _ in records])
+    band_keys = signatures.reshape(len(records), _BANDS, _ROWS) @ _BAND_MIX
+    for band in range(_BANDS):
+        buckets.extend(_bucket_members(band_keys[:, band]))
+
+    pairs: set[tuple[int, int]] = set()
+    for members in buckets:
+        members.sort()
+        if len(members) > _MAX_BUCKET_PAIRS:
+            pairs.update(zip(members, members[1:], strict=False))
+        else:
+            pairs.update(combinations(members, 2))
+    return pairs
+
+
+def _score_pairs(
+    records: list[tuple[str, str, int]], pairs: set[tuple[int, int]]
+) -> list[tuple[float, int, int]]:
+    """(score, i, j) of every candidate pair similar enough to be the same recording."""
+    if not pairs:
+        return []
+    left, right = np.array(sorted(pairs), dtype=np.int64).T
+    titles, artists, durations = zip(*records, strict=True)
+
+    def similarities(texts: tuple[str, ...]) -> np.ndarray:
+        # Indel similarity is what Levenshtein.ratio computes; cpdist does the pairs in C
+        similarity = cpdist(
+            [texts[i] for i in left],
+            [texts[j] for j in right],
+            scorer=Indel.normalized_similarity,
+            dtype=np.float64,  # type: ignore[call-overload]
+        )
+        return np.asarray(similarity, dtype=np.float64)
+
+    title_similarity = similarities(titles)
+    artist_similarity = similarities(artists)
+    duration = np.asarray(durations, dtype=np.int64)
+    duration_diff = np.abs(duration[left] - duration[right])
+    keep = (
+        (title_similarity >= MIN_TITLE_SIMILARITY)
+        & (artist_similarity >= MIN_ARTIST_SIMILARITY)
+        & (duration_diff <= MAX_DURATION_DIFF_MS)
+    )
+    duration_similarity = 1 - duration_diff / MAX_DURATION_DIFF_MS
+    scores = 0.6 * title_similarity + 0.25 * artist_similarity + 0.15 * duration_similarity
+    return list(zip(scores[keep].tolist(), left[keep].tolist(), right[keep].tolist(), strict=True))
+
+
+def find_similar_groups(tracks: Iterable[dict | TrackRecord]) -> list[dict]:
+    """
+    Group near-duplicate tracks (remasters, "feat." variants, live/explicit versions,
+    durations a few seconds apart) without comparing every pair.
+
+    Candidates come from blocking on normalized keys and MinHash buckets; only those
+    pairs are scored. Confidence is the weakest link needed to join the group.
+
+    Args:
+        tracks (Iterable[dict | TrackRecord]): Track records or Spotify playlist items;
+            an item's ``"position"`` is used when present.
+
+    Returns:
+        list[dict]: Groups ordered by first position, each with a ``confidence`` and its
+        ``tracks`` (id, uri, name, artist, position), first occurrence first.
+    """
+    items = [record for record in as_track_records(tracks) if record.id]
+    records = [
+        (normalize_title(item.name), normalize_artist(item.artists), item.duration_ms or 0)
+        for item in items
+    ]
+    if len(records) < 2:
+        return []
+
+    parent = list(range(len(records)))
+    weakest = [1.0] * len(records)
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Score every candidate pair in one batch, then join the strongest links first so a
+    # group's confidence is its bottleneck link rather than its worst redundant pair
+    scored = _score_pairs(records, _candidate_pairs(records))
+    scored.sort(reverse=True)
+    for score, i, j in scored:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+            weakest[root_i] = min(weakest[root_i], weakest[root_j], score)
+
+    members: dict[int, list[int]] = defaultdict(list)
+    for index in range(len(records)):
+        members[find(index)].append(index)
+
+    groups: list[dict] = []
+    for root, indexes in members.items():
+        if len(indexes) < 2:
+            continue
+        indexes.sort(key=lambda index: items[index].position)
+        groups.append(
+            {
+                "confidence": round(weakest[root], 3),
+                "tracks": [
+                    {
+                        "id": items[index].id,
+                        "uri": items[index].track_uri,
+                        "name": items[index].name,
+                        "artist": ", ".join(items[index].artists),
+                        "position": items[index].position,
+                    }
+                    for index in indexes
+                ],
+            }
+        )
+    groups.sort(key=lambda group: group["tracks"][0]["position"])
+    return groups
+
+
+def similar_removal_positions(
+    groups: list[dict], min_confidence: float = AUTO_REMOVE_CONFIDENCE
+) -> list[tuple[str, int]]:
+    """(uri, position) of every non-first track in groups confident enough to remove unattended."""
+    return [
+        (track["uri"], track["position"])
+        for group in groups
+        if group["confidence"] >= min_confidence
+        for track in group["tracks"][1:]
+    ]
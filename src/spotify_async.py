@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any
+
+import httpx
+
+_API_PREFIX = "https://api.spotify.com/v1/"
+
+
+class AsyncSpotify:
+    """
+    Async client for the Spotify Web API endpoints spotify_handler uses.
+
+    Method names, arguments and return values match spotipy's ``Spotify`` so the handler
+    code reads the same on both paths. Access tokens come from the spotipy auth manager,
+    which caches and refreshes them.
+    """
+
+    def __init__(self, auth_manager: Any, http: httpx.AsyncClient):
+        self.auth_manager = auth_manager
+        self.http = http
+
+    async def _request(
+        self, method: str, url: str, params: dict | None = None, payload: dict | None = None
+    ) -> dict | None:
+        # Token refresh is a blocking spotipy call; keep it off the event loop
+        token = await asyncio.to_thread(self.auth_manager.get_access_token, as_dict=False)
+        # httpx replaces a URL's query string with `params`, even an empty one, so `next`
+        # links (which carry their own offset) must be requested without any
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        response = await self.http.request(
+            method,
+            url if url.startswith("http") else _API_PREFIX + url,
+            params=params or None,
+            json=payload,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        response.raise_for_status()
+        return response.json() if response.content else None
+
+    async def current_user(self) -> dict | None:
+        return await self._request("GET", "me")
+
+    async def current_user_playlists(self, limit: int = 50, offset: int = 0) -> dict | None:
+        return await self._request("GET", "me/playlists", {"limit": limit, "offset": offset})
+
+    async def playlist(self, playlist_id: str, fields: str | None = None) -> dict | None:
+        return await self._request(
+            "GET", f"playlists/{playlist_id}", {"fields": fields, "additional_types": "track"}
+        )
+
+    async def playlist_tracks(
+        self, playlist_id: str, fields: str | None = None, limit: int = 100, offset: int = 0
+    ) -> dict | None:
+        return await self._request(
+            "GET",
+            f"playlists/{playlist_id}/tracks",
+            {"fields": fields, "limit": limit, "offset": offset, "additional_types": "track"},
+        )
+
+    async def playlist_remove_specific_occurrences_of_items(
+        self, playlist_id: str, items: list[dict], snapshot_id: str | None = None
+    ) -> dict | None:
+        payload: dict[str, Any] = {"tracks": items}
+        if snapshot_id:
+            payload["snapshot_id"] = snapshot_id
+        return await self._request("DELETE", f"playlists/{playlist_id}/tracks", payload=payload)
+
+    async def playlist_add_items(
+        self, playlist_id: str, items: list[str], position: int | None = None
+    ) -> dict | None:
+        payload: dict[str, Any] = {"uris": items}
+        if position is not None:
+            payload["position"] = position
+        return await self._request("POST", f"playlists/{playlist_id}/tracks", payload=payload)
+
+    async def user_playlist_create(
+        self, user: str, name: str, public: bool = False, description: str = ""
+    ) -> dict | None:
+        return await self._request(
+            "POST",
+            f"users/{user}/playlists",
+            payload={"name": name, "public": public, "description": description},
+        )
+
+    async def audio_features(self, tracks: list[str]) -> list[dict | None]:
+        result = await self._request("GET", "audio-features", {"ids": ",".join(tracks)})
+        return (result or {}).get("audio_features") or [None] * len(tracks)
+
+    async def next(self, result: dict) -> dict | None:
+        return await self._request("GET", result["next"]) if result.get("next") else None
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
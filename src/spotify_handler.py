@@ -1,10 +1,25 @@
-from typing import Dict, List
-from spotipy import Spotify  # type: ignore
-from spotipy.oauth2 import SpotifyOAuth  # type: ignore
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Dict, List
+from . import metrics
+from .async_runner import iterate_sync, run_sync
 from .settings import get_settings  # type: ignore
+from .track_records import PLAYLIST_TRACK_FIELDS, TrackRecord, as_track_records
+from .users import LRUPool, current_user, user_key
 import json
+import os
+import re
+import threading
+
+if TYPE_CHECKING:
+    from spotipy import Spotify
 
-_settings = get_settings()
+    from .spotify_async import AsyncSpotify
+    from .spotify_transport import TokenBucket
 
 _SPOTIFY_SCOPES = " ".join([
     "user-library-read",
@@ -14,76 +29,427 @@ _SPOTIFY_SCOPES = " ".join([
 ])
 
 _sp_client: Spotify | None = None
+_async_client: AsyncSpotify | None = None
+_sp_client_lock = threading.Lock()
+# One request budget shared by the sync (spotipy) and async (httpx) clients. Spotify
+# limits requests per app, so in server mode every user draws on it too.
+_rate_bucket: TokenBucket | None = None
+# Server mode: each user's clients, least recently used dropped past server_max_users
+_user_clients: LRUPool[_UserClients] | None = None
+
+# Maximum number of items Spotify accepts in one playlist add/remove request
+_PLAYLIST_WRITE_LIMIT = 100
+# Maximum number of track IDs per audio-features request
+_AUDIO_FEATURES_LIMIT = 100
+
+_PLAYLIST_ID_RE = re.compile(r"(?:spotify:playlist:|open\.spotify\.com/playlist/)([A-Za-z0-9]+)")
+
+
+def _get_rate_bucket() -> TokenBucket:
+    global _rate_bucket
+    if _rate_bucket is None:
+        from .spotify_transport import TokenBucket
+
+        settings = get_settings()
+        _rate_bucket = TokenBucket(settings.spotify_requests_per_second, settings.spotify_burst)
+    return _rate_bucket
+
+
+def _new_spotify_client(token_cache_path: str | None = None) -> Spotify:
+    # spotipy and requests are imported here, off the startup path
+    from spotipy import Spotify
+    from spotipy.cache_handler import CacheFileHandler
+    from spotipy.oauth2 import SpotifyOAuth
+
+    from .spotify_transport import RateLimitedSession
+
+    settings = get_settings()
+    return Spotify(
+        auth_manager=SpotifyOAuth(
+            client_id=settings.spotipy_client_id,
+            client_secret=settings.spotipy_client_secret,
+            redirect_uri=settings.spotipy_redirect_uri,
+            scope=_SPOTIFY_SCOPES,
+            cache_handler=CacheFileHandler(token_cache_path) if token_cache_path else None,
+        ),
+        # All Spotify traffic shares one pooled, throttled, 429-aware session
+        requests_session=RateLimitedSession(
+            rate=settings.spotify_requests_per_second,
+            burst=settings.spotify_burst,
+            pool_size=settings.spotify_max_workers,
+            bucket=_get_rate_bucket(),
+        ),
+    )
+
+
+def _new_async_client(auth_manager: Any) -> AsyncSpotify:
+    import httpx
+
+    from .cassette import ReplayAuthManager, cassette_transport, replaying
+    from .spotify_async import AsyncSpotify
+    from .spotify_transport import AsyncRateLimitedClient
+
+    settings = get_settings()
+    pool_size = settings.spotify_max_workers
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    transport = cassette_transport("spotify", limits)
+    return AsyncSpotify(
+        # A replayed session never talks to Spotify, not even for a token
+        ReplayAuthManager() if replaying() else auth_manager,
+        AsyncRateLimitedClient(
+            rate=settings.spotify_requests_per_second,
+            burst=settings.spotify_burst,
+            pool_size=pool_size,
+            bucket=_get_rate_bucket(),
+            transport=transport,
+        ),
+    )
+
+
+class _UserClients:
+    """One server-mode user's clients; tokens are cached in the user's own file."""
+
+    def __init__(self, user_id: str):
+        token_dir = os.path.expanduser(get_settings().token_cache_dir)
+        os.makedirs(token_dir, exist_ok=True)
+        self.sync = _new_spotify_client(os.path.join(token_dir, f"{user_key(user_id)}.json"))
+        self.async_client: AsyncSpotify | None = None
+        self.lock = threading.Lock()
+
+    def close(self) -> None:
+        if self.async_client is not None:
+            from .async_runner import get_event_loop
+
+            # Evicted from any thread, including the loop's own: schedule, don't wait
+            asyncio.run_coroutine_threadsafe(self.async_client.http.aclose(), get_event_loop())
+
+
+def _get_user_clients(user_id: str) -> _UserClients:
+    global _user_clients
+    with _sp_client_lock:
+        if _user_clients is None:
+            _user_clients = LRUPool(get_settings().server_max_users, _UserClients.close)
+    return _user_clients.get(user_id, lambda: _UserClients(user_id))
 
 
 def get_spotify_client() -> Spotify:
     global _sp_client
-    if _sp_client is None:
-        _sp_client = Spotify(
-            auth_manager=SpotifyOAuth(
-                client_id=_settings.spotipy_client_id,
-                client_secret=_settings.spotipy_client_secret,
-                redirect_uri=_settings.spotipy_redirect_uri,
-                scope=_SPOTIFY_SCOPES,
-            )
-        )
+    if (user := current_user()) is not None:
+        return _get_user_clients(user).sync
+    with _sp_client_lock:
+        if _sp_client is None:
+            _sp_client = _new_spotify_client()
     return _sp_client
 
 
-def get_all_playlist_tracks(playlist_id: str):
-    client = get_spotify_client()
-    tracks = []
-    results = client.playlist_tracks(playlist_id, limit=100)
-    if results is None:
+def get_async_spotify_client() -> AsyncSpotify:
+    """
+    The asyncio client, sharing the sync client's OAuth tokens and request budget.
+    Use it from the shared event loop (async_runner), which owns its connection pool.
+    """
+    global _async_client
+    if (user := current_user()) is not None:
+        clients = _get_user_clients(user)
+        with clients.lock:
+            if clients.async_client is None:
+                clients.async_client = _new_async_client(clients.sync.auth_manager)
+        return clients.async_client
+    auth_manager = get_spotify_client().auth_manager
+    with _sp_client_lock:
+        if _async_client is None:
+            _async_client = _new_async_client(auth_manager)
+    return _async_client
+
+
+def parse_playlist_id(playlist_id: str) -> str:
+    """Reduce a playlist URL, URI or bare ID to the bare Spotify ID used as our DB key."""
+    match = _PLAYLIST_ID_RE.search(playlist_id)
+    return match.group(1) if match else playlist_id.strip()
+
+
+async def _stream_pages(
+    client: AsyncSpotify,
+    first_page: dict,
+    fetch_page: Callable[[int], Awaitable[dict | None]],
+) -> AsyncIterator[dict]:
+    """
+    Yield every page of a paginated Spotify response, in order, as soon as it is ready.
+
+    In parallel mode the `total` reported by the first page is used to request the
+    following offsets concurrently, keeping at most `spotify_max_workers` requests in
+    flight ahead of the consumer; the shared AsyncRateLimitedClient throttles them and
+    backs off on 429s. Otherwise the `next` links are followed one page at a time.
+    """
+    metrics.inc("spotify_pages_total")
+    yield first_page
+    settings = get_settings()
+    if not (settings.spotify_parallel_pages and first_page.get("next")):
+        page: dict | None = first_page
+        while page and page["next"] and (page := await client.next(page)):
+            metrics.inc("spotify_pages_total")
+            yield page
+        return
+
+    limit = first_page["limit"]
+    offsets = iter(range(first_page["offset"] + limit, first_page["total"], limit))
+    window = max(1, settings.spotify_max_workers)
+    pending = deque(asyncio.ensure_future(fetch_page(offset)) for offset in islice(offsets, window))
+    try:
+        while pending:
+            page = await pending.popleft()
+            if (offset := next(offsets, None)) is not None:
+                pending.append(asyncio.ensure_future(fetch_page(offset)))
+            if page:
+                metrics.inc("spotify_pages_total")
+                yield page
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _collect_pages(
+    client: AsyncSpotify,
+    first_page: dict,
+    fetch_page: Callable[[int], Awaitable[dict | None]],
+) -> list[dict]:
+    """Return every page of a paginated Spotify response, in order."""
+    return [page async for page in _stream_pages(client, first_page, fetch_page)]
+
+
+async def astream_playlist_tracks(playlist_id: str) -> AsyncIterator[list[TrackRecord]]:
+    """
+    Yield a playlist's tracks page by page, in playlist order, as compact records.
+
+    Only PLAYLIST_TRACK_FIELDS are requested, and each page's raw items are dropped as soon
+    as they are converted. Unavailable items are skipped; positions stay as on Spotify.
+    """
+    client = get_async_spotify_client()
+
+    def fetch(offset: int) -> Awaitable[dict | None]:
+        return client.playlist_tracks(
+            playlist_id, fields=PLAYLIST_TRACK_FIELDS, limit=100, offset=offset
+        )
+
+    first_page = await fetch(0)
+    if first_page is None:
         raise ValueError("Playlist not found or empty.")
-    while results:
-        tracks.extend(results["items"])
-        results = client.next(results)
+    async for page in _stream_pages(client, first_page, fetch):
+        start = page.get("offset", 0)
+        yield [
+            record
+            for index, item in enumerate(page["items"])
+            if (record := TrackRecord.from_item(item, start + index)) is not None
+        ]
 
-    return tracks
 
+def get_all_playlist_tracks(playlist_id: str) -> Iterator[TrackRecord]:
+    """Stream a playlist's tracks as TrackRecords; pages are fetched as iteration proceeds."""
+    for page in iterate_sync(astream_playlist_tracks(playlist_id)):
+        yield from page
 
-def find_exact_duplicates(playlist_id: str):
-    # Fetch playlist tracks
-    tracks = get_all_playlist_tracks(playlist_id)
 
-    seen = {}
+async def aget_playlist_snapshot_id(playlist_id: str) -> str:
+    client = get_async_spotify_client()
+    result = await client.playlist(playlist_id, fields="snapshot_id")
+    if result is None:
+        raise ValueError("Playlist not found.")
+    return str(result["snapshot_id"])
 
-    for track in tracks:
-        track_id: str = track["track"]["id"]
-        title: str = track["track"]["name"]
-        artist = ", ".join([a["name"] for a in track["track"]["artists"]]) if track["track"]["artists"] else "Unknown Artist"
-        length = track["track"]["duration_ms"]
 
-        # Create a unique identifier
-        track_key = (title, artist, length)
+def get_playlist_snapshot_id(playlist_id: str) -> str:
+    return run_sync(aget_playlist_snapshot_id(playlist_id))
 
-        if track_key in seen:
-            seen[track_key].append(track_id)
-        else:
-            seen[track_key] = [track_id]
+
+async def aget_playlist_snapshot(playlist_id: str) -> tuple[str, int]:
+    """The playlist's snapshot_id and item count (unavailable items and local files included)."""
+    client = get_async_spotify_client()
+    result = await client.playlist(playlist_id, fields="snapshot_id,tracks(total)")
+    if result is None:
+        raise ValueError("Playlist not found.")
+    return str(result["snapshot_id"]), int(result["tracks"]["total"])
+
+
+def get_playlist_snapshot(playlist_id: str) -> tuple[str, int]:
+    return run_sync(aget_playlist_snapshot(playlist_id))
+
+
+def track_key(track: dict) -> tuple:
+    """The (title, artist, duration_ms) identity two tracks must share to be exact duplicates."""
+    title: str = track["name"]
+    artists = [artist["name"] for artist in track["artists"]]
+    return (title, ", ".join(artists) if artists else "Unknown Artist", track["duration_ms"])
+
+
+def find_exact_duplicates(
+    playlist_id: str, tracks: Iterable[dict | TrackRecord] | None = None
+) -> dict[tuple, list[str]]:
+    """
+    Group the IDs of tracks sharing a track_key, in one pass over the tracks.
+
+    Without ``tracks`` the playlist is streamed from Spotify page by page, so only the
+    keys seen so far are held in memory.
+    """
+    if tracks is None:
+        tracks = get_all_playlist_tracks(playlist_id)
+
+    seen: dict[tuple, list[str]] = {}
+    for record in as_track_records(tracks):
+        seen.setdefault(record.key, []).append(record.id)  # type: ignore
 
     return {key: value for key, value in seen.items() if len(value) > 1}  # Return only the duplicates
 
 
-def get_user_playlists() -> list[dict]:
+def find_duplicate_positions(tracks: Iterable[dict | TrackRecord]) -> list[tuple[str, int]]:
+    """
+    Locate every exact duplicate after its first occurrence.
+
+    Accepts TrackRecords or Spotify items; items carry their playlist position in
+    ``"position"`` when they come from the track cache, otherwise their index is used.
+
+    Returns:
+        list[tuple[str, int]]: (track URI, playlist position) pairs to delete.
+    """
+    seen = set()
+    removals = []
+    for record in as_track_records(tracks):
+        if not record.id:  # Local files can't be removed by URI
+            continue
+        if record.key in seen:
+            removals.append((record.track_uri, record.position))
+        else:
+            seen.add(record.key)
+    return removals
+
+
+async def aremove_track_positions(
+    playlist_id: str, removals: list[tuple[str, int]], snapshot_id: str
+) -> str:
+    """
+    Delete exactly the given (uri, position) occurrences, leaving every other item in place.
+
+    Requests hold at most 100 items and are pinned to the playlist snapshot. Positions are
+    removed from the end of the playlist backwards, so each chunk's positions are still
+    valid after the previous chunk went through, and each chunk is pinned to the snapshot
+    the previous one returned.
+
+    Returns:
+        str: The playlist's snapshot_id after the last removal.
+    """
+    client = get_async_spotify_client()
+    ordered = sorted(removals, key=lambda removal: removal[1], reverse=True)
+    for start in range(0, len(ordered), _PLAYLIST_WRITE_LIMIT):
+        chunk = ordered[start : start + _PLAYLIST_WRITE_LIMIT]
+        result = await client.playlist_remove_specific_occurrences_of_items(
+            playlist_id,
+            [{"uri": uri, "positions": [position]} for uri, position in chunk],
+            snapshot_id=snapshot_id,
+        )
+        if result is None:
+            raise ValueError("Playlist not found.")
+        snapshot_id = result["snapshot_id"]
+    return snapshot_id
+
+
+def remove_track_positions(
+    playlist_id: str, removals: list[tuple[str, int]], snapshot_id: str
+) -> str:
+    return run_sync(aremove_track_positions(playlist_id, removals, snapshot_id))
+
+
+async def aadd_track_uris(playlist_id: str, uris: list[str]) -> str | None:
+    """
+    Append tracks to a playlist in 100-item requests, in order.
+
+    Returns:
+        str | None: The playlist's snapshot_id after the last request (None if no URIs).
+    """
+    client = get_async_spotify_client()
+    snapshot_id = None
+    for start in range(0, len(uris), _PLAYLIST_WRITE_LIMIT):
+        result = await client.playlist_add_items(
+            playlist_id, uris[start : start + _PLAYLIST_WRITE_LIMIT]
+        )
+        if result is None:
+            raise ValueError("Playlist not found.")
+        snapshot_id = result["snapshot_id"]
+    return snapshot_id
+
+
+def add_track_uris(playlist_id: str, uris: list[str]) -> str | None:
+    return run_sync(aadd_track_uris(playlist_id, uris))
+
+
+async def acreate_playlist(name: str, description: str = "") -> dict:
+    """Create a private playlist for the current user, shaped like get_user_playlists entries."""
+    client = get_async_spotify_client()
+    current_user = await client.current_user()
+    if current_user is None:
+        raise ValueError("User ID not found.")
+    playlist = await client.user_playlist_create(current_user["id"], name, description=description)
+    if playlist is None:
+        raise ValueError("Playlist could not be created.")
+    return {
+        "id": playlist["id"],
+        "name": playlist["name"],
+        "description": playlist.get("description", ""),
+        "tracks_total": 0,
+        "snapshot_id": playlist["snapshot_id"],
+        "image_url": None,
+    }
+
+
+def create_playlist(name: str, description: str = "") -> dict:
+    return run_sync(acreate_playlist(name, description))
+
+
+async def aget_audio_features(track_ids: list[str]) -> list[dict | None]:
+    """
+    Audio features for ``track_ids``, in order, requested 100 IDs at a time with at most
+    ``spotify_max_workers`` requests in flight. Tracks without features map to None.
+    """
+    client = get_async_spotify_client()
+    semaphore = asyncio.Semaphore(max(1, get_settings().spotify_max_workers))
+
+    async def fetch(chunk: list[str]) -> list[dict | None]:
+        async with semaphore:
+            return await client.audio_features(chunk)
+
+    chunks = await asyncio.gather(
+        *(
+            fetch(track_ids[start : start + _AUDIO_FEATURES_LIMIT])
+            for start in range(0, len(track_ids), _AUDIO_FEATURES_LIMIT)
+        )
+    )
+    return [features for chunk in chunks for features in chunk]
+
+
+def get_audio_features(track_ids: list[str]) -> list[dict | None]:
+    return run_sync(aget_audio_features(track_ids))
+
+
+async def aget_user_playlists() -> list[dict]:
     """
     Fetch playlists owned by the authenticated user, ensuring no duplicates.
 
     Returns:
         list[dict]: A list of playlists (name, id, description, tracks_total, snapshot_id, image_url).
     """
-    client = get_spotify_client()
+    client = get_async_spotify_client()
     playlists: list[dict] = []
     seen_ids = set()  # Track IDs we've already processed
-    current_user = client.current_user()
+    current_user = await client.current_user()
     if current_user is None:
         raise ValueError("User ID not found.")
     current_user_id = current_user["id"]
-    results = client.current_user_playlists()
+    results = await client.current_user_playlists(limit=50)
+    if results is None:
+        return playlists
+    pages = await _collect_pages(
+        client, results, lambda offset: client.current_user_playlists(limit=50, offset=offset)
+    )
 
-    while results:
-        for playlist in results["items"]:
+    for page in pages:
+        for playlist in page["items"]:
             # Check if playlist ID has already been added
             if playlist["id"] not in seen_ids and playlist["owner"]["id"] == current_user_id:
                 playlists.append(
@@ -98,12 +464,13 @@ def get_user_playlists() -> list[dict]:
                 )
                 seen_ids.add(playlist["id"])  # Mark this ID as seen
 
-        # Move to the next page of results
-        results = client.next(results) if results["next"] else None
-
     return playlists
 
 
+def get_user_playlists() -> list[dict]:
+    return run_sync(aget_user_playlists())
+
+
 if __name__ == "__main__":
     playlists = get_user_playlists()
     with open("user_playlists.json", "w", encoding="utf-8") as f:
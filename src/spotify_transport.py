@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Retried by urllib3 on the adapter; 429 is handled by RateLimitedSession so that
+# every thread sharing the session backs off together.
+_RETRY_STATUSES = (500, 502, 503, 504)
+# A 5xx can arrive after Spotify applied the change, so only requests that are safe to
+# repeat are retried on one; a retried POST (e.g. adding tracks) could apply twice
+_IDEMPOTENT_METHODS = frozenset(["GET", "PUT", "DELETE"])
+_SERVER_ERROR_RETRIES = 3
+_SERVER_ERROR_BACKOFF = 0.3
+
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `burst` requests at once, refilled at `rate` per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token if one is available, otherwise return how long until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        while (wait := self._take()) > 0:
+            await asyncio.sleep(wait)
+
+
+class RateLimitBlock:
+    """
+    When Spotify's rate limit lets requests through again.
+
+    Spotify limits per app, not per connection, so one block is shared by every session
+    and client (see ``rate_limit_block``): a 429 on any of them pauses them all.
+    """
+
+    def __init__(self) -> None:
+        self._until = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        with self._lock:
+            return self._until - time.monotonic()
+
+    def extend(self, seconds: float) -> None:
+        with self._lock:
+            self._until = max(self._until, time.monotonic() + seconds)
+
+    def wait(self) -> None:
+        while (delay := self.remaining()) > 0:
+            time.sleep(delay)
+
+    async def wait_async(self) -> None:
+        while (delay := self.remaining()) > 0:
+            await asyncio.sleep(delay)
+
+
+rate_limit_block = RateLimitBlock()
+
+
+def _retry_after(response: Any) -> float:
+    try:
+        return float(response.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+class RateLimitedSession(requests.Session):
+    """
+    requests session shared by every Spotify call.
+
+    - keep-alive connection pool sized to our worker concurrency
+    - client-side token bucket throttling
+    - a 429 `Retry-After` pauses *all* Spotify requests until it expires, then the request
+      is retried
+    - 5xx responses are retried for idempotent methods only; connection errors, which
+      happen before the request is sent, are retried for every method
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        pool_size: int,
+        max_rate_limit_retries: int = 5,
+        bucket: TokenBucket | None = None,
+        block: RateLimitBlock | None = None,
+    ):
+        super().__init__()
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.block = block or rate_limit_block
+        self.max_rate_limit_retries = max_rate_limit_retries
+
+        retry = Retry(
+            total=_SERVER_ERROR_RETRIES,
+            backoff_factor=_SERVER_ERROR_BACKOFF,
+            status_forcelist=_RETRY_STATUSES,
+            allowed_methods=_IDEMPOTENT_METHODS,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method: str | bytes, url: str | bytes, *args: Any, **kwargs: Any) -> Any:
+        attempt = 0
+        while True:
+            self.block.wait()
+            self.bucket.acquire()
+            with metrics.span("spotify_request") as labels:
+                response = super().request(method, url, *args, **kwargs)
+                if labels is not None:
+                    labels["endpoint"] = metrics.spotify_endpoint(url)
+                    labels["status"] = response.status_code
+            if response.status_code != 429 or attempt >= self.max_rate_limit_retries:
+                return response
+            attempt += 1
+            metrics.inc("spotify_rate_limited_total", endpoint=metrics.spotify_endpoint(url))
+            retry_after = _retry_after(response)
+            logger.warning(
+                "Spotify rate limit hit, pausing all requests for %.1fs (retry %d/%d)",
+                retry_after,
+                attempt,
+                self.max_rate_limit_retries,
+            )
+            self.block.extend(retry_after)
+
+
+class AsyncRateLimitedClient(httpx.AsyncClient):
+    """
+    httpx counterpart of RateLimitedSession for the asyncio path.
+
+    It throttles with a token bucket (pass the sync session's to share one budget),
+    retries 5xx responses to idempotent requests with exponential backoff, and on a 429
+    pauses every Spotify request, sync or async, until `Retry-After` expires.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        pool_size: int,
+        max_rate_limit_retries: int = 5,
+        bucket: TokenBucket | None = None,
+        block: RateLimitBlock | None = None,
+        **kwargs: Any,
+    ):
+        kwargs.setdefault(
+            "limits",
+            httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        super().__init__(**kwargs)
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.block = block or rate_limit_block
+        self.max_rate_limit_retries = max_rate_limit_retries
+
+    async def request(self, method: str, url: httpx.URL | str, **kwargs: Any) -> httpx.Response:
+        attempt = server_errors = 0
+        while True:
+            await self.block.wait_async()
+            await self.bucket.acquire_async()
+            with metrics.span("spotify_request") as labels:
+                response = await super().request(method, url, **kwargs)
+                if labels is not None:
+                    labels["endpoint"] = metrics.spotify_endpoint(url)
+                    labels["status"] = response.status_code
+            if (
+                response.status_code in _RETRY_STATUSES
+                and method.upper() in _IDEMPOTENT_METHODS
+                and server_errors < _SERVER_ERROR_RETRIES
+            ):
+                metrics.inc("spotify_server_error_retries_total")
+                await asyncio.sleep(_SERVER_ERROR_BACKOFF * 2**server_errors)
+                server_errors += 1
+                continue
+            if response.status_code != 429 or attempt >= self.max_rate_limit_retries:
+                return response
+            attempt += 1
+            metrics.inc("spotify_rate_limited_total", endpoint=metrics.spotify_endpoint(url))
+            retry_after = _retry_after(response)
+            logger.warning(
+                "Spotify rate limit hit, pausing all requests for %.1fs (retry %d/%d)",
+                retry_after,
+                attempt,
+                self.max_rate_limit_retries,
+            )
+            self.block.extend(retry_after)
@@ -0,0 +1,150 @@
+import logging
+import random
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from . import metrics
+from .batch import dedupe_playlist
+from .combine import combine_playlists
+from .db_handler import (
+    create_tables,
+    delete_playlists_except,
+    get_playlist_tracks,
+    release_thread_session,
+    save_playlists_to_db,
+)
+from .settings import get_settings
+from .spotify_handler import get_user_playlists, parse_playlist_id
+
+logger = logging.getLogger(__name__)
+
+# Maintenance jobs run for each changed playlist: name -> job(playlist dict) -> report dict
+_jobs: dict[str, Callable[[dict], Any]] = {}
+
+
+def register_job(name: str) -> Callable[[Callable[[dict], Any]], Callable[[dict], Any]]:
+    """Decorator registering a maintenance job the sync daemon can run on changed playlists."""
+
+    def decorator(job: Callable[[dict], Any]) -> Callable[[dict], Any]:
+        _jobs[name] = job
+        return job
+
+    return decorator
+
+
+def get_jobs() -> dict[str, Callable[[dict], Any]]:
+    return dict(_jobs)
+
+
+@register_job("dedupe")
+def _dedupe_job(playlist: dict) -> dict:
+    return dedupe_playlist(playlist)
+
+
+@register_job("masters")
+def _masters_job(playlist: dict) -> dict:
+    """
+    Add the tracks new in ``playlist`` to every master playlist it is a source of
+    (NICHIFY_SYNC_MASTERS). Only missing tracks are written; tracks removed from a
+    source stay in the master.
+    """
+    results = {}
+    for master, sources in get_settings().sync_master_sources.items():
+        source_ids = [parse_playlist_id(source) for source in sources]
+        if playlist["id"] in source_ids:
+            results[master] = combine_playlists(source_ids, "union", target_id=master)
+    return results
+
+
+class SyncDaemon:
+    """
+    Polls the user's playlist list and brings only changed playlists up to date.
+
+    Each poll reads the playlist list (one request per 50 playlists), upserts it with a
+    single statement that reports which snapshot_ids changed, and re-fetches tracks only
+    for those playlists before running the selected jobs on them. Spotify has no change
+    feed for the list itself, so that read is a full scan whose cost grows with the
+    library; only the per-playlist work is skipped for unchanged snapshot_ids. Playlists
+    gone from the list are deleted locally. Polls are spaced by ``interval`` seconds with
+    random jitter, and failed polls, including database errors, back off exponentially.
+    """
+
+    def __init__(
+        self,
+        jobs: list[str] | None = None,
+        interval: float | None = None,
+        jitter: float | None = None,
+        max_backoff: float | None = None,
+    ):
+        settings = get_settings()
+        self.jobs = list(jobs) if jobs is not None else settings.sync_job_names
+        if unknown := [name for name in self.jobs if name not in _jobs]:
+            raise ValueError(f"Unknown sync job(s): {', '.join(unknown)}")
+        self.interval = interval if interval is not None else settings.sync_interval_seconds
+        self.jitter = jitter if jitter is not None else settings.sync_jitter
+        self.max_backoff = (
+            max_backoff if max_backoff is not None else settings.sync_max_backoff_seconds
+        )
+        self.failures = 0
+        self._stop = threading.Event()
+
+    def poll_once(self) -> dict[str, dict]:
+        """
+        Run one poll.
+
+        Returns:
+            dict[str, dict]: For each changed playlist, its name, track count and the result
+            of every job run on it.
+        """
+        playlists = {playlist["id"]: playlist for playlist in get_user_playlists()}
+        changed = save_playlists_to_db(list(playlists.values()), strict=True)
+        removed = delete_playlists_except(playlists)
+        results: dict[str, dict] = {}
+        for playlist_id in changed:
+            playlist = playlists[playlist_id]
+            entry: dict[str, Any] = {"name": playlist["name"], "jobs": {}}
+            try:
+                tracks, _ = get_playlist_tracks(playlist_id)
+                entry["tracks"] = len(tracks)
+                for name in self.jobs:
+                    entry["jobs"][name] = _jobs[name](playlist)
+            except Exception as e:
+                logger.exception("Error syncing playlist '%s'", playlist["name"])
+                entry["error"] = str(e)
+            results[playlist_id] = entry
+        logger.info(
+            "Sync poll: %d playlists, %d changed, %d removed",
+            len(playlists),
+            len(changed),
+            len(removed),
+        )
+        return results
+
+    def next_delay(self) -> float:
+        """Seconds until the next poll: the interval with jitter, doubled per failure."""
+        delay = self.interval
+        if self.failures:
+            delay = min(self.interval * 2**self.failures, self.max_backoff)
+        return max(0.0, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def run(self, once: bool = False) -> None:
+        create_tables()
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+                self.failures = 0
+            except Exception:
+                self.failures += 1
+                logger.exception("Sync poll failed (%d in a row)", self.failures)
+            finally:
+                release_thread_session()
+                # A long-running daemon would otherwise only write metrics at exit
+                if (registry := metrics.get_registry()) is not None:
+                    registry.export()
+            if once:
+                return
+            self._stop.wait(self.next_delay())
+
+    def stop(self) -> None:
+        self._stop.set()
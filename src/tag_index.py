@@ -0,0 +1,190 @@
+import re
+import threading
+from collections.abc import Callable, Iterable
+
+import numpy as np
+
+from .users import current_user
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+_OPERATORS = {"and", "or", "not"}
+
+
+def normalize_tag(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def _tokenize(expression: str) -> list[tuple[str, str]]:
+    """(kind, value) tokens: "(", ")", "and", "or", "not" or ("tag", name)."""
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if match is None:
+            raise ValueError(f"Unexpected character in tag query at {position}: {expression!r}")
+        opening, closing, quoted, word = match.groups()
+        if opening or closing:
+            tokens.append((opening or closing, ""))
+        elif quoted is not None:
+            tokens.append(("tag", normalize_tag(quoted)))
+        elif word.lower() in _OPERATORS:
+            tokens.append((word.lower(), ""))
+        else:
+            tokens.append(("tag", normalize_tag(word)))
+        position = match.end()
+    return tokens
+
+
+def parse_tag_query(expression: str) -> tuple:
+    """
+    Parse a boolean tag query into a tree of ("tag", name), ("not", a), ("and", a, b) and
+    ("or", a, b) nodes.
+
+    NOT binds tighter than AND, which binds tighter than OR. Operators are
+    case-insensitive; quote tags that contain spaces or collide with an operator.
+    """
+    tokens = _tokenize(expression)
+    position = 0
+
+    def peek() -> str | None:
+        return tokens[position][0] if position < len(tokens) else None
+
+    def take(kind: str) -> tuple[str, str]:
+        nonlocal position
+        if peek() != kind:
+            found = f"'{tokens[position][1] or tokens[position][0]}'" if peek() else "the end"
+            raise ValueError(f"Expected {kind} in tag query, found {found}: {expression!r}")
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or() -> tuple:
+        node = parse_and()
+        while peek() == "or":
+            take("or")
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and() -> tuple:
+        node = parse_not()
+        while peek() == "and":
+            take("and")
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not() -> tuple:
+        if peek() == "not":
+            take("not")
+            return ("not", parse_not())
+        if peek() == "(":
+            take("(")
+            node = parse_or()
+            take(")")
+            return node
+        return ("tag", take("tag")[1])
+
+    tree = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[position][1] or tokens[position][0]}' in tag query")
+    return tree
+
+
+class TagIndex:
+    """
+    In-memory posting lists of tracks per tag, evaluated as bitmaps.
+
+    Every track in the library gets a row; each tag's posting list is the set of rows
+    carrying it. A query turns the tags it names into boolean arrays over all rows and
+    combines them with NumPy, so NOT is relative to the whole library.
+    """
+
+    def __init__(self, library: Iterable[str] = (), track_tags: Iterable[tuple[str, str]] = ()):
+        self.track_ids: list[str] = []
+        self.row_of: dict[str, int] = {}
+        self.postings: dict[str, set[int]] = {}
+        # Bitmaps built from postings, dropped when a posting list or the library changes
+        self._bitmaps: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        for song_id in library:
+            self._row(song_id)
+        self.add(track_tags)
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    def _row(self, song_id: str) -> int:
+        row = self.row_of.get(song_id)
+        if row is None:
+            row = self.row_of[song_id] = len(self.track_ids)
+            self.track_ids.append(song_id)
+            self._bitmaps.clear()
+        return row
+
+    def add(self, track_tags: Iterable[tuple[str, str]]) -> None:
+        """Add (song_id, tag) pairs."""
+        with self._lock:
+            for song_id, tag in track_tags:
+                tag = normalize_tag(tag)
+                self.postings.setdefault(tag, set()).add(self._row(song_id))
+                self._bitmaps.pop(tag, None)
+
+    def remove(self, track_tags: Iterable[tuple[str, str]]) -> None:
+        """Remove (song_id, tag) pairs."""
+        with self._lock:
+            for song_id, tag in track_tags:
+                tag = normalize_tag(tag)
+                if (row := self.row_of.get(song_id)) is not None and tag in self.postings:
+                    self.postings[tag].discard(row)
+                    self._bitmaps.pop(tag, None)
+
+    def tag_counts(self) -> dict[str, int]:
+        with self._lock:
+            return {tag: len(rows) for tag, rows in sorted(self.postings.items()) if rows}
+
+    def _bitmap(self, tag: str) -> np.ndarray:
+        bitmap = self._bitmaps.get(tag)
+        if bitmap is None:
+            bitmap = np.zeros(len(self.track_ids), dtype=bool)
+            if rows := self.postings.get(tag):
+                bitmap[np.fromiter(rows, dtype=np.intp, count=len(rows))] = True
+            self._bitmaps[tag] = bitmap
+        return bitmap
+
+    def _evaluate(self, node: tuple) -> np.ndarray:
+        kind = node[0]
+        if kind == "tag":
+            return self._bitmap(node[1])
+        if kind == "not":
+            return ~self._evaluate(node[1])
+        if kind == "and":
+            return np.asarray(self._evaluate(node[1]) & self._evaluate(node[2]), dtype=bool)
+        return np.asarray(self._evaluate(node[1]) | self._evaluate(node[2]), dtype=bool)
+
+    def query(self, expression: str) -> list[str]:
+        """Song IDs matching a boolean tag query (see parse_tag_query), in library order."""
+        tree = parse_tag_query(expression)
+        with self._lock:
+            return [self.track_ids[row] for row in np.flatnonzero(self._evaluate(tree))]
+
+
+# One index per user (the None key outside server mode)
+_indexes: dict[str | None, TagIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_tag_index(
+    load_library: Callable[[], Iterable[str]],
+    load_track_tags: Callable[[], Iterable[tuple[str, str]]],
+) -> TagIndex:
+    """Return the shared index, building it from the loaders if it was invalidated."""
+    user = current_user()
+    with _index_lock:
+        if (index := _indexes.get(user)) is None:
+            index = _indexes[user] = TagIndex(load_library(), load_track_tags())
+        return index
+
+
+def invalidate_tag_index() -> None:
+    """Drop the shared index; called when new tracks enter the library."""
+    with _index_lock:
+        _indexes.pop(current_user(), None)
@@ -0,0 +1,103 @@
+import logging
+from collections.abc import Iterable
+
+from .combine import append_tracks, create_empty_playlist
+from .db_handler import (
+    add_track_tags,
+    get_all_track_tags,
+    get_library_song_ids,
+    get_playlist_tracks,
+    get_song_records,
+    remove_track_tags,
+    wait_for_sync,
+)
+from .spotify_handler import parse_playlist_id
+from .tag_index import TagIndex, get_tag_index, normalize_tag
+
+logger = logging.getLogger(__name__)
+
+
+def _get_index() -> TagIndex:
+    return get_tag_index(get_library_song_ids, get_all_track_tags)
+
+
+def _pairs(song_ids: Iterable[str], tags: Iterable[str]) -> list[tuple[str, str]]:
+    tags = [tag for tag in dict.fromkeys(normalize_tag(tag) for tag in tags) if tag]
+    if not tags:
+        raise ValueError("Give at least one tag.")
+    return [(song_id, tag) for song_id in dict.fromkeys(song_ids) for tag in tags]
+
+
+def tag_tracks(song_ids: Iterable[str], tags: Iterable[str]) -> int:
+    """
+    Give every track in ``song_ids`` every tag in ``tags``, in one batched write.
+
+    Returns:
+        int: The number of (track, tag) pairs that were new.
+    """
+    pairs = _pairs(song_ids, tags)
+    added = add_track_tags(pairs)
+    _get_index().add(pairs)
+    return added
+
+
+def untag_tracks(song_ids: Iterable[str], tags: Iterable[str]) -> None:
+    pairs = _pairs(song_ids, tags)
+    remove_track_tags(pairs)
+    _get_index().remove(pairs)
+
+
+def tag_playlist(playlist_id: str, tags: list[str]) -> dict:
+    """
+    Tag every track in a playlist.
+
+    Returns:
+        dict: Status, message and the number of tracks tagged.
+    """
+    playlist_id = parse_playlist_id(playlist_id)
+    wait_for_sync()
+    tracks, _ = get_playlist_tracks(playlist_id)
+    song_ids = [record.id for record in tracks if record.id]
+    added = tag_tracks(song_ids, tags)
+    return {
+        "status": "success",
+        "message": f"Tagged {len(set(song_ids))} tracks ({added} new tags).",
+        "tracks": len(set(song_ids)),
+    }
+
+
+def find_tagged_tracks(expression: str) -> list[str]:
+    """Library song IDs matching a tag query, e.g. ``(chill OR lofi) AND NOT instrumental``."""
+    return _get_index().query(expression)
+
+
+def get_tag_counts() -> dict[str, int]:
+    return _get_index().tag_counts()
+
+
+def create_playlist_from_tags(expression: str, new_name: str) -> dict:
+    """
+    Create a playlist with every library track matching a boolean tag query.
+
+    Returns:
+        dict: Status, message and the created playlist, if any.
+    """
+    wait_for_sync()
+    song_ids = find_tagged_tracks(expression)
+    if not song_ids:
+        return {
+            "status": "success",
+            "message": "No tracks match; no playlist was created.",
+            "tags": get_tag_counts(),
+        }
+    playlist_id = create_empty_playlist(new_name, f"Tracks tagged {expression}")
+    append_tracks(playlist_id, [], get_song_records(song_ids))
+    return {
+        "status": "success",
+        "message": f"Created {new_name} with {len(song_ids)} tracks.",
+        "playlist": {
+            "name": new_name,
+            "url": f"https://open.spotify.com/playlist/{playlist_id}",
+            "tracks": len(song_ids),
+        },
+    }
@@ -0,0 +1,108 @@
+from collections.abc import Iterable, Iterator
+
+# The only parts of a playlist item we read; passed as `fields` so Spotify leaves out
+# albums' images and markets, available_markets, external ids and the like
+PLAYLIST_TRACK_FIELDS = (
+    "items(track(id,uri,name,duration_ms,artists(name),album(name))),limit,offset,total,next"
+)
+
+
+class TrackRecord:
+    """
+    One playlist entry, reduced to what dedupe, similarity and the track cache use.
+
+    Slots and a tuple of artist names keep a 10k-track playlist at a few MB, where the
+    raw Spotify items (nested album, artist and market objects) take tens of MB.
+    """
+
+    __slots__ = ("id", "uri", "name", "artists", "album", "duration_ms", "position")
+
+    def __init__(
+        self,
+        id: str | None,
+        uri: str | None,
+        name: str,
+        artists: tuple[str, ...],
+        album: str | None,
+        duration_ms: int | None,
+        position: int,
+    ):
+        self.id = id
+        self.uri = uri
+        self.name = name
+        self.artists = artists
+        self.album = album
+        self.duration_ms = duration_ms
+        self.position = position
+
+    @classmethod
+    def from_item(cls, item: dict, position: int) -> "TrackRecord | None":
+        """Build a record from a Spotify playlist item; None for unavailable items."""
+        track = item.get("track")
+        if not track:
+            return None
+        return cls(
+            track.get("id"),
+            track.get("uri"),
+            track.get("name") or "",
+            tuple(artist["name"] for artist in track.get("artists") or ()),
+            (track.get("album") or {}).get("name"),
+            track.get("duration_ms"),
+            position,
+        )
+
+    @property
+    def artist(self) -> str:
+        return ", ".join(self.artists) if self.artists else "Unknown Artist"
+
+    @property
+    def key(self) -> tuple:
+        """The (title, artist, duration_ms) identity exact duplicates share."""
+        return (self.name, self.artist, self.duration_ms)
+
+    @property
+    def track_uri(self) -> str:
+        return self.uri or f"spotify:track:{self.id}"
+
+    def with_position(self, position: int) -> "TrackRecord":
+        return TrackRecord(
+            self.id, self.uri, self.name, self.artists, self.album, self.duration_ms, position
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TrackRecord):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"TrackRecord({self.position}: {self.name!r} by {self.artist!r})"
+
+
+def as_track_records(tracks: Iterable[dict | TrackRecord]) -> Iterator[TrackRecord]:
+    """
+    Lazily turn playlist items into records, skipping unavailable items.
+
+    Accepts raw Spotify items (whose ``"position"`` key, when present, overrides their
+    index) as well as records, so callers can pass either a stream or a list.
+    """
+    for index, item in enumerate(tracks):
+        if isinstance(item, TrackRecord):
+            yield item
+        elif (record := TrackRecord.from_item(item, item.get("position", index))) is not None:
+            yield record
+
+
+def remaining_after_removals(
+    tracks: Iterable[dict | TrackRecord], removals: list[tuple[str, int]]
+) -> list[TrackRecord]:
+    """The playlist tracks left after ``removals``, with positions shifted to match."""
+    removed_positions = sorted(position for _, position in removals)
+    removed_set = set(removed_positions)
+    remaining = []
+    shift = 0
+    for record in as_track_records(tracks):
+        while shift < len(removed_positions) and removed_positions[shift] < record.position:
+            shift += 1
+        if record.position not in removed_set:
+            remaining.append(record.with_position(record.position - shift))
+    return remaining
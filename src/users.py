@@ -0,0 +1,101 @@
+"""
+The user a request acts for, in server mode.
+
+Modules that keep per-user state (DB engine views, Spotify clients, playlist indexes)
+key it by ``current_user()``. It is None outside server mode, where everything works
+as a single-user application.
+"""
+
+import contextvars
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+_current_user: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "nichify_user", default=None
+)
+_UNSAFE_RE = re.compile(r"[^a-z0-9_]+")
+
+
+def current_user() -> str | None:
+    return _current_user.get()
+
+
+@contextmanager
+def user_scope(user_id: str) -> Iterator[None]:
+    """Act for ``user_id`` until the block ends (in this thread or task only)."""
+    token = _current_user.set(user_id)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+def user_key(user_id: str) -> str:
+    """A name for ``user_id`` that is safe in file names and SQL identifiers."""
+    slug = _UNSAFE_RE.sub("_", user_id.lower()).strip("_")[:32]
+    return f"{slug}_{hashlib.sha256(user_id.encode()).hexdigest()[:8]}"
+
+
+def with_current_context(function: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap ``function`` to run in a copy of the caller's context, so worker threads
+    (ThreadPoolExecutor, threading.Thread) act for the same user as the caller.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        # A context can only be entered by one thread at a time, so each call gets a copy
+        return context.copy().run(function, *args, **kwargs)
+
+    return run
+
+
+class LRUPool(Generic[T]):
+    """
+    Objects keyed by user, at most ``capacity`` of them; the least recently used one is
+    evicted (and passed to ``on_evict``) to make room.
+
+    Objects are created outside the lock, so a slow factory (e.g. reading a token
+    cache) for one user never blocks lookups for others.
+    """
+
+    def __init__(self, capacity: int, on_evict: Callable[[T], None] | None = None):
+        self.capacity = max(1, capacity)
+        self.on_evict = on_evict
+        self._items: OrderedDict[str, T] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def get(self, key: str, factory: Callable[[], T]) -> T:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        created = factory()
+        evicted = []
+        with self._lock:
+            if key in self._items:
+                # Another thread created it first; keep theirs
+                self._items.move_to_end(key)
+                evicted.append(created)
+                created = self._items[key]
+            else:
+                self._items[key] = created
+                while len(self._items) > self.capacity:
+                    evicted.append(self._items.popitem(last=False)[1])
+        if self.on_evict is not None:
+            for item in evicted:
+                self.on_evict(item)
+        return created
@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import db_handler, semantic_index
+
+
+@pytest.fixture(autouse=True)
+def in_memory_semantic_index(monkeypatch):
+    """Keep tests from reading or writing the user's persisted semantic index."""
+    monkeypatch.setattr(semantic_index, "_indexes", {None: semantic_index.SemanticPlaylistIndex()})
+
+
+def _spotify_item(
+    track_id: str | None,
+    name: str | None = None,
+    artist: str = "Art",
+    duration_ms: int = 200000,
+) -> dict:
+    if track_id is None:
+        return {"track": None}
+    return {
+        "track": {
+            "id": track_id,
+            "uri": f"spotify:track:{track_id}",
+            "name": name if name is not None else track_id.upper(),
+            "artists": [{"name": artist}],
+            "album": {"name": "Album"},
+            "duration_ms": duration_ms,
+        }
+    }
+
+
+@pytest.fixture
+def spotify_item():
+    """Builds playlist items as Spotify returns them; a track_id of None is unavailable."""
+    return _spotify_item
+
+
+@pytest.fixture
+def db_session(monkeypatch):
+    """An empty in-memory database as db_handler's session, usable from worker threads."""
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    db_handler.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    monkeypatch.setattr(db_handler, "session", session)
+    yield session
+    session.close()
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src import ai_handler
+from src.async_runner import run_sync
+
+
+def _tool_delta(index, call_id, name, arguments):
+    function = SimpleNamespace(name=name, arguments=arguments)
+    return SimpleNamespace(index=index, id=call_id, function=function)
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+async def _stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class ScriptedOpenAI:
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        response = self.responses[min(self.requests, len(self.responses) - 1)]
+        self.requests += 1
+        return _stream(response)
+
+
+def _setup(monkeypatch, responses):
+    client = ScriptedOpenAI(responses)
+    monkeypatch.setattr(ai_handler, "get_async_openai_client", lambda: client)
+    monkeypatch.setattr(ai_handler, "get_llm_cache", lambda: None)
+    monkeypatch.setattr(ai_handler, "release_thread_session", lambda: None)
+    return client
+
+
+def test_batch_runs_in_parallel_and_keeps_order(monkeypatch):
+    tool_batch = [
+        _chunk(tool_calls=[_tool_delta(0, "c0", "lookup", '{"name": ')]),
+        _chunk(tool_calls=[_tool_delta(0, None, None, '"slow"}')]),
+        _chunk(tool_calls=[_tool_delta(1, "c1", "lookup", '{"name": "fast"}')]),
+    ]
+    client = _setup(monkeypatch, [tool_batch, [_chunk("All done")]])
+
+    def lookup(name):
+        time.sleep(0.3 if name == "slow" else 0.2)
+        return {"status": "success", "message": name}
+
+    start = time.monotonic()
+    messages = ai_handler.process_ai_response(
+        [{"role": "user", "content": "look both up"}], tools=[{}], tools_map={"lookup": lookup}
+    )
+
+    assert time.monotonic() - start < 0.45
+    assert client.requests == 2
+    tool_messages = [m for m in messages if m["role"] == "tool"]
+    assert [m["tool_call_id"] for m in tool_messages] == ["c0", "c1"]
+    assert '"slow"' in tool_messages[0]["content"]
+    assert messages[-1] == {"role": "assistant", "content": "All done"}
+
+
+def test_loop_stops_after_max_steps(monkeypatch):
+    looping = [_chunk(tool_calls=[_tool_delta(0, "c", "noop", "{}")])]
+    client = _setup(monkeypatch, [looping])
+
+    messages = ai_handler.process_ai_response(
+        [{"role": "user", "content": "loop"}],
+        tools=[{}],
+        tools_map={"noop": lambda: {"status": "success"}},
+        max_steps=3,
+    )
+
+    assert client.requests == 3
+    assert "stopped after 3 tool steps" in messages[-1]["content"]
+
+
+def test_failing_tool_waits_for_siblings_using_the_loop(monkeypatch):
+    _setup(monkeypatch, [])
+    finished = []
+
+    def broken():
+        raise RuntimeError("boom")
+
+    def slow_lookup():
+        time.sleep(0.1)
+
+        async def on_loop():
+            return "looked up"
+
+        finished.append(run_sync(on_loop()))
+        return {"status": "success"}
+
+    calls = [
+        {"id": "c0", "function": {"name": "broken", "arguments": "{}"}},
+        {"id": "c1", "function": {"name": "slow_lookup", "arguments": "{}"}},
+    ]
+    with pytest.raises(RuntimeError, match="boom"):
+        run_sync(
+            asyncio.wait_for(
+                ai_handler.aexecute_tool_calls(
+                    calls, {"broken": broken, "slow_lookup": slow_lookup}
+                ),
+                timeout=5,
+            )
+        )
+    assert finished == ["looked up"]
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from src.async_runner import run_sync
+
+
+def test_run_sync_reraises_system_exit_without_stopping_the_loop():
+    async def leave():
+        raise SystemExit(0)
+
+    async def answer():
+        await asyncio.sleep(0)
+        return 42
+
+    with pytest.raises(SystemExit):
+        run_sync(leave())
+    assert run_sync(answer()) == 42
+
+
+def test_run_sync_refuses_to_block_the_loop_thread():
+    async def nested():
+        async def inner():
+            return 1
+
+        with pytest.raises(RuntimeError):
+            run_sync(inner())
+        return "ok"
+
+    assert run_sync(nested()) == "ok"
@@ -0,0 +1,49 @@
+from src import batch, db_handler
+
+
+def test_batch_dedupe_dry_run_then_clean_then_skip(monkeypatch, db_session, spotify_item):
+    # Workers run on pool threads; share the single in-memory database with them
+    monkeypatch.setattr(db_handler, "get_engine", db_session.get_bind)
+    monkeypatch.setattr(batch, "release_thread_session", lambda: None)
+
+    playlists = [
+        {"id": "p1", "name": "Dupes", "tracks_total": 3, "snapshot_id": "s1"},
+        {"id": "p2", "name": "Clean", "tracks_total": 1, "snapshot_id": "c1"},
+    ]
+    tracks = {
+        "p1": [spotify_item("a", "A"), spotify_item("b", "B"), spotify_item("a2", "A")],
+        "p2": [spotify_item("c", "C")],
+    }
+    snapshots = {"p1": "s1", "p2": "c1"}
+
+    def fake_save(data):
+        for playlist in data:
+            row = db_session.get(db_handler.Playlist, playlist["id"])
+            if row is None:
+                db_session.add(db_handler.Playlist(**playlist))
+            else:
+                row.snapshot_id = playlist["snapshot_id"]
+        db_session.commit()
+
+    def fake_remove(playlist_id, removals, snapshot_id):
+        assert removals == [("spotify:track:a2", 2)]
+        snapshots[playlist_id] = playlists[0]["snapshot_id"] = "s2"
+        return "s2"
+
+    monkeypatch.setattr(batch, "get_user_playlists", lambda: playlists)
+    monkeypatch.setattr(batch, "save_playlists_to_db", fake_save)
+    monkeypatch.setattr(batch, "remove_track_positions", fake_remove)
+    monkeypatch.setattr(db_handler, "get_all_playlist_tracks", lambda pid: tracks[pid])
+    monkeypatch.setattr(db_handler, "get_playlist_snapshot_id", lambda pid: snapshots[pid])
+
+    dry = batch.run_batch_dedupe(dry_run=True, workers=1)
+    assert [e["status"] for e in dry["playlists"]] == ["would_remove", "clean"]
+    assert dry["playlists"][0]["duplicates"][0]["position"] == 2
+    assert dry["summary"]["duplicates"] == 1
+
+    real = batch.run_batch_dedupe(workers=1)
+    assert [e["status"] for e in real["playlists"]] == ["removed", "skipped"]
+    assert real["playlists"][0]["snapshot_id"] == "s2"
+
+    again = batch.run_batch_dedupe(workers=1)
+    assert again["summary"]["skipped"] == 2
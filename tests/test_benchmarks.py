@@ -0,0 +1,30 @@
+import json
+
+from benchmarks import runner
+
+
+def test_smoke_suite_reports_every_case(monkeypatch):
+    monkeypatch.setitem(runner.SCALES, "smoke", {**runner.SCALES["smoke"], "repeat": 1})
+    report = runner.run_suite("smoke")
+
+    names = {result["name"] for result in report["results"]}
+    assert {
+        "find_exact_duplicates",
+        "get_all_playlist_tracks",
+        "get_user_playlists",
+        "ai_get_closest_playlist",
+        "process_ai_response",
+        "save_playlists_to_db",
+        "get_recently_modified_playlists",
+    } <= names
+    assert all(
+        result["params"]["backend"] == "sqlite"
+        for result in report["results"]
+        if result["name"] == "save_playlists_to_db"
+    )
+    json.dumps(report)
+
+    slower = json.loads(json.dumps(report))
+    slower["results"][0]["median_s"] *= 2
+    rows = runner.compare_reports(report, slower)
+    assert rows[0]["regression"] and not any(row["regression"] for row in rows[1:])
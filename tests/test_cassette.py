@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import httpx
+
+from src.cassette import Cassette, RecordingTransport, ReplayTransport
+
+
+class SlowStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[bytes], delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+
+def _server(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/v1/chat/completions":
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            stream=SlowStream([b"data: one\n\n", b"data: two\n\n", b"data: [DONE]\n\n"], 0.05),
+        )
+    return httpx.Response(200, json={"offset": request.url.params.get("offset")})
+
+
+async def _stream_body(client: httpx.AsyncClient, body: dict) -> tuple[list[bytes], float]:
+    started = time.perf_counter()
+    async with client.stream("POST", "https://openai.test/v1/chat/completions", json=body) as r:
+        chunks = [chunk async for chunk in r.aiter_raw()]
+    return chunks, time.perf_counter() - started
+
+
+def _record(path) -> None:
+    cassette = Cassette(str(path), "record")
+    transport = RecordingTransport(cassette, "test", httpx.MockTransport(_server))
+
+    async def session():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://api.spotify.test/v1/me/playlists?offset=0")
+            await client.get("https://api.spotify.test/v1/me/playlists?offset=50")
+            await _stream_body(client, {"messages": ["hello"]})
+
+    asyncio.run(session())
+
+
+def test_replay_serves_recorded_exchanges_in_order(tmp_path):
+    path = tmp_path / "session.jsonl.gz"
+    _record(path)
+    cassette = Cassette(str(path), "replay")
+    assert len(cassette) == 3
+
+    async def session():
+        async with httpx.AsyncClient(transport=ReplayTransport(cassette, speed=0)) as client:
+            second = await client.get("https://api.spotify.test/v1/me/playlists?offset=50")
+            first = await client.get("https://api.spotify.test/v1/me/playlists?offset=0")
+            missing = await client.get("https://api.spotify.test/v1/me")
+            chunks, _ = await _stream_body(client, {"messages": ["hello"]})
+            return first.json(), second.json(), missing.status_code, chunks
+
+    first, second, missing, chunks = asyncio.run(session())
+
+    assert first["offset"] == "0" and second["offset"] == "50"
+    assert missing == 404
+    assert b"".join(chunks) == b"data: one\n\ndata: two\n\ndata: [DONE]\n\n"
+
+
+def test_replay_keeps_chunk_timing_scaled_by_speed(tmp_path):
+    path = tmp_path / "session.jsonl.gz"
+    _record(path)
+
+    def replay_seconds(speed: float, body: dict) -> float:
+        cassette = Cassette(str(path), "replay")
+
+        async def session():
+            async with httpx.AsyncClient(transport=ReplayTransport(cassette, speed)) as client:
+                return await _stream_body(client, body)
+
+        chunks, seconds = asyncio.run(session())
+        assert len(chunks) == 3
+        return seconds
+
+    # Three chunks recorded 50ms apart
+    assert replay_seconds(1, {"messages": ["hello"]}) >= 0.14
+    assert replay_seconds(0, {"messages": ["hello"]}) < 0.05
+    # A different prompt falls back to the completion recorded for the same endpoint
+    assert replay_seconds(0, {"messages": ["something else"]}) < 0.05
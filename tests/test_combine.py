@@ -0,0 +1,75 @@
+import pytest
+
+from src import combine, db_handler
+from src.track_records import TrackRecord
+
+
+def _tracks(*names: str) -> list[TrackRecord]:
+    return [
+        TrackRecord(name.lower(), None, name, ("Art",), None, 1, i) for i, name in enumerate(names)
+    ]
+
+
+def _merge(playlists, mode, ratios=None):
+    vocabulary = combine.TrackVocabulary(playlists)
+    order = combine.merge_order(vocabulary, vocabulary.arrays, mode, ratios)
+    return [vocabulary.records[i].name for i in order]
+
+
+def test_set_modes_keep_first_appearance_order():
+    a, b = _tracks("A", "B", "C", "A"), _tracks("D", "C", "B")
+    assert _merge([a, b], "union") == ["A", "B", "C", "D"]
+    assert _merge([b, a], "intersection") == ["C", "B"]
+    assert _merge([a, b], "difference") == ["A"]
+
+
+def test_interleave_follows_ratios_and_skips_repeats():
+    a, b = _tracks("A1", "A2", "A3", "A4", "S"), _tracks("B1", "S", "B2")
+    assert _merge([a, b], "interleave", [2, 1]) == ["A1", "A2", "B1", "A3", "A4", "S", "B2"]
+    with pytest.raises(ValueError):
+        _merge([a, b], "interleave", [1])
+
+
+def test_existing_target_only_gets_missing_tracks(monkeypatch):
+    tracks = {"s1": _tracks("A", "B"), "s2": _tracks("B", "C"), "t": _tracks("A")}
+    writes = []
+    monkeypatch.setattr(combine, "get_playlist_tracks", lambda pid: (tracks[pid], "snap"))
+    monkeypatch.setattr(combine, "release_thread_session", lambda: None)
+    monkeypatch.setattr(combine, "wait_for_sync", lambda: True)
+    monkeypatch.setattr(combine, "get_playlist_snapshot", lambda pid: ("snap", 1))
+    monkeypatch.setattr(combine, "add_track_uris", lambda pid, uris: writes.append(uris) or "new")
+    monkeypatch.setattr(
+        combine,
+        "record_playlist_write",
+        lambda pid, snap, cached, tracks_total: writes.append([record.name for record in cached]),
+    )
+
+    result = combine.combine_playlists(["s1", "s2"], "union", target_id="t")
+    assert writes == [["spotify:track:b", "spotify:track:c"], ["A", "B", "C"]]
+    assert (result["added"], result["total"]) == (2, 3)
+
+
+def test_appended_tracks_follow_unavailable_items_in_the_target(
+    monkeypatch, db_session, spotify_item
+):
+    db_session.add(db_handler.Playlist(id="t", name="Mix", tracks_total=3, snapshot_id="s1"))
+    db_session.commit()
+    # The target's middle item is unavailable, so only two of its three items are cached
+    items = {
+        "t": [spotify_item("a"), spotify_item(None), spotify_item("b")],
+        "src": [spotify_item("c")],
+    }
+    monkeypatch.setattr(db_handler, "get_all_playlist_tracks", lambda pid: items[pid])
+    monkeypatch.setattr(db_handler, "get_playlist_snapshot_id", lambda pid: "s1")
+    monkeypatch.setattr(combine, "release_thread_session", lambda: None)
+    monkeypatch.setattr(combine, "wait_for_sync", lambda: True)
+    monkeypatch.setattr(combine, "get_playlist_snapshot", lambda pid: ("s1", 3))
+    monkeypatch.setattr(combine, "add_track_uris", lambda pid, uris: "s2")
+
+    result = combine.combine_playlists(["src"], "union", target_id="t")
+
+    rows = db_session.query(db_handler.PlaylistTrack.position, db_handler.PlaylistTrack.song_id)
+    assert sorted(rows) == [(0, "a"), (2, "b"), (3, "c")]
+    assert db_session.get(db_handler.PlaylistCache, "t").tracks_snapshot_id == "s2"
+    assert db_session.get(db_handler.Playlist, "t").tracks_total == 4
+    assert (result["added"], result["total"]) == (1, 4)
@@ -0,0 +1,61 @@
+import json
+
+from src.context_manager import ConversationContext, estimate_tokens, summarize_tool_result
+
+
+def _turn(i: int, removed: int = 0):
+    call_id = f"call_{i}"
+    result = {"status": "success", "message": f"Removed {removed}", "removed": ["x"] * removed}
+    return [
+        {"role": "user", "content": f"remove duplicates from playlist {i}"},
+        {
+            "role": "assistant",
+            "tool_calls": [
+                {"id": call_id, "type": "function", "function": {"name": "remove_duplicates"}}
+            ],
+        },
+        {"role": "tool", "tool_call_id": call_id, "content": summarize_tool_result(result)},
+        {"role": "assistant", "content": f"Done with playlist {i}."},
+    ]
+
+
+def test_summarize_tool_result_truncates_large_payloads():
+    result = {
+        "status": "error",
+        "message": "boom",
+        "removed": [f"id{i}" for i in range(500)],
+        "traceback": "Traceback (most recent call last):\n  ...\nValueError: boom",
+    }
+
+    text = summarize_tool_result(result)
+    payload = json.loads(text)
+
+    assert payload["traceback"] == "ValueError: boom"
+    assert len(payload["removed"]) == 11 and payload["removed"][-1] == "... 490 more"
+    assert len(text) < 400
+
+
+def test_compact_keeps_recent_turns_and_summarizes_the_rest():
+    context = ConversationContext("system prompt", budget_tokens=100_000, recent_turns=2)
+    for i in range(5):
+        context.messages.extend(_turn(i))
+    context.compact()
+
+    assert context.messages[0]["content"] == "system prompt"
+    summary = context.messages[1]["content"]
+    assert summary.startswith("Summary of the earlier conversation:")
+    assert "remove_duplicates -> success Removed 0" in summary
+    users = [m["content"] for m in context.messages if m["role"] == "user"]
+    assert users == ["remove duplicates from playlist 3", "remove duplicates from playlist 4"]
+
+
+def test_long_session_stays_within_budget():
+    context = ConversationContext("system prompt", budget_tokens=600, recent_turns=6)
+    sizes = []
+    for i in range(200):
+        context.messages.extend(_turn(i, removed=300))
+        context.compact()
+        sizes.append(context.token_count())
+
+    assert max(sizes) <= 600
+    assert estimate_tokens(context.messages) < 600
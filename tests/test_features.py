@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from src import features
+from src.track_records import TrackRecord
+
+
+def _track(track_id: str, position: int) -> TrackRecord:
+    return TrackRecord(track_id, None, track_id.upper(), ("Art",), None, 1, position)
+
+
+def _store(monkeypatch, remote: dict):
+    stored: dict[str, dict] = {}
+    requests = []
+
+    def fake_get(ids):
+        return [SimpleNamespace(**stored[i]) for i in ids if i in stored]
+
+    def fake_fetch(ids):
+        requests.append(list(ids))
+        return [remote.get(i) for i in ids]
+
+    monkeypatch.setattr(features, "get_track_features", fake_get)
+    monkeypatch.setattr(features, "get_audio_features", fake_fetch)
+    monkeypatch.setattr(
+        features,
+        "save_track_features",
+        lambda rows: stored.update((row["song_id"], row) for row in rows),
+    )
+    store = features.FeatureStore()
+    monkeypatch.setattr(features, "get_feature_store", lambda: store)
+    return store, stored, requests
+
+
+def test_features_are_fetched_once_and_stored(monkeypatch):
+    store, stored, requests = _store(monkeypatch, {"a": {"tempo": 120.0, "energy": 0.5}})
+    columns = store.columns(["a", "b", "a"])
+    assert columns["tempo"][[0, 2]].tolist() == [120.0, 120.0]
+    assert requests == [["a", "b"]]
+    assert stored["b"]["tempo"] is None  # No features: stored so it is not asked again
+
+    # A new process reads them from the table instead of Spotify
+    fresh = features.FeatureStore()
+    assert fresh.columns(["b", "a"])["energy"][1] == 0.5
+    assert requests == [["a", "b"]]
+
+
+def test_split_and_filter_by_features(monkeypatch):
+    remote = {
+        "slow": {"tempo": 80.0, "energy": 0.2},
+        "mid": {"tempo": 115.0, "energy": 0.9},
+        "fast": {"tempo": 140.0, "energy": 0.8},
+    }
+    _store(monkeypatch, remote)
+    tracks = [_track(tid, i) for i, tid in enumerate(["fast", "slow", "none", "mid"])]
+
+    buckets = features.split_tracks(tracks, "tempo", [100, 130])
+    assert {label: [r.id for r in records] for label, records in buckets.items()} == {
+        "< 100 BPM": ["slow"],
+        "100-130 BPM": ["mid"],
+        ">= 130 BPM": ["fast"],
+        features.UNKNOWN_BUCKET: ["none"],
+    }
+    energetic = features.filter_tracks(tracks, {"energy": (0.7, None), "tempo": (None, 130)})
+    assert [r.id for r in energetic] == ["mid"]
+
+
+def test_filter_drops_tracks_lacking_the_feature_even_when_unbounded(monkeypatch):
+    _store(monkeypatch, {"a": {"tempo": 120.0}, "b": {"energy": 0.4}})
+    tracks = [_track("a", 0), _track("b", 1)]
+
+    assert [r.id for r in features.filter_tracks(tracks, {"tempo": (None, None)})] == ["a"]
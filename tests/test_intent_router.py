@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import intent_router
+from src.playlist_index import PlaylistNameIndex
+
+PLAYLISTS = [
+    SimpleNamespace(id="p1", name="Chill Vibes", description="", tracks_total=1),
+    SimpleNamespace(id="p2", name="Gym Bangers", description="", tracks_total=1),
+    SimpleNamespace(id="p3", name="Gym Bangers 2", description="", tracks_total=1),
+]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("remove duplicates from Chill Vibes", ("remove_duplicates", False, "Chill Vibes")),
+        (
+            "Please delete the dupes in my 'Chill Vibes' playlist.",
+            ("remove_duplicates", False, "Chill Vibes"),
+        ),
+        (
+            "remove duplicates and similar songs from chill vibes",
+            ("remove_duplicates", True, "chill vibes"),
+        ),
+        (
+            "dedupe https://open.spotify.com/playlist/abc?si=1",
+            ("remove_duplicates", False, "https://open.spotify.com/playlist/abc?si=1"),
+        ),
+        ("find my gym playlist", ("get_closest_playlist", None, "gym")),
+    ],
+)
+def test_match_intent(text, expected):
+    tool, arguments, reference = intent_router.match_intent(text)
+    assert (tool, arguments.get("include_similar"), reference) == expected
+
+
+def test_unclear_requests_are_left_to_the_model():
+    assert intent_router.match_intent("what can you do?") is None
+    assert intent_router.match_intent("combine my two gym playlists") is None
+
+
+def test_handle_locally_runs_the_tool_only_for_confident_matches(monkeypatch):
+    index = PlaylistNameIndex(PLAYLISTS)
+    monkeypatch.setattr(intent_router, "get_playlist_index", lambda load: index)
+    calls = []
+
+    def remove_duplicates(playlist_id, include_similar, remove_similar_automatically):
+        calls.append(playlist_id)
+        return {"status": "success", "message": "Removed 2 duplicates of 1 songs."}
+
+    tools = {"remove_duplicates": remove_duplicates}
+
+    reply = intent_router.handle_locally("remove duplicates from chill vibes", tools)
+    assert reply == "Chill Vibes: Removed 2 duplicates of 1 songs."
+    assert calls == ["p1"]
+
+    # Ambiguous ("Gym Bangers" vs "Gym Bangers 2") and unknown names go to the model
+    assert intent_router.handle_locally("remove duplicates from gym banger", tools) is None
+    assert intent_router.handle_locally("remove duplicates from road trip", tools) is None
+    assert calls == ["p1"]
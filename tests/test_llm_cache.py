@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src import ai_handler
+from src.llm_cache import LLMResponseCache, make_key
+
+
+def _chunk(content=None, tool_calls=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+async def _stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.requests += 1
+        return _stream([_chunk("abc"), _chunk("123"), _chunk(finish_reason="stop")])
+
+
+def test_cache_evicts_least_recently_used_and_expired_entries():
+    cache = LLMResponseCache(max_entries=2, ttl_seconds=60)
+    for key in ("a", "b"):
+        cache.set(key, {"content": key, "tool_calls": []}, "fp")
+    cache.get("a")
+    cache.set("c", {"content": "c", "tool_calls": []}, "fp")
+
+    assert cache.get("b") is None
+    assert cache.get("a")["content"] == "a"
+
+    cache.ttl_seconds = -1
+    assert cache.get("a") is None
+
+
+def test_fingerprints_do_not_evict_each_other(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = LLMResponseCache(path=path)
+    messages = [{"role": "user", "content": "hi"}]
+    keys = {fp: make_key("gpt-4o-mini", messages, None, fp) for fp in ("ana", "bo")}
+    for fp, key in keys.items():
+        cache.set(key, {"content": f"hello {fp}", "tool_calls": []}, fp)
+
+    assert cache.get(keys["ana"])["content"] == "hello ana"
+    assert cache.get(keys["bo"])["content"] == "hello bo"
+    assert LLMResponseCache(path=path).get(keys["ana"])["content"] == "hello ana"
+
+
+def test_persisted_entries_expire_and_are_bounded(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = LLMResponseCache(max_entries=2, path=path)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"content": key, "tool_calls": []}, "fp")
+
+    restored = LLMResponseCache(path=path)
+    assert restored.get("a") is None and restored.get("c")["content"] == "c"
+    restored.ttl_seconds = -1
+    assert restored.get("c") is None
+
+
+def fingerprint() -> str:
+    # The DB query must not run on the event loop thread
+    with pytest.raises(RuntimeError):
+        asyncio.get_running_loop()
+    return "fp"
+
+
+def test_repeated_request_skips_the_model(monkeypatch):
+    fake = FakeOpenAI()
+    monkeypatch.setattr(ai_handler, "get_async_openai_client", lambda: fake)
+    monkeypatch.setattr(ai_handler, "get_llm_cache", lambda: cache)
+    monkeypatch.setattr(ai_handler, "get_playlist_fingerprint", fingerprint)
+    monkeypatch.setattr(ai_handler, "release_thread_session", lambda: released.append(True))
+    cache = LLMResponseCache()
+    released = []
+
+    first = ai_handler.process_ai_response([{"role": "user", "content": "find chill"}])
+    second = ai_handler.process_ai_response([{"role": "user", "content": "find chill"}])
+
+    assert fake.requests == 1
+    assert first[-1] == second[-1] == {"role": "assistant", "content": "abc123"}
+    assert released == [True, True]
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from src import metrics
+from src.settings import get_settings
+from src.spotify_transport import RateLimitedSession
+
+
+class ScriptedAdapter(BaseAdapter):
+    def __init__(self, statuses: list[int]):
+        super().__init__()
+        self.statuses = statuses
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = self.statuses.pop(0)
+        response.headers["Retry-After"] = "0"
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    def configure(export_format: str):
+        monkeypatch.setattr(get_settings(), "metrics_format", export_format)
+        monkeypatch.setattr(
+            get_settings(), "metrics_path", str(tmp_path / f"metrics.{export_format}")
+        )
+        return metrics.configure_metrics()
+
+    yield configure
+    monkeypatch.setattr(metrics, "_registry", None)
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(get_settings(), "metrics_format", "")
+    assert metrics.configure_metrics() is None
+
+    metrics.inc("spotify_pages_total")
+    with metrics.span("tool", tool="remove_duplicates") as labels:
+        pass
+
+    assert labels is None
+    assert metrics.span("tool") is metrics.span("openai_completion")
+
+
+def test_prometheus_export_with_spans_and_hit_rates(registry):
+    current = registry("prometheus")
+    metrics.inc("llm_cache_requests_total", result="hit")
+    metrics.inc("llm_cache_requests_total", result="hit")
+    metrics.inc("llm_cache_requests_total", result="miss")
+    with pytest.raises(RuntimeError), metrics.span("tool", tool="remove_duplicates"):
+        raise RuntimeError("boom")
+
+    current.export()
+    with open(current.path, encoding="utf-8") as f:
+        text = f.read()
+
+    assert "# TYPE nichify_llm_cache_requests_total counter" in text
+    assert 'nichify_llm_cache_requests_total{result="hit"} 2' in text
+    assert 'nichify_tool_seconds_count{error="True",tool="remove_duplicates"} 1' in text
+    assert current.snapshot()["cache_hit_rates"] == {"llm_cache": pytest.approx(2 / 3)}
+
+
+def test_jsonl_appends_spans_and_snapshot(registry):
+    current = registry("jsonl")
+    with metrics.span("spotify_request") as labels:
+        labels["status"] = 200
+    current.export()
+
+    with open(current.path, encoding="utf-8") as f:
+        events = [json.loads(line) for line in f]
+
+    assert [event["type"] for event in events] == ["span", "snapshot"]
+    assert events[0]["name"] == "spotify_request" and events[0]["status"] == "200"
+    assert events[1]["summaries"][0]["name"] == "spotify_request_seconds"
+
+
+def test_rate_limited_requests_are_counted(registry):
+    current = registry("prometheus")
+    session = RateLimitedSession(rate=1000, burst=10, pool_size=2)
+    session.mount("https://", ScriptedAdapter([429, 200]))
+
+    session.get("https://api.spotify.com/v1/playlists/abc/tracks")
+
+    counters = {
+        (c["name"], tuple(sorted(c["labels"].items()))): c["value"]
+        for c in current.snapshot()["counters"]
+    }
+    assert counters[("spotify_rate_limited_total", (("endpoint", "playlists"),))] == 1
+    request_counts = {
+        s["labels"]["status"]: s["count"]
+        for s in current.snapshot()["summaries"]
+        if s["name"] == "spotify_request_seconds"
+    }
+    assert request_counts == {"429": 1, "200": 1}
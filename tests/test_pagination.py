@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from src import spotify_handler
+
+
+class FakePagedClient:
+    def __init__(self, total: int):
+        self.items = [{"track": {"id": f"t{i}"}} for i in range(total)]
+        self.offsets: list[int] = []
+
+    async def _page(self, offset: int, limit: int):
+        self.offsets.append(offset)
+        # Later pages answer first so ordering has to be restored
+        await asyncio.sleep(0.001 * (len(self.items) - offset) / limit)
+        end = offset + limit
+        return {
+            "items": self.items[offset:end],
+            "offset": offset,
+            "limit": limit,
+            "total": len(self.items),
+            "next": f"offset={end}" if end < len(self.items) else None,
+        }
+
+    async def playlist_tracks(self, _playlist_id, fields=None, limit=100, offset=0):
+        return await self._page(offset, limit)
+
+    async def next(self, page):
+        if not page["next"]:
+            return None
+        return await self._page(page["offset"] + page["limit"], page["limit"])
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_get_all_playlist_tracks_keeps_order(monkeypatch, parallel):
+    client = FakePagedClient(total=1050)
+    monkeypatch.setattr(spotify_handler, "get_async_spotify_client", lambda: client)
+    monkeypatch.setattr(spotify_handler.get_settings(), "spotify_parallel_pages", parallel)
+
+    tracks = list(spotify_handler.get_all_playlist_tracks("dummy"))
+
+    assert [t.id for t in tracks] == [f"t{i}" for i in range(1050)]
+    assert [t.position for t in tracks] == list(range(1050))
+    assert sorted(client.offsets) == list(range(0, 1050, 100))
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from src import playlist_index
+from src.playlist_index import PlaylistNameIndex
+
+
+def _playlists(names):
+    return [
+        SimpleNamespace(id=str(i), name=name, description=None, tracks_total=0)
+        for i, name in enumerate(names)
+    ]
+
+
+def test_search_returns_ranked_top_k():
+    index = PlaylistNameIndex(
+        _playlists(["Chill Vibes", "Chill Vibes 2", "Workout Mix", "Chillout"])
+    )
+
+    results = index.search("chill vibes", 3)
+
+    assert [playlist["name"] for _, playlist in results][:2] == ["Chill Vibes", "Chill Vibes 2"]
+    assert results[0][0] == 1.0
+    assert all(a[0] >= b[0] for a, b in zip(results, results[1:], strict=False))
+    assert len(results) == 3
+
+
+def test_search_scales_to_large_libraries():
+    names = [f"Playlist {i} Mix" for i in range(20000)] + ["Late Night Drive"]
+    index = PlaylistNameIndex(_playlists(names))
+
+    (score, best), *_ = index.search("late nite drive", 5)
+
+    assert best["name"] == "Late Night Drive"
+    assert score > 0.8
+
+
+def test_shared_index_is_rebuilt_after_invalidation():
+    loads = []
+
+    def load():
+        loads.append(1)
+        return _playlists(["Chill Vibes"])
+
+    playlist_index.invalidate_playlist_index()
+    playlist_index.get_playlist_index(load)
+    playlist_index.get_playlist_index(load)
+    assert len(loads) == 1
+
+    playlist_index.invalidate_playlist_index()
+    playlist_index.get_playlist_index(load)
+    assert len(loads) == 2
+    playlist_index.invalidate_playlist_index()
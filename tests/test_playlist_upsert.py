@@ -0,0 +1,63 @@
+from sqlalchemy.dialects import postgresql
+
+from src import db_handler
+
+
+def test_playlist_upsert_is_one_conditional_statement():
+    rows = [
+        {
+            "id": f"p{i}",
+            "name": f"Playlist {i}",
+            "description": None,
+            "tracks_total": i,
+            "snapshot_id": f"s{i}",
+            "image_url": None,
+            "last_modified": None,
+        }
+        for i in range(3)
+    ]
+
+    sql = str(db_handler._playlist_upsert_statement(rows).compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO playlists") == 1
+    assert "ON CONFLICT (id) DO UPDATE" in sql
+    assert "WHERE playlists.snapshot_id != excluded.snapshot_id" in sql
+    assert "RETURNING playlists.id" in sql
+
+
+def test_save_playlists_to_db_logs_per_playlist(monkeypatch, caplog):
+    class FakeResult:
+        def scalars(self):
+            return ["p1"]
+
+    class FakeAsyncSession:
+        statements: list = []
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+        async def execute(self, stmt):
+            self.statements.append(stmt)
+            return FakeResult()
+
+        async def commit(self):
+            pass
+
+    session = FakeAsyncSession()
+    monkeypatch.setattr(db_handler, "new_async_session", lambda: session)
+    monkeypatch.setattr(db_handler, "refresh_semantic_index", lambda ids: None)
+    playlists = [
+        {"id": "p1", "name": "Changed", "tracks_total": 1, "snapshot_id": "new"},
+        {"id": "p2", "name": "Same", "tracks_total": 1, "snapshot_id": "old"},
+    ]
+
+    with caplog.at_level("INFO"):
+        changed = db_handler.save_playlists_to_db(playlists)
+
+    assert changed == {"p1"}
+    assert len(session.statements) == 1
+    assert "Playlist 'Changed' saved successfully!" in caplog.text
+    assert "Playlist 'Same' already up-to-date. Skipping..." in caplog.text
@@ -0,0 +1,62 @@
+from src import ai_commands, spotify_handler
+
+
+class FakeWriteClient:
+    def __init__(self):
+        self.calls = []
+
+    async def playlist_remove_specific_occurrences_of_items(
+        self, playlist_id, items, snapshot_id=None
+    ):
+        self.calls.append((items, snapshot_id))
+        return {"snapshot_id": f"s{len(self.calls) + 1}"}
+
+
+def test_remove_track_positions_chunks_from_the_end(monkeypatch, spotify_item):
+    client = FakeWriteClient()
+    monkeypatch.setattr(spotify_handler, "get_async_spotify_client", lambda: client)
+    tracks = [spotify_item("keep", "Song A")] + [
+        spotify_item(f"d{i}", "Song A") for i in range(250)
+    ]
+
+    removals = spotify_handler.find_duplicate_positions(tracks)
+    snapshot_id = spotify_handler.remove_track_positions("p1", removals, "s1")
+
+    assert len(removals) == 250 and (tracks[0]["track"]["uri"], 0) not in removals
+    assert [len(items) for items, _ in client.calls] == [100, 100, 50]
+    assert [snapshot for _, snapshot in client.calls] == ["s1", "s2", "s3"]
+    positions = [item["positions"][0] for items, _ in client.calls for item in items]
+    assert positions == sorted(positions, reverse=True)
+    assert snapshot_id == "s4"
+
+
+def test_remove_duplicates_keeps_first_occurrence_and_reports_snapshot(monkeypatch, spotify_item):
+    tracks = [
+        spotify_item("a1", "A"),
+        spotify_item("b", "B"),
+        spotify_item("a2", "A"),
+        spotify_item("c", "C"),
+        spotify_item("a3", "A"),
+    ]
+    recorded = {}
+
+    monkeypatch.setattr(ai_commands, "is_playlist_deduped", lambda _id: False)
+    monkeypatch.setattr(ai_commands, "get_playlist_tracks", lambda _id: (tracks, "s1"))
+    monkeypatch.setattr(ai_commands, "remove_track_positions", lambda _id, removals, snapshot: "s2")
+
+    def fake_mark(playlist_id, snapshot_id=None, remaining=None):
+        recorded.update(snapshot_id=snapshot_id, remaining=remaining)
+
+    monkeypatch.setattr(ai_commands, "mark_playlist_deduped", fake_mark)
+
+    result = ai_commands.ai_call_remove_duplicates("p1", False, False)
+
+    assert result["status"] == "success"
+    assert result["snapshot_id"] == "s2"
+    assert result["removed"] == ["a2", "a3"]
+    assert recorded["snapshot_id"] == "s2"
+    assert [(r.id, r.position) for r in recorded["remaining"]] == [
+        ("a1", 0),
+        ("b", 1),
+        ("c", 2),
+    ]
@@ -0,0 +1,58 @@
+import time
+
+from src import semantic_index
+from src.semantic_index import SemanticPlaylistIndex
+
+DOCUMENTS = [
+    {
+        "id": "1",
+        "name": "Summer Lifts",
+        "description": "gym bangers for hot days",
+        "artists": ["Eminem"],
+    },
+    {"id": "2", "name": "Rainy Sunday", "description": "slow acoustic", "artists": ["Bon Iver"]},
+    {"id": "3", "name": "Road Trip 2019", "description": "", "artists": ["Queen", "ABBA"]},
+    {"id": "4", "name": "Workout", "description": "running", "artists": ["Daft Punk"]},
+]
+
+
+def test_descriptive_query_ranks_matching_playlist_first():
+    index = SemanticPlaylistIndex()
+    index.upsert(DOCUMENTS)
+
+    results = index.search("my gym stuff from summer")
+
+    assert results[0][1] == "1"
+    assert index.search("bon iver")[0][1] == "2"
+    assert [pid for _, pid, _ in index.search("gym", within={"2", "3", "4"})] == []
+
+
+def test_incremental_update_and_persistence(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = SemanticPlaylistIndex(path)
+    index.upsert(DOCUMENTS)
+    index.upsert([{"id": "3", "name": "Beach Party", "description": "summer sun"}])
+    index.remove(["4"])
+    index.save()
+
+    reloaded = SemanticPlaylistIndex.load(path)
+
+    assert len(reloaded) == 3 and "4" not in reloaded
+    assert reloaded.search("beach party")[0][1:] == ("3", "Beach Party")
+
+
+def test_refreshes_one_at_a_time_are_saved_together(tmp_path, monkeypatch):
+    monkeypatch.setattr(semantic_index, "_SAVE_DELAY_SECONDS", 0.3)
+    index = SemanticPlaylistIndex(str(tmp_path / "index.npz"))
+    saves = []
+    save = index.save
+    monkeypatch.setattr(index, "save", lambda: saves.append(save()))
+
+    for document in DOCUMENTS * 50:
+        index.upsert([{**document, "id": f"{document['id']}-{len(index)}"}])
+        index.save_soon()
+    time.sleep(0.6)
+
+    assert len(saves) == 1
+    assert len(SemanticPlaylistIndex.load(index.path)) == 200
+    assert index.search("bon iver")[0][2] == "Rainy Sunday"
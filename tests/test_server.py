@@ -0,0 +1,129 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from src import server as server_module
+from src.async_runner import run_sync
+from src.users import LRUPool, current_user, user_scope, with_current_context
+
+
+@pytest.fixture
+def api(monkeypatch):
+    both_in_flight = threading.Barrier(2, timeout=5)
+    prepared = []
+
+    def whoami(wait: bool = False) -> dict:
+        if wait:
+            both_in_flight.wait()
+
+        async def user_on_loop():
+            return current_user()
+
+        return {"status": "success", "user": current_user(), "loop_user": run_sync(user_on_loop())}
+
+    monkeypatch.setattr(server_module, "_has_token", lambda: current_user() != "anonymous")
+    monkeypatch.setattr(
+        server_module, "_login_url", lambda user_id, state: f"https://login/{user_id}?{state}"
+    )
+    monkeypatch.setattr(server_module, "_exchange_code", lambda user_id, code: None)
+    monkeypatch.setattr(server_module, "release_thread_session", lambda: None)
+    monkeypatch.setattr(
+        server_module.NichifyServer, "prepare_user", lambda self, user_id: prepared.append(user_id)
+    )
+    httpd = server_module.NichifyServer(("127.0.0.1", 0), {"whoami": whoami})
+    tokens = {user: httpd.tokens.issue(user) for user in ("ana", "bo", "anonymous")}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def call(tool: str, user: str | None, arguments: dict | None = None) -> tuple[int, dict]:
+        return request(
+            f"/tools/{tool}", tokens.get(user or "", user), json.dumps(arguments or {}).encode()
+        )
+
+    def request(path: str, token: str | None = None, data: bytes | None = None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        url = f"http://127.0.0.1:{httpd.server_port}{path}"
+        try:
+            with urllib.request.urlopen(
+                urllib.request.Request(url, data=data, headers=headers), timeout=10
+            ) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    yield SimpleNamespace(call=call, request=request, prepared=prepared, tokens=tokens)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_concurrent_requests_act_for_their_own_user(api):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(
+            pool.map(lambda user: api.call("whoami", user, {"wait": True}), ["ana", "bo"])
+        )
+
+    assert [body["user"] for _, body in results] == ["ana", "bo"]
+    assert [body["loop_user"] for _, body in results] == ["ana", "bo"]
+    assert sorted(api.prepared) == ["ana", "bo"]
+
+
+def test_request_errors(api):
+    assert api.call("whoami", None)[0] == 401
+    # A bare user name is not a token
+    assert api.call("whoami", "someone-else")[0] == 401
+    assert api.call("missing", "ana")[0] == 404
+    assert api.call("whoami", "ana", {"unknown": 1})[0] == 400
+    status, body = api.call("whoami", "anonymous")
+    assert status == 401 and body["login_url"].startswith("https://login/anonymous?")
+
+
+def test_login_state_is_single_use_and_issues_a_token(api):
+    status, body = api.request("/login?user=cy")
+    state = body["url"].split("?", 1)[1]
+    assert status == 200
+
+    assert api.request("/callback?code=c&state=cy")[0] == 400
+    status, body = api.request(f"/callback?code=c&state={state}")
+    assert status == 200
+    assert api.request(f"/callback?code=c&state={state}")[0] == 400
+
+    status, body = api.request("/tools/whoami", body["token"], b"{}")
+    assert status == 200 and body["user"] == "cy"
+    # Only the user themself can log in again as an existing user
+    assert api.request("/login?user=ana")[0] == 401
+    assert api.request("/login?user=ana", api.tokens["bo"])[0] == 401
+    assert api.request("/login?user=ana", api.tokens["ana"])[0] == 200
+
+
+def test_api_tokens_persist_hashes_only(tmp_path):
+    path = str(tmp_path / "api_tokens.json")
+    old = server_module.ApiTokens(path).issue("ana")
+    token = server_module.ApiTokens(path).issue("ana")
+
+    restored = server_module.ApiTokens(path)
+    assert restored.user_for(token) == "ana" and restored.user_for(old) is None
+    assert token not in (tmp_path / "api_tokens.json").read_text()
+
+
+def test_lru_pool_evicts_least_recently_used():
+    evicted = []
+    pool: LRUPool[str] = LRUPool(2, evicted.append)
+    pool.get("a", lambda: "client-a")
+    pool.get("b", lambda: "client-b")
+    pool.get("a", lambda: "unused")
+    pool.get("c", lambda: "client-c")
+
+    assert evicted == ["client-b"]
+    assert "a" in pool and "c" in pool and len(pool) == 2
+
+
+def test_worker_threads_inherit_the_user():
+    with user_scope("ana"), ThreadPoolExecutor(max_workers=2) as pool:
+        users = list(pool.map(with_current_context(lambda _: current_user()), range(4)))
+    assert users == ["ana"] * 4
+    assert current_user() is None
@@ -0,0 +1,48 @@
+from src.similarity import find_similar_groups, normalize_title, similar_removal_positions
+
+
+def test_normalize_title_drops_version_qualifiers():
+    assert normalize_title("Hey Jude - Remastered 2015") == "hey jude"
+    assert normalize_title("Stay (feat. Justin Bieber) [Explicit]") == "stay"
+    assert normalize_title("Creep (Live at the BBC)") == "creep"
+    assert normalize_title("Déjà Vu") == "deja vu"
+
+
+def test_find_similar_groups_links_variants_only(spotify_item):
+    tracks = [
+        spotify_item("a1", "Hey Jude", "The Beatles", 431000),
+        spotify_item("b1", "Yesterday", "The Beatles", 125000),
+        spotify_item("a2", "Hey Jude - Remastered 2015", "The Beatles", 429000),
+        spotify_item("c1", "Hey Jude", "Wilson Pickett", 243000),
+        spotify_item("a3", "Hey Jude (Live)", "The Beatles", 437000),
+    ]
+
+    groups = find_similar_groups(tracks)
+
+    assert len(groups) == 1
+    assert [t["id"] for t in groups[0]["tracks"]] == ["a1", "a2", "a3"]
+    assert 0.9 <= groups[0]["confidence"] <= 1
+    assert similar_removal_positions(groups) == [("spotify:track:a2", 2), ("spotify:track:a3", 4)]
+
+
+def test_find_similar_groups_rejects_distant_durations(spotify_item):
+    tracks = [
+        spotify_item("a1", "Song", "Artist", 200000),
+        spotify_item("a2", "Song (Extended Version)", "Artist", 420000),
+    ]
+
+    assert find_similar_groups(tracks) == []
+
+
+def test_titles_without_words_are_never_grouped(spotify_item):
+    tracks = [
+        spotify_item("a1", "Hey Jude", "The Beatles", 431000),
+        spotify_item("q1", "?", "The Beatles", 200000),
+        spotify_item("a2", "Hey Jude - Remastered 2015", "The Beatles", 429000),
+        spotify_item("q2", "!!!", "The Beatles", 200000),
+        spotify_item("q3", "(Live)", "The Beatles", 200000),
+    ]
+
+    groups = find_similar_groups(tracks)
+
+    assert [[t["id"] for t in group["tracks"]] for group in groups] == [["a1", "a2"]]
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+
+from src.spotify_transport import (
+    AsyncRateLimitedClient,
+    RateLimitBlock,
+    RateLimitedSession,
+    TokenBucket,
+    rate_limit_block,
+)
+
+
+class ScriptedAdapter(BaseAdapter):
+    def __init__(self, statuses: list[int], retry_after: str = "0.05"):
+        super().__init__()
+        self.statuses = statuses
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = self.statuses[min(self.calls, len(self.statuses) - 1)]
+        response.headers["Retry-After"] = self.retry_after
+        response.request = request
+        self.calls += 1
+        return response
+
+    def close(self):
+        pass
+
+
+def test_token_bucket_throttles_after_burst():
+    bucket = TokenBucket(rate=100, burst=5)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 immediate tokens, the next 10 arrive at 100/s
+    assert time.monotonic() - start >= 0.09
+
+
+def test_session_retries_after_429():
+    session = RateLimitedSession(rate=1000, burst=10, pool_size=2)
+    adapter = ScriptedAdapter([429, 200])
+    session.mount("https://", adapter)
+
+    start = time.monotonic()
+    response = session.get("https://api.spotify.com/v1/me")
+
+    assert response.status_code == 200
+    assert adapter.calls == 2
+    assert time.monotonic() - start >= 0.05
+
+
+def test_session_gives_up_after_max_retries():
+    session = RateLimitedSession(rate=1000, burst=10, pool_size=2, max_rate_limit_retries=2)
+    adapter = ScriptedAdapter([429])
+    session.mount("https://", adapter)
+
+    assert session.get("https://api.spotify.com/v1/me").status_code == 429
+    assert adapter.calls == 3
+
+
+def test_async_client_shares_backoff_and_retries_server_errors():
+    statuses = iter([429, 503, 200, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), headers={"Retry-After": "0.05"})
+
+    async def fetch_twice():
+        client = AsyncRateLimitedClient(
+            rate=1000, burst=10, pool_size=2, transport=httpx.MockTransport(handler)
+        )
+        async with client:
+            first = await client.get("https://api.spotify.com/v1/me")
+            second = await client.get("https://api.spotify.com/v1/me")
+        return first, second
+
+    start = time.monotonic()
+    first, second = asyncio.run(fetch_twice())
+
+    assert first.status_code == second.status_code == 200
+    assert time.monotonic() - start >= 0.05
+
+
+def test_async_spotify_keeps_the_query_of_next_links():
+    from src.spotify_async import AsyncSpotify
+
+    auth = type("Auth", (), {"get_access_token": lambda self, as_dict=False: "token"})()
+    seen = []
+
+    def handler(request):
+        seen.append(str(request.url))
+        return httpx.Response(200, json={})
+
+    async def follow():
+        spotify = AsyncSpotify(auth, httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        await spotify.next({"next": "https://api.spotify.com/v1/me/playlists?offset=50&limit=50"})
+        await spotify.aclose()
+
+    asyncio.run(follow())
+    assert seen == ["https://api.spotify.com/v1/me/playlists?offset=50&limit=50"]
+
+
+def test_session_does_not_retry_server_errors_for_post():
+    retry = RateLimitedSession(rate=1000, burst=10, pool_size=2).get_adapter("https://").max_retries
+    assert retry.is_retry("GET", 502) and retry.is_retry("DELETE", 503)
+    assert not retry.is_retry("POST", 502)
+
+
+def test_rate_limit_block_is_shared_by_sessions():
+    assert RateLimitedSession(rate=1, burst=1, pool_size=1).block is rate_limit_block
+
+    block = RateLimitBlock()
+    limited, other = (
+        RateLimitedSession(rate=1000, burst=10, pool_size=2, block=block) for _ in range(2)
+    )
+    adapter = ScriptedAdapter([429, 200], retry_after="0.3")
+    limited.mount("https://", adapter)
+    other.mount("https://", ScriptedAdapter([200]))
+    worker = threading.Thread(target=limited.get, args=("https://api.spotify.com/v1/me",))
+    worker.start()
+    while adapter.calls == 0:
+        time.sleep(0.001)
+
+    # The other session waits out the Retry-After the limited one got
+    start = time.monotonic()
+    other.get("https://api.spotify.com/v1/me")
+    worker.join()
+    assert time.monotonic() - start >= 0.15
+
+
+def test_async_client_does_not_retry_server_errors_for_post():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(502)
+
+    async def add_items():
+        client = AsyncRateLimitedClient(
+            rate=1000, burst=10, pool_size=2, transport=httpx.MockTransport(handler)
+        )
+        async with client:
+            assert client.block is rate_limit_block
+            return await client.post("https://api.spotify.com/v1/playlists/p/tracks", json={})
+
+    assert asyncio.run(add_items()).status_code == 502
+    assert calls == ["POST"]
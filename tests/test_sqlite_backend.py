@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+
+from src import db_handler
+from src.settings import get_settings  # type: ignore
+from src.users import user_key, user_scope
+
+
+def _playlist(playlist_id: str, snapshot_id: str) -> dict:
+    return {
+        "id": playlist_id,
+        "name": f"Playlist {playlist_id}",
+        "description": None,
+        "tracks_total": 3,
+        "snapshot_id": snapshot_id,
+        "image_url": None,
+    }
+
+
+@pytest.fixture
+def sqlite_backend(monkeypatch, tmp_path):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "db_backend", "sqlite")
+    monkeypatch.setattr(settings, "sqlite_path", str(tmp_path / "nichify.db"))
+    monkeypatch.setattr(db_handler, "_engine", None)
+    monkeypatch.setattr(db_handler, "_async_engine", None)
+    monkeypatch.setattr(db_handler, "_user_engines", {})
+    monkeypatch.setattr(db_handler, "_user_async_engines", {})
+    monkeypatch.setattr(db_handler, "refresh_semantic_index", lambda ids: None)
+    yield tmp_path
+    db_handler.release_thread_session()
+
+
+def test_sqlite_upsert_only_rewrites_changed_playlists(sqlite_backend):
+    db_handler.Base.metadata.create_all(db_handler.get_engine())
+    playlists = [_playlist("a", "1"), _playlist("b", "1")]
+
+    assert db_handler.save_playlists_to_db(playlists) == {"a", "b"}
+    assert db_handler.save_playlists_to_db(playlists) == set()
+    assert db_handler.save_playlists_to_db([_playlist("a", "2"), _playlist("b", "1")]) == {"a"}
+
+    stored = {p.id: p.snapshot_id for p in db_handler.get_recently_modified_playlists()}
+    assert stored == {"a": "2", "b": "1"}
+    with db_handler.get_engine().connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+
+def test_sqlite_server_users_get_separate_files(sqlite_backend):
+    for user, playlist_id in (("ana", "a"), ("bo", "b")):
+        with user_scope(user):
+            db_handler.create_user_schema()
+            db_handler.save_playlists_to_db([_playlist(playlist_id, "1")])
+
+    for user, playlist_id in (("ana", "a"), ("bo", "b")):
+        with user_scope(user):
+            ids = [p.id for p in db_handler.get_recently_modified_playlists()]
+            db_handler.release_thread_session()
+        assert ids == [playlist_id]
+        # Each user's rows are in their file alone
+        path = sqlite_backend / f"nichify.{user_key(user)}.db"
+        with sqlite3.connect(path) as connection:
+            assert connection.execute("SELECT id FROM playlists").fetchall() == [(playlist_id,)]
+    assert len(list(sqlite_backend.glob("nichify.*.db"))) == 2
+    # The shared engine does not follow whichever user touched the database first
+    assert db_handler._engine.url.database == str(sqlite_backend / "nichify.db")
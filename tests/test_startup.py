@@ -0,0 +1,67 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src import ai_commands, db_handler, main
+
+
+class PromptReachedError(Exception):
+    pass
+
+
+@pytest.fixture
+def slow_sync(monkeypatch):
+    """Replace init_db with a sync that blocks until released, like a slow Spotify fetch."""
+    release = threading.Event()
+    monkeypatch.setattr(db_handler, "init_db", lambda drop=False: release.wait(5))
+    monkeypatch.setattr(db_handler, "release_thread_session", lambda: None)
+    monkeypatch.setattr(db_handler, "_sync_thread", None)
+    monkeypatch.setattr(db_handler, "_sync_done", threading.Event())
+    yield release
+    release.set()
+    db_handler.wait_for_sync(5)
+
+
+def test_import_creates_no_clients():
+    code = (
+        "import src.main, src.ai_handler as a, src.db_handler as d, src.spotify_handler as s; "
+        "assert a._client is None and d._engine is None and s._sp_client is None; "
+        "import sys; assert 'openai' not in sys.modules and 'spotipy' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_time_to_prompt_does_not_wait_for_sync(monkeypatch, slow_sync):
+    monkeypatch.setattr(main, "configure_logging", lambda: None)
+    prompted_after = []
+
+    def fake_input(prompt=""):
+        prompted_after.append(time.perf_counter() - start)
+        raise PromptReachedError
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    start = time.perf_counter()
+    with pytest.raises(PromptReachedError):
+        main.main()
+
+    assert prompted_after[0] < 0.3
+    assert not db_handler._sync_done.is_set()
+
+
+def test_playlist_tools_wait_for_running_sync(monkeypatch, slow_sync):
+    seen_sync_done = []
+    monkeypatch.setattr(
+        ai_commands,
+        "get_playlist_index",
+        lambda load: seen_sync_done.append(db_handler._sync_done.is_set()) or [],
+    )
+    db_handler.start_background_sync()
+    threading.Timer(0.05, slow_sync.set).start()
+
+    result = ai_commands.ai_get_closest_playlist("gym")
+
+    assert seen_sync_done == [True]
+    assert result["status"] == "error"
@@ -0,0 +1,85 @@
+import pytest
+
+from src import sync_daemon
+from src.settings import get_settings
+
+
+def test_poll_refetches_and_runs_jobs_only_for_changed_playlists(monkeypatch):
+    playlists = [
+        {"id": f"p{i}", "name": f"Playlist {i}", "tracks_total": 1, "snapshot_id": "s"}
+        for i in range(500)
+    ]
+    fetched, jobs_run = [], []
+    monkeypatch.setattr(sync_daemon, "get_user_playlists", lambda: playlists)
+    monkeypatch.setattr(
+        sync_daemon, "save_playlists_to_db", lambda data, strict: {"p7", "p42"}
+    )
+    monkeypatch.setattr(sync_daemon, "delete_playlists_except", lambda ids: set())
+    monkeypatch.setattr(
+        sync_daemon, "get_playlist_tracks", lambda pid: fetched.append(pid) or (["t"], "s")
+    )
+    monkeypatch.setitem(
+        sync_daemon._jobs, "record", lambda playlist: jobs_run.append(playlist["id"]) or "ok"
+    )
+
+    results = sync_daemon.SyncDaemon(jobs=["record"]).poll_once()
+
+    assert sorted(fetched) == sorted(jobs_run) == ["p42", "p7"]
+    assert results["p7"] == {"name": "Playlist 7", "jobs": {"record": "ok"}, "tracks": 1}
+
+
+def test_failed_save_backs_off_and_missing_playlists_are_deleted(monkeypatch):
+    kept = []
+    monkeypatch.setattr(sync_daemon, "create_tables", lambda: None)
+    monkeypatch.setattr(
+        sync_daemon, "get_user_playlists", lambda: [{"id": "p1", "name": "Mix"}]
+    )
+    monkeypatch.setattr(
+        sync_daemon, "delete_playlists_except", lambda ids: kept.append(set(ids)) or {"p2"}
+    )
+    daemon = sync_daemon.SyncDaemon(jobs=[])
+
+    def failing_save(data, strict):
+        assert strict
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(sync_daemon, "save_playlists_to_db", failing_save)
+    daemon.run(once=True)
+    assert daemon.failures == 1
+    assert kept == []
+
+    monkeypatch.setattr(sync_daemon, "save_playlists_to_db", lambda data, strict: set())
+    daemon.run(once=True)
+    assert daemon.failures == 0
+    assert kept == [{"p1"}]
+
+
+def test_masters_job_refills_the_masters_a_changed_playlist_feeds(monkeypatch):
+    combined = []
+    monkeypatch.setattr(
+        get_settings(), "sync_masters", "all=a+b+spotify:playlist:c; gym=c+d;empty="
+    )
+    monkeypatch.setattr(
+        sync_daemon,
+        "combine_playlists",
+        lambda sources, mode, target_id: combined.append((target_id, sources)) or "ok",
+    )
+
+    assert sync_daemon._masters_job({"id": "c"}) == {"all": "ok", "gym": "ok"}
+    assert sync_daemon._masters_job({"id": "x"}) == {}
+    assert combined == [("all", ["a", "b", "c"]), ("gym", ["c", "d"])]
+
+
+def test_delay_has_jitter_and_backs_off_on_failures():
+    daemon = sync_daemon.SyncDaemon(jobs=[], interval=100, jitter=0.1, max_backoff=350)
+
+    assert 90 <= daemon.next_delay() <= 110
+    daemon.failures = 1
+    assert 180 <= daemon.next_delay() <= 220
+    daemon.failures = 5
+    assert daemon.next_delay() <= 385
+
+
+def test_unknown_jobs_are_rejected():
+    with pytest.raises(ValueError, match="nope"):
+        sync_daemon.SyncDaemon(jobs=["nope"])
@@ -0,0 +1,36 @@
+import pytest
+
+from src import tag_index, tags
+
+
+def test_boolean_queries_over_the_library():
+    index = tag_index.TagIndex(
+        ["a", "b", "c", "d"],
+        [("a", "Chill"), ("b", "lofi"), ("b", "instrumental"), ("c", "chill"), ("d", "Road Trip")],
+    )
+    assert index.query("(chill OR lofi) AND NOT instrumental") == ["a", "c"]
+    assert index.query("not chill and not lofi") == ["d"]
+    assert index.query('"road  trip" or missing') == ["d"]
+    index.remove([("c", "chill")])
+    assert index.query("chill") == ["a"]
+    for broken in ["(chill", "chill lofi", "AND chill", '"chill']:
+        with pytest.raises(ValueError):
+            tag_index.parse_tag_query(broken)
+
+
+def test_tagging_writes_batches_and_updates_the_index(monkeypatch, db_session):
+    commits = []
+    original_commit = db_session.commit
+    monkeypatch.setattr(db_session, "commit", lambda: commits.append(1) or original_commit())
+    tag_index.invalidate_tag_index()
+
+    assert tags.tag_tracks(["t1", "t2", "t3"], ["Chill", "lofi "]) == 6
+    assert tags.tag_tracks(["t1", "t4"], ["chill"]) == 1  # Existing pairs are skipped
+    assert len(commits) == 2
+    assert tags.find_tagged_tracks("chill AND NOT lofi") == ["t4"]
+
+    tags.untag_tracks(["t2"], ["lofi"])
+    tag_index.invalidate_tag_index()  # Reload from the tables
+    assert tags.find_tagged_tracks("lofi") == ["t1", "t3"]
+    assert tags.get_tag_counts() == {"chill": 4, "lofi": 2}
+    tag_index.invalidate_tag_index()
@@ -0,0 +1,90 @@
+from sqlalchemy import String, create_engine, insert, inspect
+from sqlalchemy.pool import StaticPool
+
+from src import db_handler
+from src.ai_commands import ai_call_remove_duplicates
+from src.semantic_index import SemanticPlaylistIndex
+
+
+def test_cached_tracks_skip_spotify_until_snapshot_changes(monkeypatch, db_session, spotify_item):
+    db_session.add(db_handler.Playlist(id="p1", name="Mix", tracks_total=2, snapshot_id="s1"))
+    db_session.commit()
+
+    calls = []
+
+    def fake_get_tracks(playlist_id: str):
+        calls.append(playlist_id)
+        return [spotify_item("t1", "Song A"), {"track": None}, spotify_item("t2", "Song B")]
+
+    monkeypatch.setattr(db_handler, "get_all_playlist_tracks", fake_get_tracks)
+    monkeypatch.setattr(db_handler, "get_playlist_snapshot_id", lambda _id: "s1")
+
+    first, _ = db_handler.get_playlist_tracks("p1")
+    second, snapshot_id = db_handler.get_playlist_tracks("p1")
+    assert calls == ["p1"]
+    assert snapshot_id == "s1"
+    assert [record.id for record in second] == ["t1", "t2"]
+    assert [record.position for record in second] == [0, 2]
+    assert second == first
+
+    db_session.get(db_handler.Playlist, "p1").snapshot_id = "s2"
+    db_session.commit()
+    monkeypatch.setattr(db_handler, "get_playlist_snapshot_id", lambda _id: "s2")
+    db_handler.get_playlist_tracks("p1")
+    assert calls == ["p1", "p1"]
+
+
+def test_repeat_dedupe_makes_no_api_calls(monkeypatch, db_session, spotify_item):
+    db_session.add(db_handler.Playlist(id="p1", name="Mix", tracks_total=2, snapshot_id="s1"))
+    db_session.commit()
+
+    calls = []
+
+    def fake_get_tracks(playlist_id: str):
+        calls.append(playlist_id)
+        return [spotify_item("t1", "Song A"), spotify_item("t2", "Song B")]
+
+    monkeypatch.setattr(db_handler, "get_all_playlist_tracks", fake_get_tracks)
+    monkeypatch.setattr(db_handler, "get_playlist_snapshot_id", lambda _id: "s1")
+
+    url = "https://open.spotify.com/playlist/p1?si=abc"
+    assert ai_call_remove_duplicates(url, False, False)["status"] == "success"
+    assert ai_call_remove_duplicates(url, False, False)["status"] == "success"
+    assert calls == ["p1"]
+
+
+def test_songs_table_from_before_the_cache_is_rebuilt(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE songs (id INTEGER PRIMARY KEY AUTOINCREMENT, title VARCHAR NOT NULL,"
+            " artist VARCHAR NOT NULL, album VARCHAR, length INTEGER, song_metadata JSON)"
+        )
+    monkeypatch.setattr(db_handler, "get_engine", lambda: engine)
+
+    db_handler.create_tables()
+    db_handler.create_tables()  # Already upgraded: left alone
+
+    columns = {c["name"]: c["type"] for c in inspect(engine).get_columns("songs")}
+    assert isinstance(columns["id"], String) and "duration_ms" in columns
+    with engine.begin() as connection:
+        connection.execute(insert(db_handler.Song), [{"id": "t1", "title": "A", "artist": "B"}])
+
+
+def test_playlists_missing_from_the_listing_are_deleted(monkeypatch, db_session):
+    index = SemanticPlaylistIndex()
+    index.upsert([{"id": pid, "name": pid} for pid in ("p1", "p2")])
+    monkeypatch.setattr(db_handler, "get_semantic_index", lambda: index)
+    for pid in ("p1", "p2"):
+        db_session.add(db_handler.Playlist(id=pid, name=pid, tracks_total=1, snapshot_id="s"))
+        db_session.add(db_handler.Song(id=f"t{pid}", title="Song", artist="Art"))
+        db_session.add(db_handler.PlaylistTrack(playlist_id=pid, position=0, song_id=f"t{pid}"))
+        db_session.add(db_handler.PlaylistCache(playlist_id=pid, tracks_snapshot_id="s"))
+    db_session.commit()
+
+    assert db_handler.delete_playlists_except(["p1", "p3"]) == {"p2"}
+    assert db_handler.delete_playlists_except(["p1"]) == set()
+    assert [p.id for p in db_session.query(db_handler.Playlist)] == ["p1"]
+    assert [t.playlist_id for t in db_session.query(db_handler.PlaylistTrack)] == ["p1"]
+    assert [c.playlist_id for c in db_session.query(db_handler.PlaylistCache)] == ["p1"]
+    assert index.ids == ["p1"]
@@ -0,0 +1,48 @@
+from src import spotify_handler
+from src.spotify_handler import find_duplicate_positions, find_exact_duplicates
+from src.track_records import PLAYLIST_TRACK_FIELDS, as_track_records
+
+
+def test_records_keep_spotify_positions_and_skip_unavailable_items(spotify_item):
+    records = list(
+        as_track_records([spotify_item("a", "A"), {"track": None}, spotify_item("b", "B")])
+    )
+
+    assert [(r.id, r.position) for r in records] == [("a", 0), ("b", 2)]
+    assert records[0].key == ("A", "Art", 200000)
+    assert records[0].track_uri == "spotify:track:a"
+
+
+class FakeTrimmedClient:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    async def playlist_tracks(self, _playlist_id, fields=None, limit=100, offset=0):
+        assert fields == PLAYLIST_TRACK_FIELDS
+        self.requested.append(offset)
+        index = offset // limit
+        return {
+            "items": self.pages[index],
+            "offset": offset,
+            "limit": limit,
+            "total": limit * len(self.pages),
+            "next": "more" if index + 1 < len(self.pages) else None,
+        }
+
+
+def test_dedupe_consumes_the_track_stream(monkeypatch, spotify_item):
+    pages = [
+        [spotify_item(f"p{page}-{i}", f"Song {page}-{i}") for i in range(99)]
+        + [spotify_item(f"d{page}", "Dup")]
+        for page in range(3)
+    ]
+    client = FakeTrimmedClient(pages)
+    monkeypatch.setattr(spotify_handler, "get_async_spotify_client", lambda: client)
+
+    duplicates = find_exact_duplicates("p1")
+    removals = find_duplicate_positions(spotify_handler.get_all_playlist_tracks("p1"))
+
+    assert duplicates == {("Dup", "Art", 200000): ["d0", "d1", "d2"]}
+    assert removals == [("spotify:track:d1", 199), ("spotify:track:d2", 299)]
+    assert sorted(client.requested) == [0, 0, 100, 100, 200, 200]